@@ -0,0 +1,94 @@
+"""
+Benchmark de CompressionMiddleware: bytes enviados y CPU por petición para cada codificación.
+
+Usa respuestas representativas (/chat/dax con queries y vistas previas, y un stream SSE de deltas)
+y las hace pasar por el middleware real, incluidos los flush por frame del SSE.
+
+    python benchmarks/compression.py --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.rest.middleware.CompressionMiddleware import CompressionMiddleware  # noqa: E402
+
+
+def dax_payload(rows: int) -> bytes:
+    query = ("EVALUATE\n  SUMMARIZECOLUMNS(\n    'Client dimension'[Store chain],\n"
+             "    FILTER('Product dimension', 'Product dimension'[Manufacturer] = \"CAMPOFRIO\"),\n"
+             "    \"Ventas\", [total_sales_euros]\n  )\nORDER BY [Ventas] DESC")
+    records = [{"Store chain": f"CADENA {i}", "total_sales_euros": 1234.5 * i, "sales_units": 17 * i} for i in range(rows)]
+    preview = ["| Store chain | total_sales_euros | sales_units |", "|---|---|---|"] + [
+        f"| {r['Store chain']} | {r['total_sales_euros']} | {r['sales_units']} |" for r in records
+    ]
+    frame = {"columns": list(records[0]), "dtypes": ["string", "float64", "int64"],
+             "data": [[r[c] for r in records] for c in records[0]], "row_count": rows, "truncated": False}
+    result = {
+        "final_response": "Las ventas del último mes ascendieron a 1.234.567 € (+4,2 % vs. año anterior). " * 4,
+        "sql_queries": [query, query],
+        "sql_data_previews": [preview, preview],
+        "sql_data_frames": [frame, frame],
+        "data_retrieval_query": query,
+    }
+    return json.dumps({"analysis result": result}).encode()
+
+
+def sse_frames(deltas: int) -> list:
+    words = "Las ventas de Campofrío en Carrefour crecieron un 4,2 % impulsadas por la distribución ".split()
+    frames = [f"data: {json.dumps({'type': 'delta', 'text': words[i % len(words)] + ' '})}\n\n".encode() for i in range(deltas)]
+    return frames + [b"event: done\ndata: {}\n\n"]
+
+
+def make_app(content_type: str, chunks: list):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type.encode())]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def run_once(middleware, encoding: str) -> int:
+    sent = 0
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", encoding.encode())]}
+    await middleware(scope, None, send)
+    return sent
+
+
+async def bench(name: str, content_type: str, chunks: list, requests: int):
+    middleware = CompressionMiddleware(make_app(content_type, chunks))
+    raw = sum(len(c) for c in chunks)
+    print(f"--- {name}: {raw} bytes uncompressed, {len(chunks)} body messages")
+    for encoding in ["identity", "gzip", "br", "zstd"]:
+        if encoding not in ("identity", *middleware.encodings):
+            print(f"{encoding:<9} (not installed)")
+            continue
+        cpu_start = time.process_time()
+        for _ in range(requests):
+            sent = await run_once(middleware, encoding)
+        cpu = (time.process_time() - cpu_start) / requests
+        print(f"{encoding:<9} bytes={sent:>8}  ratio={sent / raw:6.3f}  cpu/request={cpu * 1000:8.3f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    await bench("/chat/dax small (3 rows)", "application/json", [dax_payload(3)], args.requests)
+    await bench("/chat/dax (50 rows)", "application/json", [dax_payload(50)], args.requests)
+    await bench("/chat SSE (400 deltas)", "text/event-stream; charset=utf-8", sse_frames(400), args.requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
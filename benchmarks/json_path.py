@@ -0,0 +1,100 @@
+"""
+Micro-benchmark de la parte del camino de la petición que no depende del servicio upstream:
+lectura del cuerpo, serialización de la respuesta de /chat/dax y codificación de los frames SSE.
+
+Compara el comportamiento anterior (`json.loads` + `payload.get`, `JSONResponse` y `json.dumps`)
+con el actual (`ChatRequest.model_validate_json`, `FastJSONResponse` y `JsonCodec.dumps`, que usan
+orjson si está instalado). Resultados en peticiones (u operaciones) por segundo.
+
+    python benchmarks/json_path.py --requests 20000 --rows 50 --deltas 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from starlette.responses import JSONResponse  # noqa: E402
+from src.domain.models.DaxRequest import DaxRequest  # noqa: E402
+from src.infrastructure.rest.serialization import JsonCodec  # noqa: E402
+from src.infrastructure.rest.serialization.JsonCodec import FastJSONResponse  # noqa: E402
+from src.infrastructure.rest.server.common import sse_frame  # noqa: E402
+
+
+def dax_result(rows: int) -> dict:
+    query = ("EVALUATE SUMMARIZECOLUMNS('Client dimension'[Store chain], "
+             "\"Ventas\", [total_sales_euros]) ORDER BY [Ventas] DESC")
+    frame = {"columns": ["Store chain", "total_sales_euros", "sales_units"],
+             "dtypes": ["string", "float64", "int64"],
+             "data": [[f"CADENA {i}" for i in range(rows)], [1234.5 * i for i in range(rows)], [17 * i for i in range(rows)]],
+             "row_count": rows, "truncated": False}
+    preview = "\n".join(f"| CADENA {i} | {1234.5 * i} | {17 * i} |" for i in range(rows))
+    return {"final_response": "Las ventas del último mes ascendieron a 1.234.567 € (+4,2 %). " * 4,
+            "sql_queries": [query], "sql_data_previews": [preview], "sql_data_frames": [frame],
+            "data_retrieval_query": query}
+
+
+def baseline_sse_frame(evt: dict, event_id: str) -> bytes:
+    frame = f"id: {event_id}\n"
+    if evt.get("type") in ("dax", "data_preview"):
+        frame += f"event: {evt['type']}\n"
+    return (frame + f"data: {json.dumps(evt)}\n\n").encode("utf-8")
+
+
+def baseline_parse(body: bytes):
+    payload = json.loads(body)
+    thread_id = payload.get("thread_id")
+    message = payload.get("message")
+    preview_rows = payload.get("preview_rows", None)
+    if not thread_id or not message:
+        raise ValueError("thread_id and message are required")
+    if preview_rows is not None and (not isinstance(preview_rows, int) or preview_rows < 1):
+        raise ValueError("preview_rows must be a positive integer")
+    return thread_id, message, payload.get("assistant_id")
+
+
+def current_parse(body: bytes):
+    request = DaxRequest.model_validate_json(body)
+    return request.thread_id, request.message, request.assistant_id
+
+
+def rate(fn, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=50, help="filas de la vista previa de /chat/dax")
+    parser.add_argument("--deltas", type=int, default=200, help="eventos SSE por respuesta en streaming")
+    args = parser.parse_args()
+
+    body = json.dumps({"thread_id": "thread_abc123", "message": "Ventas de ayer por cadena en Carrefour",
+                       "assistant_id": "asst_123", "preview_rows": 10}).encode()
+    result = {"analysis result": dax_result(args.rows)}
+    words = "Las ventas de Campofrío en Carrefour crecieron un 4,2 % ".split()
+    events = [{"type": "delta", "text": words[i % len(words)] + " "} for i in range(args.deltas)]
+
+    stages = {
+        "parse body": (lambda: baseline_parse(body), lambda: current_parse(body)),
+        "/chat/dax response": (lambda: JSONResponse(result), lambda: FastJSONResponse(result)),
+        "SSE stream": (
+            lambda: [baseline_sse_frame(evt, f"s:{i}") for i, evt in enumerate(events)],
+            lambda: [sse_frame(evt, f"s:{i}") for i, evt in enumerate(events)],
+        ),
+    }
+    print(f"orjson: {'yes' if JsonCodec.orjson is not None else 'no (stdlib fallback)'}")
+    print(f"{'stage':<20} {'before/s':>12} {'after/s':>12} {'speedup':>8}")
+    for name, (before, after) in stages.items():
+        count = args.requests if name != "SSE stream" else max(args.requests // 20, 1)
+        before_rate, after_rate = rate(before, count), rate(after, count)
+        print(f"{name:<20} {before_rate:>12.0f} {after_rate:>12.0f} {after_rate / before_rate:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Prueba de carga en bucle abierto contra /chat, /chat/dax y /foundry/chat.
+
+Pensada para ejecutarse contra el backend apuntando al servidor de replay
+(TRAFFIC_REPLAY_URL), de modo que no consume cuota de Fabric ni de Foundry:
+
+    python -m src.infrastructure.replay.ReplayServer --cassettes recordings --token-rate 40
+    TRAFFIC_REPLAY_URL=http://127.0.0.1:9000 uvicorn main:app --port 8000
+    python benchmarks/load_test.py --endpoint all --rps 5 --duration 30
+
+Cada petición es un usuario virtual con su propio thread (`<prefijo><n>`): con un thread compartido las
+peticiones esperarían en la cola por thread del backend y se mediría esa cola, no el servidor.
+
+Informa de throughput, TTFT (tiempo hasta el primer delta de texto) y latencia total con percentiles.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+ENDPOINTS = {
+    "chat": "/chat",
+    "dax": "/chat/dax",
+    "foundry": "/foundry/chat",
+}
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+async def run_request(client: httpx.AsyncClient, path: str, payload: dict) -> dict:
+    start = time.perf_counter()
+    ttft = None
+    try:
+        if path == "/chat/dax":
+            response = await client.post(path, json=payload)
+            ok = response.status_code == 200
+            ttft = time.perf_counter() - start
+        else:
+            async with client.stream("POST", path, json=payload) as response:
+                ok = response.status_code == 200
+                async for line in response.aiter_lines():
+                    if ttft is None and line.startswith("data:") and '"delta"' in line:
+                        ttft = time.perf_counter() - start
+                    if line.startswith("data:") and '"error"' in line:
+                        ok = False
+    except httpx.HTTPError:
+        ok = False
+    return {"ok": ok, "ttft": ttft, "latency": time.perf_counter() - start}
+
+
+async def run_endpoint(base_url: str, name: str, rps: float, duration: float, payload: dict,
+                       thread_prefix: str) -> dict:
+    path = ENDPOINTS[name]
+    results = []
+    tasks = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        sent = 0
+        # Bucle abierto: las peticiones se lanzan a ritmo fijo aunque las anteriores no hayan terminado
+        while time.perf_counter() - start < duration:
+            target = start + sent / rps
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            user_payload = {**payload, "thread_id": f"{thread_prefix}{name}{sent}"}
+            tasks.append(asyncio.create_task(run_request(client, path, user_payload)))
+            sent += 1
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    latencies = [r["latency"] for r in ok]
+    return {
+        "endpoint": path,
+        "sent": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "ttft_p50": round(percentile(ttfts, 50), 3),
+        "ttft_p95": round(percentile(ttfts, 95), 3),
+        "ttft_p99": round(percentile(ttfts, 99), 3),
+        "latency_mean": round(statistics.fmean(latencies), 3) if latencies else None,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", choices=[*ENDPOINTS, "all"], default="all")
+    parser.add_argument("--rps", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--thread-prefix", default=f"thread_lt{int(time.time())}",
+                        help="prefijo de los threads de los usuarios virtuales (uno por petición)")
+    parser.add_argument("--assistant-id", default=None)
+    parser.add_argument("--message", default="¿Cuáles fueron las ventas del último mes?")
+    args = parser.parse_args()
+
+    payload = {"message": args.message}
+    if args.assistant_id:
+        payload["assistant_id"] = args.assistant_id
+
+    names = list(ENDPOINTS) if args.endpoint == "all" else [args.endpoint]
+    for name in names:
+        report = await run_endpoint(args.base_url, name, args.rps, args.duration, payload, args.thread_prefix)
+        print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Bloqueo del event loop con mucho logging: escritura síncrona en stdout desde el event loop
+(basicConfig, comportamiento anterior) frente a QueueHandler + QueueListener (LoggingConfig).
+
+Simula un stdout lento (p. ej. el recolector de logs del contenedor con backpressure) con una
+espera por escritura, lanza tareas que registran líneas sin parar y mide el retraso de un
+temporizador de 1 ms: ese retraso es el tiempo que el loop no pudo atender otras peticiones.
+
+    python benchmarks/logging_stall.py --tasks 20 --lines 500 --write-latency-us 200 --format json
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.logs.LoggingConfig import TEXT_FORMAT, configure_logging, stop_logging  # noqa: E402
+
+
+class SlowStream(io.TextIOBase):
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.lines = 0
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency_s)
+        self.lines += 1
+        return len(text)
+
+
+async def measure(tasks: int, lines: int) -> list[float]:
+    logger = logging.getLogger("benchmark")
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def worker(n: int):
+        for i in range(lines):
+            logger.info("🔗 Request %s: streaming delta %s for thread %s", n, i, "thread_abc123")
+            await asyncio.sleep(0)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.gather(*(worker(n) for n in range(tasks)))
+    done.set()
+    await tick
+    return lags
+
+
+def report(name: str, lags: list[float], elapsed: float):
+    lags = sorted(lags)
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0
+    print(f"{name:<14} {elapsed * 1000:>9.0f} {statistics.median(lags) * 1000:>9.2f} "
+          f"{p99 * 1000:>9.2f} {lags[-1] * 1000:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=500, help="líneas de log por tarea")
+    parser.add_argument("--write-latency-us", type=float, default=200, help="espera por escritura en stdout")
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    args = parser.parse_args()
+    latency = args.write_latency_us / 1e6
+    root = logging.getLogger()
+
+    print(f"{args.tasks} tasks x {args.lines} lines, {args.write_latency_us:g} µs per write")
+    print(f"{'mode':<14} {'total ms':>9} {'p50 lag':>9} {'p99 lag':>9} {'max lag':>9}")
+
+    stream = SlowStream(latency)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    start = time.perf_counter()
+    lags = asyncio.run(measure(args.tasks, args.lines))
+    report("basicConfig", lags, time.perf_counter() - start)
+    root.removeHandler(handler)
+
+    stream = SlowStream(latency)
+    configure_logging("INFO", args.format, stream=stream)
+    start = time.perf_counter()
+    lags = asyncio.run(measure(args.tasks, args.lines))
+    report("QueueHandler", lags, time.perf_counter() - start)
+    stop_logging()
+    print(f"(the listener wrote {stream.lines} lines after draining the queue)")
+
+
+if __name__ == "__main__":
+    main()
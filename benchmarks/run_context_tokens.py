@@ -0,0 +1,57 @@
+"""
+Tokens de entrada por turno con la fecha en cada mensaje (comportamiento anterior) o como
+`additional_instructions` del run (RunContextPrompt).
+
+Con la fecha en el mensaje, el historial guarda una copia por turno y el run N la reenvía N veces;
+como instrucción del run se envía una sola vez. Usa la misma estimación que ThreadContextManager
+(~4 caracteres por token); en producción, comparar el histograma `chat_turn_input_tokens`.
+
+    python benchmarks/run_context_tokens.py --turns 20 --question-chars 80 --answer-chars 600
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.repositories.prompts.RunContextPrompt import RunContextPrompt  # noqa: E402
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4 if text else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--question-chars", type=int, default=80)
+    parser.add_argument("--answer-chars", type=int, default=600)
+    args = parser.parse_args()
+
+    context = RunContextPrompt().get_prompt()
+    question = "x" * args.question_chars
+    answer = "y" * args.answer_chars
+
+    before_history = 0
+    after_history = 0
+    total_before = 0
+    total_after = 0
+    print(f"context instruction: ~{estimate_tokens(context)} tokens")
+    print(f"{'turn':>4} {'before':>8} {'after':>8} {'saved':>7}")
+    for turn in range(1, args.turns + 1):
+        before_history += estimate_tokens(question + "\n" + context + "\n")
+        after_history += estimate_tokens(question)
+        before = before_history
+        after = after_history + estimate_tokens(context)
+        total_before += before
+        total_after += after
+        print(f"{turn:>4} {before:>8} {after:>8} {before - after:>7}")
+        before_history += estimate_tokens(answer)
+        after_history += estimate_tokens(answer)
+
+    print(f"--- {args.turns} turns: {total_before} vs {total_after} input tokens "
+          f"({100 * (total_before - total_after) / total_before:.1f}% saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark de la lectura de run steps en runs con muchas llamadas a herramientas.
+
+Simula un cliente con N steps (cada uno con una llamada a función con DAX y una salida JSON) y
+latencia por página, y compara:
+- single list: una sola llamada a `steps.list` con el límite por defecto (comportamiento anterior),
+- sequential: todas las páginas y después la extracción,
+- pipelined: `RunStepPaginator`, extrayendo cada página mientras se descarga la siguiente.
+
+    python benchmarks/run_steps_pagination.py --steps 50 200 --page-size 20 --latency 0.15
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.fabric.RunStepPaginator import RunStepPaginator  # noqa: E402
+from src.infrastructure.sql.SqlExtractor import SqlExtractor  # noqa: E402
+
+
+def make_step(index: int, rows: int):
+    dax = f"EVALUATE TOPN({index + 1}, SUMMARIZECOLUMNS('Product'[Brand], \"Sales\", [Total Sales]))"
+    data = [{"Brand": f"Brand {i}", "Sales": 1000.5 + i} for i in range(rows)]
+    tool_call = SimpleNamespace(
+        type="function",
+        function=SimpleNamespace(arguments=json.dumps({"query": dax})),
+        output=json.dumps({"sql": dax, "data": data}),
+    )
+    return SimpleNamespace(id=f"step_{index:04d}", step_details=SimpleNamespace(tool_calls=[tool_call]))
+
+
+class FakeStepsApi:
+    """
+    Imita `client.beta.threads.runs.steps.list` con paginación por cursor y latencia fija.
+    """
+
+    def __init__(self, steps: list, latency: float):
+        self.steps = steps
+        self.latency = latency
+        self.calls = 0
+
+    def list(self, thread_id, run_id, limit=20, after=None, include=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        start = 0
+        if after is not None:
+            start = next(i for i, step in enumerate(self.steps) if step.id == after) + 1
+        page = self.steps[start:start + limit]
+        return SimpleNamespace(data=page, has_more=start + limit < len(self.steps))
+
+
+def make_client(steps: list, latency: float):
+    api = FakeStepsApi(steps, latency)
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=SimpleNamespace(steps=api)))), api
+
+
+def single_list(client, extractor):
+    page = client.beta.threads.runs.steps.list(thread_id="thread", run_id="run")
+    return extractor._extract_sql_queries_with_data(page)
+
+
+def sequential(client, extractor, page_size):
+    all_steps = []
+    for page in RunStepPaginator(client, page_size=page_size, include=[]).pages("thread", "run"):
+        all_steps.extend(page)
+    return extractor._extract_sql_queries_with_data(SimpleNamespace(data=all_steps))
+
+
+def pipelined(client, extractor, page_size):
+    analysis = extractor._new_analysis()
+    for page in RunStepPaginator(client, page_size=page_size, include=[]).pages("thread", "run"):
+        extractor._accumulate_steps(analysis, page)
+    return extractor._finish_analysis(analysis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, nargs="+", default=[50, 200], help="Run steps per run")
+    parser.add_argument("--page-size", type=int, default=20, help="Steps per page")
+    parser.add_argument("--latency", type=float, default=0.15, help="Seconds per steps.list call")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows in each tool call output")
+    args = parser.parse_args()
+
+    extractor = SqlExtractor()
+    for count in args.steps:
+        steps = [make_step(i, args.rows) for i in range(count)]
+        print(f"--- {count} steps, page size {args.page_size}, {args.latency * 1000:.0f} ms per page")
+        cases = {
+            "single list (default limit)": lambda client: single_list(client, extractor),
+            "sequential pages": lambda client: sequential(client, extractor, args.page_size),
+            "pipelined RunStepPaginator": lambda client: pipelined(client, extractor, args.page_size),
+        }
+        for label, fn in cases.items():
+            client, api = make_client(steps, args.latency)
+            start = time.perf_counter()
+            result = fn(client)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<30} steps={len(result['data_previews']):4d}  queries={len(result['queries']):4d}  "
+                  f"calls={api.calls:3d}  time={elapsed:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
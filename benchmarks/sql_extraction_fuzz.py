@@ -0,0 +1,124 @@
+"""
+Corpus de fuzzing para la extracción de SQL/DAX con tiempo máximo por llamada (ExtractionPool).
+
+Genera entradas patológicas para las regex `.*?` con DOTALL de SqlExtractor y para el formateador de DAX
+(SELECT sin FROM, sentencias sin terminador, paréntesis muy anidados, strings sin cerrar...) y mutaciones
+aleatorias de salidas reales. Cada entrada pasa por la misma ruta que en producción (`_extract_from_tool_call`,
+`_format_queries`, `_regex_extract_sql_queries`) y se comprueba que ninguna llamada supera el tiempo máximo
+más un margen. Sale con código 1 si alguna lo supera.
+
+    python benchmarks/sql_extraction_fuzz.py --timeout 1 --sizes 1 4 --mutations 50
+    python benchmarks/sql_extraction_fuzz.py --inline --sizes 1   # tiempos sin pool, para comparar
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.sql.ExtractionPool import ExtractionPool  # noqa: E402
+from src.infrastructure.sql.SqlExtractor import SqlExtractor  # noqa: E402
+
+SEED_OUTPUT = json.dumps({
+    "sql": "EVALUATE SUMMARIZECOLUMNS('Store'[Chain], \"Sales\", [Total Sales])",
+    "data": [{"Chain": "CARREFOUR HIPER", "Sales": 12345.6}, {"Chain": "ALCAMPO", "Sales": 9876.5}],
+})
+KEYWORDS = ["SELECT ", "FROM ", "INSERT INTO ", "UPDATE ", " SET ", "DELETE FROM ", "EVALUATE ", "FILTER(",
+            "(", ")", ",", "'", '"', "//", "\\n", "\n", "{", "}", ";", "|", "```"]
+
+
+def pathological(size_mb: int) -> dict:
+    n = size_mb * 1024 * 1024
+    return {
+        "select without from": "SELECT a " * (n // 9),
+        "from without terminator": ("SELECT a FROM b " + "x " * 64) * (n // 144),
+        "update without set": "UPDATE t " * (n // 9),
+        "unclosed json string": '{"sql": "' + "SELECT " * (n // 7),
+        "deep dax nesting": "EVALUATE " + "FILTER(" * (n // 16) + ")" * (n // 16),
+        "dax commas": "EVALUATE SUMMARIZECOLUMNS(" + "'T'[c], " * (n // 8) + ")",
+        "unclosed dax string": "EVALUATE FILTER('" + "a, (b) " * (n // 7),
+        "pipe table no rows": "| h |\n" * (n // 6),
+    }
+
+
+def mutations(count: int, size_kb: int, rng: random.Random) -> dict:
+    corpus = {}
+    for i in range(count):
+        parts = [SEED_OUTPUT]
+        while sum(len(p) for p in parts) < size_kb * 1024:
+            parts.append(rng.choice(KEYWORDS) * rng.randint(1, 200))
+            if rng.random() < 0.1:
+                parts.append(SEED_OUTPUT[:rng.randint(0, len(SEED_OUTPUT))])
+        rng.shuffle(parts)
+        corpus[f"mutation {i}"] = "".join(parts)
+    return corpus
+
+
+def cases(extractor: SqlExtractor, text: str) -> dict:
+    tool_call = SimpleNamespace(function=SimpleNamespace(arguments=json.dumps({"query": text[:200]})), output=text)
+    steps = SimpleNamespace(data=[SimpleNamespace(step_details=SimpleNamespace(tool_calls=[tool_call]))])
+    return {
+        "tool call": lambda: extractor._extract_from_tool_call(tool_call),
+        "format": lambda: extractor._format_queries([text]),
+        "regex fallback": lambda: extractor._regex_extract_sql_queries(steps),
+    }
+
+
+def total_timeouts(pool: ExtractionPool) -> float:
+    return sum(value for _, _, value in pool.timeouts_total.samples())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4], help="Pathological input sizes in MB")
+    parser.add_argument("--mutations", type=int, default=50, help="Random mutations of a real output")
+    parser.add_argument("--mutation-kb", type=int, default=256, help="Size of each mutation in KB")
+    parser.add_argument("--timeout", type=float, default=1.0, help="SQL_EXTRACTION_TIMEOUT_S for the run")
+    parser.add_argument("--slack", type=float, default=0.5, help="Allowed seconds over the timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inline", action="store_true", help="Run in-process without a deadline")
+    args = parser.parse_args()
+
+    os.environ["SQL_EXTRACTION_TIMEOUT_S"] = str(args.timeout)
+    if args.inline:
+        os.environ["SQL_EXTRACTION_WORKERS"] = "0"
+    pool = ExtractionPool()
+    extractor = SqlExtractor(pool=None if args.inline else pool)
+    if pool.enabled:
+        pool.start()
+
+    corpus = {}
+    for size in args.sizes:
+        corpus.update({f"{name} ({size} MB)": text for name, text in pathological(size).items()})
+    corpus.update(mutations(args.mutations, args.mutation_kb, random.Random(args.seed)))
+
+    budget = args.timeout + args.slack
+    worst = 0.0
+    failures = []
+    for name, text in corpus.items():
+        for case, fn in cases(extractor, text).items():
+            timeouts_before = total_timeouts(pool)
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            cut = total_timeouts(pool) > timeouts_before
+            worst = max(worst, elapsed)
+            if not args.inline and elapsed > budget:
+                failures.append((name, case, elapsed))
+            if cut or elapsed > args.timeout / 2 or not name.startswith("mutation"):
+                print(f"{name:<38} {case:<15} time={elapsed:7.3f} s{'  (deadline, partial result)' if cut else ''}")
+
+    print(f"--- {len(corpus)} inputs, worst call {worst:.3f} s, budget {budget:.3f} s, "
+          f"{int(pool.restarts_total.value())} pool restarts")
+    if failures:
+        for name, case, elapsed in failures:
+            print(f"OVER BUDGET: {name} / {case}: {elapsed:.3f} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark de memoria de las vistas previas de SqlExtractor con salidas de herramienta de 10-100 MB.
+
+Compara el pico de memoria (tracemalloc) y el tiempo de:
+- baseline: `json.loads` sobre la salida completa y recorte a 10 filas (comportamiento anterior),
+- streaming: `_extract_structured_data_from_output` + `_extract_sql_from_output` actuales.
+
+    python benchmarks/sql_extractor_memory.py --sizes 10 50 100
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.sql.SqlExtractor import SqlExtractor  # noqa: E402
+
+
+def make_records_output(size_mb: int, wrapped: bool) -> str:
+    row = {"Store chain": "CARREFOUR HIPER", "Product name": "Pechuga de pavo finas lonchas 120g",
+           "total_sales_euros": 12345.678, "sales_units": 4321, "Month and year period": 202509}
+    row_json = json.dumps(row)
+    count = size_mb * 1024 * 1024 // (len(row_json) + 2)
+    body = "[" + ",".join([row_json] * count) + "]"
+    if wrapped:
+        return '{"sql": "EVALUATE SUMMARIZECOLUMNS(\'Product\'[Brand])", "data": ' + body + "}"
+    return body
+
+
+def make_markdown_output(size_mb: int) -> str:
+    line = "| CARREFOUR HIPER | Pechuga de pavo finas lonchas 120g | 12345.678 | 4321 |\n"
+    count = size_mb * 1024 * 1024 // len(line)
+    return "| Store chain | Product name | total_sales_euros | sales_units |\n|---|---|---|---|\n" + line * count
+
+
+def baseline(output: str) -> list:
+    try:
+        data = json.loads(output)
+    except json.JSONDecodeError:
+        return output.split("\n")[:15]
+    if isinstance(data, dict):
+        data = data.get("data", [])
+    return data[:10]
+
+
+def measure(label: str, fn, output: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(output)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<38} peak={peak / 1024 / 1024:9.2f} MB  time={elapsed:7.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100], help="Output sizes in MB")
+    args = parser.parse_args()
+
+    extractor = SqlExtractor()
+
+    def streaming(output: str):
+        tool_call = SimpleNamespace(output=output)
+        extractor._extract_structured_data_from_output(tool_call)
+        extractor._extract_sql_from_output(tool_call)
+
+    for size in args.sizes:
+        outputs = {
+            "json list": make_records_output(size, wrapped=False),
+            "json {sql, data}": make_records_output(size, wrapped=True),
+            "markdown table": make_markdown_output(size),
+        }
+        for kind, output in outputs.items():
+            print(f"--- {size} MB {kind} ({len(output) / 1024 / 1024:.1f} MB payload)")
+            measure("baseline (json.loads / split)", baseline, output)
+            measure("streaming preview", streaming, output)
+            del output
+        del outputs
+
+
+if __name__ == "__main__":
+    main()
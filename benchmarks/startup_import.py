@@ -0,0 +1,84 @@
+"""
+Tiempo de importación de la aplicación (arranque en frío de cada worker) con `python -X importtime`.
+
+Importa `chat_server` en un proceso nuevo para cada configuración de backends y muestra el tiempo
+total (el mínimo de `--repeat` ejecuciones), los módulos más pesados y qué SDK se han cargado.
+Termina con código 1 si alguna configuración supera `--max-ms` o si algún SDK de `--forbid` se
+importa al arrancar: los SDK de los backends solo deben cargarse con la primera petición.
+
+    python benchmarks/startup_import.py --repeat 5 --max-ms 1500 --top 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+CONFIGURATIONS = {
+    "none": {},
+    "fabric": {"CHAT_BACKENDS": "fabric"},
+    "foundry": {"CHAT_BACKENDS": "foundry"},
+    "fabric,foundry": {"CHAT_BACKENDS": "fabric,foundry"},
+}
+DEFAULT_FORBID = "openai,azure.ai.projects,azure.ai.agents,azure.identity,pandas"
+
+
+def import_profile(extra_env: dict) -> dict[str, int]:
+    """
+    Tiempo acumulado (µs) de cada módulo importado.
+    """
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("CHAT_BACKENDS", "TRAFFIC_REPLAY_URL", "FABRIC_DATA_AGENT_URL", "PROJECT_ENDPOINT")}
+    env.update(extra_env)
+    env["LOG_LEVEL"] = "WARNING"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.infrastructure.rest.server.chat_server"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=1500, help="límite de tiempo de importación por configuración")
+    parser.add_argument("--top", type=int, default=8, help="módulos más pesados a mostrar")
+    parser.add_argument("--forbid", default=DEFAULT_FORBID, help="SDK que no deben importarse al arrancar")
+    args = parser.parse_args()
+    forbidden = [name for name in args.forbid.split(",") if name]
+
+    failures = []
+    for name, env in CONFIGURATIONS.items():
+        runs = [import_profile(env) for _ in range(args.repeat)]
+        best = min(runs, key=lambda modules: modules.get("src.infrastructure.rest.server.chat_server", 0))
+        total_ms = best.get("src.infrastructure.rest.server.chat_server", 0) / 1000
+        loaded = [sdk for sdk in forbidden if sdk in best]
+
+        print(f"== backends={name}: {total_ms:.0f} ms, {len(best)} modules")
+        for module, micros in sorted(best.items(), key=lambda item: -item[1])[1:args.top + 1]:
+            print(f"   {micros / 1000:>8.1f} ms  {module}")
+        print(f"   SDKs loaded at startup: {', '.join(loaded) or 'none'}")
+
+        if total_ms > args.max_ms:
+            failures.append(f"backends={name}: {total_ms:.0f} ms > {args.max_ms:.0f} ms")
+        if loaded:
+            failures.append(f"backends={name}: imports {', '.join(loaded)} at startup")
+
+    if failures:
+        print("FAIL\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Coste de entregar una respuesta completa a un cliente programático: por SSE (un frame por delta, que el
+cliente tiene que separar, decodificar y volver a juntar) o por `/chat/sync` (los deltas se juntan en el
+servidor y se envía un solo JSON). No incluye el tiempo del run upstream, que es el mismo en los dos casos.
+
+Muestra las respuestas por segundo de servidor + cliente y los bytes enviados por respuesta.
+
+    python benchmarks/sync_reply.py --replies 2000 --deltas 300
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.domain.models.ChatResponse import ChatResponse  # noqa: E402
+from src.domain.models.ChatUsage import ChatUsage  # noqa: E402
+from src.infrastructure.rest.serialization.JsonCodec import dumps, loads  # noqa: E402
+from src.infrastructure.rest.server.common import sse_frame  # noqa: E402
+
+
+def sse_reply(events: list) -> tuple[str, int]:
+    body = b"".join(sse_frame(evt, f"0123456789abcdef0123456789abcdef:{i}") for i, evt in enumerate(events))
+    body += b"event: done\ndata: {}\n\n"
+    text = []
+    for frame in body.split(b"\n\n"):
+        for line in frame.split(b"\n"):
+            if line.startswith(b"data: "):
+                evt = loads(line[6:])
+                if evt.get("type") == "delta":
+                    text.append(evt["text"])
+    return "".join(text), len(body)
+
+
+def sync_reply(events: list) -> tuple[str, int]:
+    chunks = [evt["text"] for evt in events if evt.get("type") == "delta"]
+    reply = ChatResponse(
+        agent_reply="".join(chunks), thread_id="thread_abc123",
+        usage=ChatUsage(prompt_tokens=1830, completion_tokens=212, total_tokens=2042),
+        elapsed_ms=6120.4, first_token_ms=2210.8, chunks=len(chunks),
+    )
+    body = dumps(reply.model_dump(exclude_none=True))
+    return loads(body)["agent_reply"], len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=2000)
+    parser.add_argument("--deltas", type=int, default=300, help="deltas de texto por respuesta")
+    args = parser.parse_args()
+
+    words = "Las ventas de Campofrío en Carrefour crecieron un 4,2 % respecto a la semana anterior ".split()
+    events = [{"type": "delta", "text": words[i % len(words)] + " "} for i in range(args.deltas)]
+    events.append({"done": True})
+    assert sse_reply(events)[0] == sync_reply(events)[0]
+
+    print(f"{'path':<12} {'replies/s':>10} {'bytes/reply':>12}")
+    for name, fn in (("SSE", sse_reply), ("/chat/sync", sync_reply)):
+        start = time.perf_counter()
+        for _ in range(args.replies):
+            _, size = fn(events)
+        rate = args.replies / (time.perf_counter() - start)
+        print(f"{name:<12} {rate:>10.0f} {size:>12}")
+
+
+if __name__ == "__main__":
+    main()
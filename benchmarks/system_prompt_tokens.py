@@ -0,0 +1,40 @@
+"""
+Tokens del system prompt del agente en cada nivel de compresión de PromptCompiler y nivel elegido
+para cada presupuesto. Usa tiktoken si está instalado; si no, ~4 caracteres por token.
+
+    python benchmarks/system_prompt_tokens.py --budgets 6000 4000 3000
+    python benchmarks/system_prompt_tokens.py --show names   # imprime el prompt de un nivel
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.infrastructure.repositories.prompts.PromptCompiler import PromptCompiler  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, nargs="*", default=[6000, 4000, 3000])
+    parser.add_argument("--show", choices=PromptCompiler.LEVELS, help="Print the prompt rendered at this level")
+    args = parser.parse_args()
+
+    compiler = PromptCompiler()
+    if args.show:
+        print(compiler.render(args.show).text)
+        return
+
+    full = compiler.render("full").tokens
+    print(f"catalog {compiler.catalog.version}")
+    for level in compiler.LEVELS:
+        compiled = compiler.render(level)
+        print(f"{level:<8} version={compiled.version}  tokens={compiled.tokens:6d}  "
+              f"chars={len(compiled.text):6d}  saved={100 * (full - compiled.tokens) / full:5.1f}%")
+    for budget in args.budgets:
+        compiled = compiler.compile(budget)
+        print(f"budget {budget:6d} -> {compiled.level} ({compiled.tokens} tokens)")
+
+
+if __name__ == "__main__":
+    main()
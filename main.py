@@ -1,5 +1,10 @@
-import uvicorn
-from src.infrastructure.rest.server.chat_server import app
+from src.infrastructure.logs.LoggingConfig import configure_logging
+
+# Antes de importar la aplicación, para que los logs de carga de los módulos ya salgan por la cola
+configure_logging()
+
+import uvicorn  # noqa: E402
+from src.infrastructure.rest.server.chat_server import app  # noqa: E402
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,95 @@
+from src.application.UseCase import UseCase
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+import asyncio
+import threading
+import time
+
+
+class RunQuestionBatchUseCase(UseCase):
+    """
+    Ejecuta una lista de preguntas independientes, cada una en un thread nuevo del pool, con como
+    mucho `concurrency` runs a la vez. Genera el resultado de cada pregunta en cuanto termina (no en
+    el orden de entrada); los fallos se informan por pregunta sin interrumpir el resto.
+
+    Si el consumidor se va, las preguntas pendientes no se lanzan y los runs en curso se cancelan en
+    upstream. Con `track` el lote se registra para la parada ordenada del servidor, que puede abortarlo:
+    las preguntas sin terminar se informan como error.
+    """
+
+    def __init__(self, dax_service, thread_pool):
+        self.dax_service = dax_service
+        self.thread_pool = thread_pool
+
+    async def execute(self, questions: list, concurrency: int, preview_rows: Optional[int] = None,
+                      assistant_id: Optional[str] = None,
+                      track: Optional[Callable[[asyncio.Future, Callable[[], Awaitable[None]]], None]] = None):
+        """
+        :param questions: Lista de {"id": ..., "message": ...}.
+        :param assistant_id: Asistente de todas las preguntas (por defecto, el compartido).
+        :param track: Recibe un futuro que termina con el lote y la corrutina que lo aborta (ver ShutdownCoordinator.track).
+        :return: Generador asíncrono de {"index", "id", "status": "ok"|"error", "result"|"error", "elapsed_s"}.
+        """
+        if not questions:
+            return
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        results = asyncio.Queue()
+        # Hilos propios: get_DAX_query bloquea mientras sondea el run y no debe agotar el executor por defecto
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="question-batch")
+        self.thread_pool.prefill(min(concurrency, len(questions)))
+        # Threads del pool con un run en curso, para poder cancelarlos en upstream
+        in_flight = set()
+        stopped = threading.Event()
+
+        async def run(index: int, question: dict):
+            async with semaphore:
+                start = time.perf_counter()
+                item = {"index": index, "id": question.get("id")}
+                try:
+                    result = await loop.run_in_executor(
+                        executor, self._run_one, question["message"], preview_rows, assistant_id, in_flight, stopped
+                    )
+                    item.update(status="ok", result=result)
+                except Exception as e:
+                    item.update(status="error", error=str(e))
+                item["elapsed_s"] = round(time.perf_counter() - start, 3)
+                await results.put(item)
+
+        async def abort():
+            stopped.set()
+            await asyncio.gather(
+                *(asyncio.to_thread(self.dax_service.cancel_run, thread_id) for thread_id in list(in_flight)),
+                return_exceptions=True,
+            )
+
+        tasks = [asyncio.create_task(run(i, q)) for i, q in enumerate(questions)]
+        if track is not None:
+            track(asyncio.gather(*tasks, return_exceptions=True), abort)
+        try:
+            for _ in range(len(tasks)):
+                yield await results.get()
+        finally:
+            # Si el cliente se va, no se lanzan más runs y los que están en curso se cancelan en upstream,
+            # sin esperar: la respuesta ya está cerrada
+            stopped.set()
+            for task in tasks:
+                task.cancel()
+            for thread_id in list(in_flight):
+                loop.run_in_executor(None, self.dax_service.cancel_run, thread_id)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_one(self, message: str, preview_rows: Optional[int], assistant_id: Optional[str],
+                 in_flight: set, stopped: threading.Event) -> dict:
+        if stopped.is_set():
+            raise RuntimeError("Batch interrupted before this question was run")
+        thread_id = self.thread_pool.acquire()
+        in_flight.add(thread_id)
+        try:
+            return self.dax_service.get_DAX_query(
+                thread_id, message, preview_rows=preview_rows, assistant_id=assistant_id
+            )
+        finally:
+            in_flight.discard(thread_id)
+            self.thread_pool.release(thread_id)
@@ -0,0 +1,4 @@
+
+class ChatRunException(Exception):
+    """Custom exception raised when the agent run fails or returns an error instead of a reply."""
+    pass
@@ -0,0 +1,4 @@
+
+class ServerDrainingException(Exception):
+    """Custom exception raised when the server is shutting down and no longer accepts new chats."""
+    pass
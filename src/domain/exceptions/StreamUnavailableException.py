@@ -0,0 +1,7 @@
+class StreamUnavailableException(Exception):
+    """Custom exception raised when a Last-Event-ID names a stream this process cannot resume."""
+
+    def __init__(self, message: str, other_worker: bool = False):
+        super().__init__(message)
+        # El stream es de otro proceso: otro worker que puede reanudarlo, o uno que ya no existe
+        self.other_worker = other_worker
@@ -0,0 +1,4 @@
+
+class ThreadBusyException(Exception):
+    """Custom exception raised when a thread already has a run in progress and the request cannot wait for it."""
+    pass
@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from src.domain.models.DaxRequest import MAX_PREVIEW_ROWS
+from typing import Annotated, Optional, Union
+
+
+class BatchQuestion(BaseModel):
+    """
+    Pregunta de `/chat/batch` con identificador propio (por defecto, su posición en la lista).
+    """
+    id: Optional[Union[str, int]] = None
+    message: str = Field(min_length=1)
+
+
+class BatchRequest(BaseModel):
+    """
+    Cuerpo de `/chat/batch`. Cada pregunta es un texto o un BatchQuestion. Los límites de `questions`
+    y `concurrency` se configuran por entorno y los comprueba la ruta.
+    """
+    questions: list[Union[Annotated[str, Field(min_length=1)], BatchQuestion]] = Field(min_length=1)
+    assistant_id: Optional[str] = None
+    concurrency: Optional[int] = Field(default=None, ge=1, strict=True)
+    preview_rows: Optional[int] = Field(default=None, ge=1, le=MAX_PREVIEW_ROWS, strict=True)
@@ -1,6 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 
 
 class ChatRequest(BaseModel):
-    thread_id: str
-    message: str
\ No newline at end of file
+    """
+    Cuerpo de `/chat` y `/foundry/chat` (Foundry ignora `assistant_id` e `include_dax`).
+    """
+    thread_id: str = Field(min_length=1)
+    message: str = Field(min_length=1)
+    assistant_id: Optional[str] = None
+    include_dax: bool = False
@@ -1,5 +1,16 @@
 from pydantic import BaseModel
+from src.domain.models.ChatUsage import ChatUsage
+from typing import Optional
 
 
 class ChatResponse(BaseModel):
-    agent_reply: str
\ No newline at end of file
+    """
+    Respuesta completa de un turno (`/chat/sync`): el texto, los tokens del run y los tiempos
+    (total y hasta el primer delta, en ms) y el número de deltas que se han juntado.
+    """
+    agent_reply: str
+    thread_id: Optional[str] = None
+    usage: Optional[ChatUsage] = None
+    elapsed_ms: Optional[float] = None
+    first_token_ms: Optional[float] = None
+    chunks: Optional[int] = None
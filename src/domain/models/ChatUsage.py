@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class ChatUsage(BaseModel):
+    """
+    Tokens consumidos por un run (`usage` del run de Fabric o Foundry).
+    """
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Any
+
+
+class DataPreview(BaseModel):
+    """
+    Vista previa tipada y columnar del resultado de una consulta.
+    `data[i]` contiene los valores de la columna `columns[i]`, de tipo `dtypes[i]`.
+    """
+    columns: list[str]
+    dtypes: list[str]
+    data: list[list[Any]]
+    row_count: int
+    truncated: bool = False
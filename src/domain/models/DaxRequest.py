@@ -0,0 +1,13 @@
+from pydantic import Field
+from src.domain.models.ChatRequest import ChatRequest
+from typing import Optional
+
+# Filas como mucho por vista previa que puede pedir una petición
+MAX_PREVIEW_ROWS = 1000
+
+
+class DaxRequest(ChatRequest):
+    """
+    Cuerpo de `/chat/dax`. `preview_rows` limita las filas de las vistas previas (hasta MAX_PREVIEW_ROWS).
+    """
+    preview_rows: Optional[int] = Field(default=None, ge=1, le=MAX_PREVIEW_ROWS, strict=True)
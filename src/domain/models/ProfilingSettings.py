@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+
+
+class ProfilingSettings(BaseModel):
+    """
+    Cuerpo de `PUT /admin/profiling`. Solo se cambian los campos presentes.
+    """
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    endpoints: Optional[list[str]] = None
+    output_dir: Optional[str] = None
+    output_format: Optional[Literal["collapsed", "speedscope"]] = None
+    interval_ms: Optional[float] = Field(default=None, gt=0)
+    max_duration: Optional[float] = Field(default=None, gt=0)
+    max_concurrent: Optional[int] = Field(default=None, ge=1)
@@ -0,0 +1,44 @@
+from src.domain.models.ChatResponse import ChatResponse
+from src.domain.models.ChatUsage import ChatUsage
+from src.domain.exceptions.ChatRunException import ChatRunException
+from typing import Optional
+import time
+
+
+class ChatReplyBuilder:
+    """
+    Junta los eventos de un run (ver ChatService.chat_stream) en una sola ChatResponse, con los
+    tokens y los tiempos del run. Lo usan las rutas /chat/sync sobre el RunStream del run (ver collect_reply).
+    """
+
+    def __init__(self, thread_id: str, start: Optional[float] = None):
+        self.thread_id = thread_id
+        self.start = time.perf_counter() if start is None else start
+        self.first_token = None
+        self.chunks = []
+        self.usage = None
+
+    def add(self, evt: dict):
+        """
+        Añade un evento. Lanza ChatRunException si es de error.
+        """
+        if evt.get("type") == "delta":
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.chunks.append(evt["text"])
+        elif "error" in evt or evt.get("type") == "error":
+            raise ChatRunException(evt.get("error") or evt.get("text"))
+        elif evt.get("done") or evt.get("type") == "done":
+            self.usage = evt.get("usage")
+
+    def build(self) -> ChatResponse:
+        return ChatResponse(
+            agent_reply="".join(self.chunks),
+            thread_id=self.thread_id,
+            usage=ChatUsage(**self.usage) if self.usage else None,
+            elapsed_ms=round((time.perf_counter() - self.start) * 1000, 1),
+            first_token_ms=(
+                round((self.first_token - self.start) * 1000, 1) if self.first_token is not None else None
+            ),
+            chunks=len(self.chunks),
+        )
@@ -1,16 +1,23 @@
 from src.domain.providers.LLMProvider import LLMProvider
-from src.domain.models.ChatResponse import ChatResponse
+from typing import Iterator, Optional
 
 class ChatService:
     def __init__(self, provider: LLMProvider):
         self.provider = provider
 
-    
-    def chat(self, message: str, thread_id: str) -> ChatResponse:
+    def chat_stream(self, thread_id: str, user_message: str) -> Iterator[dict]:
         """
-        Envía un mensaje al agente LLM usando el proveedor configurado.
-        :param message: Mensaje de entrada.
-        :param context: Contexto opcional para la conversación.
-        :return: Respuesta del agente LLM.
+        Eventos del run: `{"type": "delta", "text": ...}` con cada fragmento, un evento de error
+        (`{"error": ...}` o `{"type": "error", "text": ...}`) y el de fin, que puede llevar `usage`.
         """
-        return ChatResponse(agent_reply='')
\ No newline at end of file
+        raise NotImplementedError("Subclasses must implement chat_stream.")
+
+    @staticmethod
+    def usage_of(run) -> Optional[dict]:
+        """
+        `usage` de un run del SDK como diccionario, o None si el run no lo trae.
+        """
+        usage = getattr(run, "usage", None)
+        if usage is None:
+            return None
+        return {name: getattr(usage, name, None) for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
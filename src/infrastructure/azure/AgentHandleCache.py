@@ -0,0 +1,115 @@
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AgentHandleCache:
+    """
+    Copia local de la definición de un agente, renovada cada `ttl` segundos sin pasar por el camino
+    de la petición (stale-while-revalidate).
+
+    - Con menos de `ttl` segundos se devuelve tal cual.
+    - Caducada, se sigue devolviendo mientras se renueva en segundo plano (una sola renovación a la
+      vez). Si la renovación falla, se reintenta pasados `retry` segundos.
+    - Con más de `ttl + max_stale` segundos, o si aún no hay copia, se carga en el momento: las
+      peticiones simultáneas esperan a la misma carga. Si falla y hay copia, se devuelve la copia.
+    """
+
+    def __init__(self, loader: Callable[[], Any], ttl: float, max_stale: float, retry: float, name: str = "agent"):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry = retry
+        self.name = name
+        self._value = None
+        self._loaded_at: Optional[float] = None
+        self._next_refresh = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-refresh")
+
+        metrics = MetricsRegistry()
+        self.lookups_total = metrics.counter(
+            "agent_cache_lookups_total", "Agent handle lookups, by cache result (fresh, stale or load)")
+        self.refresh_total = metrics.counter(
+            "agent_cache_refresh_total", "Agent handle loads from the service, by outcome")
+        metrics.gauge("agent_cache_age_seconds", "Age of the cached agent handle",
+                      callback=lambda: self.age() or 0.0)
+
+    def age(self) -> Optional[float]:
+        loaded_at = self._loaded_at
+        return None if loaded_at is None else time.monotonic() - loaded_at
+
+    def get(self) -> Any:
+        age = self.age()
+        if age is not None and age < self.ttl:
+            self.lookups_total.inc(cache=self.name, result="fresh")
+            return self._value
+        if age is not None and age < self.ttl + self.max_stale:
+            self.lookups_total.inc(cache=self.name, result="stale")
+            self._schedule_refresh()
+            return self._value
+
+        self.lookups_total.inc(cache=self.name, result="load")
+        with self._lock:
+            # Otra petición puede haberlo cargado mientras se esperaba el lock
+            age = self.age()
+            if age is not None and age < self.ttl + self.max_stale:
+                return self._value
+            if self._value is not None and time.monotonic() < self._next_refresh:
+                return self._value
+            try:
+                self._load()
+            except Exception as e:
+                if self._value is None:
+                    raise
+                logger.warning("⚠️ Could not reload %s, serving a copy %.0fs old: %s", self.name, age, e)
+            return self._value
+
+    def invalidate(self):
+        """
+        Fuerza la carga en la siguiente consulta (p. ej. si el servicio ya no reconoce el agente).
+        """
+        with self._lock:
+            self._value = None
+            self._loaded_at = None
+
+    def _schedule_refresh(self):
+        with self._refresh_lock:
+            if self._refreshing or time.monotonic() < self._next_refresh:
+                return
+            self._refreshing = True
+        self._refresher.submit(self._refresh)
+
+    def _refresh(self):
+        # Sin el lock de las cargas: las peticiones que leen la copia caducada no esperan al servicio
+        try:
+            self._load()
+        except Exception as e:
+            logger.warning("⚠️ Could not refresh %s, serving the cached copy for now: %s", self.name, e)
+        finally:
+            self._refreshing = False
+
+    def _load(self):
+        """
+        Pide la definición al servicio y la guarda.
+        """
+        try:
+            value = self.loader()
+        except Exception:
+            self._next_refresh = time.monotonic() + self.retry
+            self.refresh_total.inc(cache=self.name, outcome="error")
+            raise
+        previous = getattr(self._value, "id", None)
+        if previous is not None and previous != getattr(value, "id", None):
+            logger.info("🔄 %s changed: %s -> %s", self.name, previous, getattr(value, "id", None))
+        self._value = value
+        self._loaded_at = time.monotonic()
+        self._next_refresh = 0.0
+        self.refresh_total.inc(cache=self.name, outcome="ok")
@@ -1,37 +1,56 @@
 from src.domain.providers.LLMProvider import LLMProvider
 from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.azure.AgentHandleCache import AgentHandleCache
+from src.infrastructure.replay.Cassette import Cassette
+from src.infrastructure.replay.OfflineCredential import OfflineCredential
+from src.infrastructure.replay.RecordingAzureTransport import RecordingAzureTransport
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
+from azure.core.pipeline.policies import SansIOHTTPPolicy
 from azure.ai.agents.models import FabricTool, Agent
 from dotenv import load_dotenv
 import os
 import logging
-import sys 
 logger = logging.getLogger(__name__)
 
-logging.getLogger("azure").setLevel(logging.WARNING)
-logging.getLogger("azure.identity").setLevel(logging.WARNING)
-logging.getLogger("azure.core").setLevel(logging.WARNING)
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
 
 class AzureFoundryAgentProvider(LLMProvider, metaclass=SingletonMeta):
 
     def __init__(self):
 
         load_dotenv()
+        client_kwargs = {}
+        record_dir = os.getenv("TRAFFIC_RECORD_DIR")
+        if record_dir:
+            client_kwargs["transport"] = RecordingAzureTransport(Cassette(record_dir, "foundry"))
+
+        replay_url = os.getenv("TRAFFIC_REPLAY_URL")
+        if replay_url:
+            # El servidor de replay es HTTP sin TLS: se sustituye la política de bearer token
+            endpoint = replay_url.rstrip("/") + "/foundry"
+            credential = OfflineCredential()
+            client_kwargs["authentication_policy"] = SansIOHTTPPolicy()
+            logger.info("🔁 Replay mode: Foundry calls go to %s", endpoint)
+        else:
+            endpoint = os.environ["PROJECT_ENDPOINT"]
+            credential = DefaultAzureCredential()
+
         self.project = AIProjectClient(
-            credential=DefaultAzureCredential(),
-            endpoint=os.environ["PROJECT_ENDPOINT"]
+            credential=credential,
+            endpoint=endpoint,
+            **client_kwargs
         )
         self.fabric = FabricTool(connection_id=os.environ["FABRIC_CONNECTION_ID"])
-        
+        self.agent_name = os.environ["AGENT_NAME"]
+        # La definición del agente se renueva en segundo plano: los cambios en Foundry llegan sin reiniciar
+        self._agent_cache = AgentHandleCache(
+            self._fetch_agent,
+            ttl=float(os.getenv("FOUNDRY_AGENT_TTL_S", "300")),
+            max_stale=float(os.getenv("FOUNDRY_AGENT_MAX_STALE_S", "3600")),
+            retry=float(os.getenv("FOUNDRY_AGENT_RETRY_S", "30")),
+            name="foundry-agent",
+        )
+
     
     def create_thread(self) -> str:
         """
@@ -39,7 +58,7 @@ class AzureFoundryAgentProvider(LLMProvider, metaclass=SingletonMeta):
         :return: Identificador del hilo creado.
         """
         thread = self.project.agents.threads.create()
-        print(f"Created thread, ID: {thread.id}")
+        logger.info("Created thread, ID: %s", thread.id)
         return thread.id
         
     def get_project(self):
@@ -47,11 +66,14 @@ class AzureFoundryAgentProvider(LLMProvider, metaclass=SingletonMeta):
 
     def get_agent(self) -> Agent:
         """
-        Obtiene el agente configurado en el provider.
+        Obtiene el agente configurado en el provider (de la caché, ver AgentHandleCache).
         :return: Instancia del agente.
         """
-        agent = self.project.agents.get_agent(os.environ["AGENT_NAME"])
+        return self._agent_cache.get()
+
+    def _fetch_agent(self) -> Agent:
+        agent = self.project.agents.get_agent(self.agent_name)
         if not agent:
-            raise ValueError(f"Agent with name {os.environ['AGENT_NAME']} not found.")
-        logger.info(f"Using agent: {agent.name} (ID: {agent.id})")
-        return agent
\ No newline at end of file
+            raise ValueError(f"Agent with name {self.agent_name} not found.")
+        logger.info("Using agent: %s (ID: %s)", agent.name, agent.id)
+        return agent
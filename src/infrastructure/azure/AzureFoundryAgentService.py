@@ -2,31 +2,25 @@ from src.domain.services.ChatService import ChatService
 from src.domain.models.ChatResponse import ChatResponse
 from src.infrastructure.azure.AzureFoundryAgentProvider import AzureFoundryAgentProvider
 from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.repositories.prompts.RunContextPrompt import RunContextPrompt
 from azure.ai.agents.models import MessageRole, AgentStreamEvent, MessageDeltaChunk
 import logging
-import sys
+import os
 import time
 
 logger = logging.getLogger(__name__)
 
-logging.getLogger("azure").setLevel(logging.WARNING)
-logging.getLogger("azure.identity").setLevel(logging.WARNING)
-logging.getLogger("azure.core").setLevel(logging.WARNING)
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
 
 class AzureFoundryAgentService(ChatService, metaclass=SingletonMeta):
+    TERMINAL_RUN_STATUSES = ("cancelled", "completed", "failed", "expired")
+
     def __init__(self):
         self.provider: AzureFoundryAgentProvider = AzureFoundryAgentProvider()
         self.project = self.provider.get_project()
-        self.agent = self.provider.get_agent()
         self._logger = logging.getLogger(__name__)
+        # thread_id -> run en streaming, para poder cancelarlo
+        self._active_runs = {}
+        self.cancel_wait = float(os.getenv("RUN_CANCEL_WAIT_S", "10"))
 
             
     def chat_stream(self, thread_id: str, user_message: str):
@@ -38,30 +32,39 @@ class AzureFoundryAgentService(ChatService, metaclass=SingletonMeta):
         El cliente puede consumir estos eventos y mostrarlos incrementalmente.
         """
 
-        # Añade la fecha al system prompt
-        fecha = time.strftime("%Y-%m-%d")
-        fecha_prompt = f"La fecha actual es {fecha}. Usa esta información en tus respuestas si es relevante."
-        
-        # Crear el mensaje del usuario
-        self.project.agents.messages.create(thread_id, role=MessageRole.USER, content=user_message + "\n" + fecha_prompt)
+        agent = self.provider.get_agent()
+
+        # Crear el mensaje del usuario (solo su texto: la fecha va en las instrucciones del run)
+        self.project.agents.messages.create(thread_id, role=MessageRole.USER, content=user_message)
 
         # Abrir el stream del run proporcionado por el SDK
         try:
-            with self.project.agents.runs.stream(thread_id=thread_id, agent_id=self.agent.id) as stream:
+            with self.project.agents.runs.stream(
+                thread_id=thread_id,
+                agent_id=agent.id,
+                additional_instructions=RunContextPrompt(RunContextPrompt.FOUNDRY).get_prompt(),
+            ) as stream:
                 start = time.time()
                 full_text = ""
+                usage = None
                 for event_type, event_data, _ in stream:
+                    if event_type == AgentStreamEvent.THREAD_RUN_CREATED:
+                        self._active_runs[thread_id] = event_data.id
+
                     # Deltas parciales de texto
-                    if isinstance(event_data, MessageDeltaChunk):
+                    elif isinstance(event_data, MessageDeltaChunk):
                         delta = (event_data.text or "")
-                        logger.info(f"Delta generated: {delta}")
+                        logger.debug("Delta generated: %s", delta)
                         full_text += delta
                         yield {"type": "delta", "text": delta}
 
                     # Run completo / fin de stream
+                    elif event_type == AgentStreamEvent.THREAD_RUN_COMPLETED:
+                        usage = self.usage_of(event_data)
                     elif event_type == AgentStreamEvent.DONE:
-                        logger.info(f"Run completed in {time.time() - start:.2f} seconds")
-                        yield {"type": "done", "text": f"Run completed in {time.time() - start:.2f} seconds: " + full_text}
+                        logger.info("Run completed in %.2f seconds", time.time() - start)
+                        done = {"type": "done", "text": f"Run completed in {time.time() - start:.2f} seconds: " + full_text}
+                        yield {**done, "usage": usage} if usage else done
                         break
 
                     # Errores
@@ -69,7 +72,7 @@ class AzureFoundryAgentService(ChatService, metaclass=SingletonMeta):
                         yield {"type": "error", "text": str(event_data)}
                         break
                     elif event_type == AgentStreamEvent.THREAD_RUN_FAILED:
-                        logger.info(f"Thread run failed: {event_data.last_error}")
+                        logger.info("Thread run failed: %s", event_data.last_error)
                         yield {"type": "error", "text": f"Thread run failed: {event_data.last_error}"}
                         break
                     else:
@@ -77,4 +80,22 @@ class AzureFoundryAgentService(ChatService, metaclass=SingletonMeta):
                         continue
         except Exception as e:
             self._logger.exception("Error while streaming run")
-            yield {"type": "error", "text": str(e)}
\ No newline at end of file
+            yield {"type": "error", "text": str(e)}
+        finally:
+            self._active_runs.pop(thread_id, None)
+
+    def cancel_run(self, thread_id: str) -> bool:
+        """
+        Cancela en Foundry el run en streaming del thread, si lo hay, y espera (como mucho RUN_CANCEL_WAIT_S
+        segundos) a que termine para que el thread admita el siguiente mensaje.
+        """
+        run_id = self._active_runs.pop(thread_id, None)
+        if run_id is None:
+            return False
+        run = self.project.agents.runs.cancel(thread_id=thread_id, run_id=run_id)
+        deadline = time.monotonic() + self.cancel_wait
+        while run.status not in self.TERMINAL_RUN_STATUSES and time.monotonic() < deadline:
+            time.sleep(0.5)
+            run = self.project.agents.runs.get(thread_id=thread_id, run_id=run_id)
+        self._logger.info("🛑 Cancelled run %s of thread %s (%s)", run_id, thread_id, run.status)
+        return True
\ No newline at end of file
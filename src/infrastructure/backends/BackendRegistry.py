@@ -0,0 +1,89 @@
+from src.infrastructure.SingletonMeta import SingletonMeta
+from typing import Any
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackendSpec:
+    """
+    Un backend de chat: las variables de entorno que indican que está configurado, el módulo con sus
+    rutas y sus componentes (`"modulo:atributo"`), que solo se importan la primera vez que se piden.
+    """
+
+    def __init__(self, name: str, required_env: tuple, routes: str, components: dict[str, str]):
+        self.name = name
+        self.required_env = required_env
+        self.routes = routes
+        self.components = components
+
+
+class BackendRegistry(metaclass=SingletonMeta):
+    """
+    Registro de los backends de chat (Fabric y Foundry).
+
+    Importar el SDK de cada backend (openai, azure.ai.projects, azure.identity, pandas…) cuesta más que
+    el resto de la aplicación, y se pagaba en cada worker aunque el despliegue usara solo uno. Ahora
+    `chat_server` monta únicamente las rutas de los backends configurados y estas piden sus servicios
+    con `component`, que importa el módulo en el primer uso.
+
+    Un backend está configurado si tiene todas sus variables de entorno (o en modo replay, con
+    TRAFFIC_REPLAY_URL). CHAT_BACKENDS (p. ej. `fabric` o `fabric,foundry`) fija la lista a mano.
+    """
+
+    BACKENDS = (
+        BackendSpec("fabric", ("FABRIC_DATA_AGENT_URL",), "src.infrastructure.rest.server.fabric_routes", {
+            "service": "src.infrastructure.fabric.FabricAgentService:FabricAgentService",
+            "provider": "src.infrastructure.fabric.FabricLlmProvider:FabricLlmProvider",
+            "thread_pool": "src.infrastructure.fabric.FabricThreadPool:FabricThreadPool",
+            "context_manager": "src.infrastructure.fabric.ThreadContextManager:ThreadContextManager",
+            "sweeper": "src.infrastructure.fabric.ThreadSweeper:ThreadSweeper",
+            "preview_builder": "src.infrastructure.sql.DataPreviewBuilder:DataPreviewBuilder",
+        }),
+        BackendSpec("foundry", ("PROJECT_ENDPOINT", "AGENT_NAME", "FABRIC_CONNECTION_ID"),
+                    "src.infrastructure.rest.server.foundry_routes", {
+            "service": "src.infrastructure.azure.AzureFoundryAgentService:AzureFoundryAgentService",
+            "provider": "src.infrastructure.azure.AzureFoundryAgentProvider:AzureFoundryAgentProvider",
+        }),
+    )
+
+    def __init__(self):
+        self._specs = {spec.name: spec for spec in self.BACKENDS}
+        self._loaded = {}
+        self._lock = threading.Lock()
+        selected = os.getenv("CHAT_BACKENDS", "").strip()
+        if selected:
+            self.enabled = [name.strip() for name in selected.split(",") if name.strip()]
+            unknown = set(self.enabled) - set(self._specs)
+            if unknown:
+                raise ValueError(f"Unknown CHAT_BACKENDS {sorted(unknown)}, expected some of {sorted(self._specs)}")
+        else:
+            self.enabled = [spec.name for spec in self.BACKENDS if self.is_configured(spec.name)]
+
+    def is_configured(self, name: str) -> bool:
+        if os.getenv("TRAFFIC_REPLAY_URL"):
+            return True
+        return all(os.getenv(var) for var in self._specs[name].required_env)
+
+    def routes(self, name: str):
+        """
+        Módulo de rutas del backend (ligero: no importa el SDK hasta la primera petición).
+        """
+        return importlib.import_module(self._specs[name].routes)
+
+    def component(self, backend: str, name: str) -> Any:
+        path = self._specs[backend].components[name]
+        loaded = self._loaded.get(path)
+        if loaded is not None:
+            return loaded
+        with self._lock:
+            if path not in self._loaded:
+                start = time.perf_counter()
+                module_name, attribute = path.split(":")
+                self._loaded[path] = getattr(importlib.import_module(module_name), attribute)
+                logger.info("📦 Loaded %s %s in %.0f ms", backend, name, (time.perf_counter() - start) * 1000)
+            return self._loaded[path]
@@ -0,0 +1,124 @@
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from src.infrastructure.streaming.RunStream import RunStream
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import Awaitable, Callable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RequestCoalescer(metaclass=SingletonMeta):
+    """
+    Agrupa peticiones idénticas concurrentes en un único run upstream.
+
+    La primera petición de una clave lanza el run como RunStream; las que llegan mientras sigue en
+    curso se suscriben al mismo stream y reciben primero los eventos ya emitidos. Cuando el run
+    termina la clave se libera: no es una caché de respuestas. Las peticiones sin clave (p. ej. las
+    de un thread con turnos previos, cuya respuesta depende del historial) lanzan siempre su run.
+
+    Con COALESCING_ENABLED=false cada petición lanza su propio run, pero se siguen anotando las claves
+    en curso para contar los duplicados y poder estimar el ahorro antes de activarlo.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("COALESCING_ENABLED", "false").lower() == "true"
+        # clave -> (stream, trozos de la respuesta) del run en curso
+        self._inflight = {}
+        self._deliveries = set()
+
+        metrics = MetricsRegistry()
+        self.requests_total = metrics.counter(
+            "coalescing_requests_total", "Streaming chat requests seen by the coalescer")
+        self.upstream_runs_total = metrics.counter(
+            "coalescing_upstream_runs_total", "Upstream runs started by the coalescer")
+        self.duplicates_total = metrics.counter(
+            "coalescing_duplicate_requests_total", "Requests identical to one already in flight")
+        metrics.gauge(
+            "coalescing_dedup_ratio", "Fraction of requests served by another request's upstream run",
+            callback=self.dedup_ratio)
+        metrics.gauge(
+            "coalescing_inflight_runs", "Upstream runs currently shared through the coalescer",
+            callback=lambda: len(self._inflight))
+
+    @staticmethod
+    def make_key(assistant_id, message: str, *context) -> str:
+        """
+        Clave de agrupación: asistente, mensaje normalizado (sin mayúsculas ni espacios repetidos)
+        y el contexto que cambia la respuesta (fecha, opciones de la petición).
+        """
+        normalized = _WHITESPACE.sub(" ", message.casefold()).strip()
+        raw = "\x1f".join([str(assistant_id), normalized, *(str(c) for c in context)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def dedup_ratio(self) -> float:
+        total = self.requests_total.value()
+        return self.duplicates_total.value() / total if total else 0.0
+
+    def attach(self, key: Optional[str], factory: Callable[[], Iterator[dict]],
+               on_reply: Optional[Callable[[Optional[str]], Awaitable[None]]] = None) -> tuple[RunStream, bool]:
+        """
+        Devuelve el stream en curso de `key`, o lo lanza con `factory()` si no hay ninguno.
+        El segundo valor indica si esta petición ha lanzado el run.
+
+        Si la petición se agrupa sobre el run de otra, al terminar el run se espera a `on_reply` con la
+        respuesta completa (None si el run no ha terminado bien), para guardar la pregunta y la respuesta
+        en su propio thread.
+        """
+        self.requests_total.inc()
+
+        inflight = self._inflight.get(key) if key is not None else None
+        if inflight is not None and not inflight[0].finished:
+            self.duplicates_total.inc()
+            if self.enabled:
+                stream, chunks = inflight
+                logger.info("🔗 Coalesced request onto in-flight run (%s subscribers, %s events to replay)",
+                            stream.subscribers, stream.buffer.next_seq)
+                if on_reply is not None:
+                    stream.on_close(lambda: self._deliver(chunks, on_reply))
+                return stream, False
+
+        self.upstream_runs_total.inc()
+        if key is None or (inflight is not None and not self.enabled):
+            return RunStreamRegistry().start(factory), True
+        chunks = []
+        stream = RunStreamRegistry().start(lambda: self._capture(factory(), chunks))
+        self._inflight[key] = (stream, chunks)
+        stream.on_close(lambda: self._release(key, stream))
+        return stream, True
+
+    @staticmethod
+    def _capture(events: Iterator[dict], chunks: list) -> Iterator[dict]:
+        """
+        Reenvía los eventos del run guardando el texto; al final añade None si el run ha terminado bien.
+        """
+        for evt in events:
+            if evt.get("type") == "delta":
+                chunks.append(evt["text"])
+            elif evt.get("done"):
+                chunks.append(None)
+            yield evt
+
+    def _deliver(self, chunks: list, on_reply: Callable[[Optional[str]], Awaitable[None]]):
+        answer = "".join(chunks[:-1]) if chunks and chunks[-1] is None else None
+
+        async def deliver():
+            try:
+                await on_reply(answer)
+            except Exception as e:
+                logger.warning("⚠️ Could not store a coalesced reply in its thread: %s", e)
+
+        task = asyncio.ensure_future(deliver())
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    def _release(self, key: str, stream: RunStream):
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is stream:
+            del self._inflight[key]
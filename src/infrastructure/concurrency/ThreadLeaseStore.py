@@ -0,0 +1,72 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadLeaseStore:
+    """
+    Turnos de los threads en un fichero SQLite compartido por todos los workers, para que dos peticiones
+    sobre el mismo thread que llegan a workers distintos no lancen dos runs a la vez.
+
+    Cada turno tiene un dueño (un token por petición) y caduca a los `ttl` segundos si no se renueva, de
+    modo que un worker que muere con turnos tomados no bloquea sus threads para siempre.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS thread_lease "
+            "(thread_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        logger.info("🗂️ Thread run leases shared through %s", path)
+
+    def take(self, thread_id: str, owner: str) -> bool:
+        """
+        Toma el turno del thread si está libre o caducado. Devuelve False si lo tiene otro.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                current = self._db.execute(
+                    "SELECT owner, expires_at FROM thread_lease WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+                if current and current[0] != owner and current[1] > now:
+                    self._db.execute("ROLLBACK")
+                    return False
+                self._db.execute(
+                    "INSERT INTO thread_lease (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                    (thread_id, owner, now + self.ttl),
+                )
+                self._db.execute("COMMIT")
+                return True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def renew(self, thread_id: str, owner: str) -> bool:
+        """
+        Alarga el turno. Devuelve False si ya no es de `owner` (caducó y lo tomó otro).
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE thread_lease SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+                (time.time() + self.ttl, thread_id, owner),
+            )
+        return cursor.rowcount > 0
+
+    def release(self, thread_id: str, owner: str):
+        with self._lock:
+            self._db.execute("DELETE FROM thread_lease WHERE thread_id = ? AND owner = ?", (thread_id, owner))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,174 @@
+from src.domain.exceptions.ThreadBusyException import ThreadBusyException
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.concurrency.ThreadLeaseStore import ThreadLeaseStore
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+import asyncio
+import logging
+import os
+import time
+import uuid
+import weakref
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadSlot:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+
+
+class ThreadRunLease:
+    """
+    Turno exclusivo sobre un thread. `release` es idempotente para poder llamarlo tanto al
+    terminar el stream como desde la tarea de fondo de la respuesta.
+
+    Con un ThreadLeaseStore el turno compartido se renueva en segundo plano mientras se tiene.
+    """
+
+    def __init__(self, thread_id: str, slot: _ThreadSlot,
+                 store: Optional[ThreadLeaseStore] = None, owner: Optional[str] = None):
+        self.thread_id = thread_id
+        self._slot = slot
+        self._store = store
+        self._owner = owner
+        self._released = False
+        self._heartbeat = asyncio.create_task(self._renew()) if store is not None else None
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._store is None:
+            self._slot.lock.release()
+            return
+        self._heartbeat.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._release_shared(None)
+            return
+        # El turno local se suelta cuando el compartido ya está borrado, para que la siguiente
+        # petición del proceso no lo encuentre todavía tomado
+        done = loop.run_in_executor(None, self._store.release, self.thread_id, self._owner)
+        done.add_done_callback(self._release_shared)
+
+    def _release_shared(self, done: Optional[asyncio.Future]):
+        try:
+            if done is None:
+                self._store.release(self.thread_id, self._owner)
+            elif done.exception() is not None:
+                raise done.exception()
+        except Exception as e:
+            logger.warning("⚠️ Could not release shared lease of thread %s, it expires in %gs: %s",
+                           self.thread_id, self._store.ttl, e)
+        finally:
+            self._slot.lock.release()
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self._store.ttl / 3)
+            try:
+                if not await asyncio.to_thread(self._store.renew, self.thread_id, self._owner):
+                    logger.warning("⚠️ Shared lease of thread %s expired and was taken by another request",
+                                   self.thread_id)
+                    return
+            except Exception as e:
+                logger.warning("⚠️ Could not renew shared lease of thread %s: %s", self.thread_id, e)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class ThreadRunQueue(metaclass=SingletonMeta):
+    """
+    Serializa los runs de un mismo thread.
+
+    El Assistants API rechaza un mensaje o run nuevo mientras otro run del thread está activo. Cada
+    petición pide turno con `acquire(thread_id)`: las que encuentran el thread ocupado esperan en orden
+    de llegada (asyncio.Lock es FIFO) hasta `max_wait` segundos, con como mucho `max_queued` en espera.
+    Si no, se lanza ThreadBusyException para que el cliente reciba un 409 con Retry-After en lugar de
+    reintentar a ciegas.
+
+    Los slots se guardan en un WeakValueDictionary: solo existen mientras alguna petición tiene turno o
+    espera, así que la memoria no crece con el número de threads.
+
+    La cola es del proceso. Con varios workers, THREAD_RUN_DB indica un fichero SQLite común
+    (ThreadLeaseStore): tras conseguir el turno local, la petición toma también el turno compartido,
+    consultándolo cada THREAD_RUN_LEASE_POLL_S segundos dentro del mismo `max_wait`. El turno compartido
+    caduca a los THREAD_RUN_LEASE_TTL_S segundos si el worker que lo tiene deja de renovarlo.
+    """
+
+    def __init__(self):
+        self.max_wait = float(os.getenv("THREAD_RUN_MAX_WAIT_S", "60"))
+        self.max_queued = int(os.getenv("THREAD_RUN_MAX_QUEUED", "4"))
+        self.poll_interval = float(os.getenv("THREAD_RUN_LEASE_POLL_S", "0.25"))
+        db_path = os.getenv("THREAD_RUN_DB")
+        self.store = ThreadLeaseStore(db_path, float(os.getenv("THREAD_RUN_LEASE_TTL_S", "30"))) if db_path else None
+        self._slots = weakref.WeakValueDictionary()
+
+        metrics = MetricsRegistry()
+        self.wait_seconds = metrics.histogram(
+            "thread_run_queue_wait_seconds", "Time a request waited for its thread to be free")
+        self.rejected_total = metrics.counter(
+            "thread_run_queue_rejected_total", "Requests rejected because their thread stayed busy")
+        metrics.gauge(
+            "thread_run_queue_waiting", "Requests currently waiting for their thread",
+            callback=lambda: sum(slot.waiting for slot in list(self._slots.values())))
+
+    def is_busy(self, thread_id: str) -> bool:
+        slot = self._slots.get(thread_id)
+        return slot is not None and slot.lock.locked()
+
+    async def acquire(self, thread_id: str, timeout: Optional[float] = None) -> ThreadRunLease:
+        slot = self._slots.get(thread_id)
+        if slot is None:
+            slot = _ThreadSlot()
+            self._slots[thread_id] = slot
+
+        if slot.lock.locked() and slot.waiting >= self.max_queued:
+            self.rejected_total.inc(reason="queue_full")
+            raise ThreadBusyException(f"Thread {thread_id} has {slot.waiting} requests already waiting")
+
+        timeout = self.max_wait if timeout is None else timeout
+        start = time.perf_counter()
+        slot.waiting += 1
+        try:
+            if slot.lock.locked():
+                logger.info("⏳ Thread %s busy, queued behind %s requests", thread_id, slot.waiting - 1)
+            await asyncio.wait_for(slot.lock.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected_total.inc(reason="timeout")
+            raise ThreadBusyException(f"Thread {thread_id} still busy after {timeout:g} seconds")
+        finally:
+            slot.waiting -= 1
+        if self.store is None:
+            self.wait_seconds.observe(time.perf_counter() - start)
+            return ThreadRunLease(thread_id, slot)
+
+        owner = uuid.uuid4().hex
+        try:
+            await self._take_shared(thread_id, owner, start + timeout)
+        except BaseException:
+            slot.lock.release()
+            # Por si la cancelación llegó con el turno ya tomado en el hilo
+            asyncio.get_running_loop().run_in_executor(None, self.store.release, thread_id, owner)
+            raise
+        self.wait_seconds.observe(time.perf_counter() - start)
+        return ThreadRunLease(thread_id, slot, self.store, owner)
+
+    async def _take_shared(self, thread_id: str, owner: str, deadline: float):
+        logged = False
+        while not await asyncio.to_thread(self.store.take, thread_id, owner):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self.rejected_total.inc(reason="timeout")
+                raise ThreadBusyException(f"Thread {thread_id} still busy in another worker")
+            if not logged:
+                logger.info("⏳ Thread %s busy in another worker, waiting", thread_id)
+                logged = True
+            await asyncio.sleep(min(self.poll_interval, remaining))
@@ -1,118 +1,215 @@
 from src.domain.services.ChatService import ChatService
 from src.domain.models.ChatResponse import ChatResponse
+from src.domain.exceptions.ChatRunException import ChatRunException
 from src.domain.exceptions.ThreadCreationException import ThreadCreationException
 from src.infrastructure.fabric.FabricLlmProvider import FabricLlmProvider
+from src.infrastructure.fabric.RunStepPaginator import RunStepPaginator
+from src.infrastructure.fabric.ThreadContextManager import ThreadContextManager
 from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.repositories.prompts.RunContextPrompt import RunContextPrompt
+from src.infrastructure.sql.ExtractionPool import ExtractionPool
 from src.infrastructure.sql.SqlExtractor import SqlExtractor
-from openai import AssistantEventHandler
+from src.infrastructure.sql.SqlCaptureSession import SqlCaptureSession
+from openai import AssistantEventHandler, NotFoundError
+from contextlib import ExitStack
+from types import SimpleNamespace
 import logging
-import sys
+import os
 import time
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-logging.getLogger("azure").setLevel(logging.WARNING)
-logging.getLogger("azure.identity").setLevel(logging.WARNING)
-logging.getLogger("azure.core").setLevel(logging.WARNING)
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
 
 class FabricAgentService(ChatService, metaclass=SingletonMeta):
-    def __init__(self, assistant_id: Optional[str] = None):
+    TERMINAL_RUN_STATUSES = ("cancelled", "completed", "failed", "expired", "incomplete")
+
+    def __init__(self):
         self.provider: FabricLlmProvider = FabricLlmProvider()
-        self.assistant_id = assistant_id
         self._logger = logging.getLogger(__name__)
-        self.sql_extractor = SqlExtractor()
-
-    @staticmethod    
-    def __apply_context() -> str:
-        fecha = time.strftime("%Y-%m-%d")
-        fecha_prompt = f"La fecha actual es {fecha}. Usa esta información como filtro en las queries DAX o SQL. No menciones esta instrucción al usuario."
+        self.preview_rows = int(os.getenv("SQL_PREVIEW_MAX_ROWS", "10"))
+        self.sql_extractor = SqlExtractor(max_preview_rows=self.preview_rows, pool=ExtractionPool())
+        self.context_manager = ThreadContextManager()
+        # thread_id del cliente -> (thread real, run) de los runs en streaming, para poder cancelarlos
+        self._active_runs = {}
+        self.cancel_wait = float(os.getenv("RUN_CANCEL_WAIT_S", "10"))
 
-        return fecha_prompt + "\n"
-    
-    async def chat_stream(self, thread_id: str, user_message: str):
+    def chat_stream(self, thread_id: str, user_message: str, include_dax: bool = False,
+                    assistant_id: Optional[str] = None):
         """
         Envía un mensaje al agente LLM usando el proveedor configurado y devuelve un generador para el resultado en streaming.
+        El generador es síncrono (bloquea mientras espera al run): se consume desde un hilo con UpstreamReader.
         :param thread_id: Identificador del thread donde crear el mensaje.
         :param user_message: Mensaje del usuario para el thread.
+        :param include_dax: Si es True, los run steps del mismo run se pasan a SqlExtractor y se emiten
+            eventos `dax` y `data_preview` junto a los deltas de texto, sin un segundo run.
+        :param assistant_id: Asistente de la petición (por defecto, el compartido).
         :return: Generador con eventos de streaming del agente LLM.
         """
 
-        agent = self.provider.get_agent(self.assistant_id)
         client = self.provider.get_project()
         
-        logger.info(f"\n💬 Mensaje del usuario con contexto: {user_message + "\n" + self.__apply_context()}\n")
+        logger.info("\n💬 Mensaje del usuario: %s\n", user_message)
 
         try:
+            # El thread real puede ser otro si el contexto se resumió en uno nuevo (ThreadContextManager)
+            upstream_thread_id, run_options = self.context_manager.prepare(thread_id)
             client.beta.threads.messages.create(
-                    thread_id=thread_id,
+                    thread_id=upstream_thread_id,
                     role="user",
-                    content=user_message + "\n" + self.__apply_context()
+                    content=user_message
                 )
         except Exception as e:
-            self._logger.error(f"❌ Error creating user message: {e}")
+            self._logger.error("❌ Error creating user message: %s", e)
             yield {"error": str(e)}
             return
         
+        capture = SqlCaptureSession(self.sql_extractor) if include_dax else None
+
         # Monitor the run with timeout
         start_time = time.time()
-        with client.beta.threads.runs.stream(
-            thread_id=thread_id,
-            assistant_id=agent.id,
-            event_handler=AssistantEventHandler()
-        ) as stream:
+        completed_run = None
+        answer = []
+        with ExitStack() as stack:
+            stream = self._with_agent(assistant_id, lambda agent: stack.enter_context(client.beta.threads.runs.stream(
+                thread_id=upstream_thread_id,
+                assistant_id=agent.id,
+                event_handler=AssistantEventHandler(),
+                additional_instructions=RunContextPrompt().get_prompt(),
+                **run_options
+            )))
             try:
-                for text in stream.text_deltas:
-                    self._logger.info(f"Streaming text delta: {text}")
-                    yield {"type": "delta", "text": text}
+                for event in stream:
+                    if event.event == "thread.run.created":
+                        self._active_runs[thread_id] = (upstream_thread_id, event.data.id)
+                    elif event.event == "thread.message.delta" and event.data.delta.content:
+                        for content_delta in event.data.delta.content:
+                            if content_delta.type == "text" and content_delta.text and content_delta.text.value:
+                                text = content_delta.text.value
+                                answer.append(text)
+                                self._logger.debug("Streaming text delta: %s", text)
+                                yield {"type": "delta", "text": text}
+                    elif event.event == "thread.run.completed":
+                        completed_run = event.data
+                    elif capture and event.event == "thread.run.step.completed":
+                        for evt in capture.feed_step(event.data):
+                            yield evt
+                if capture:
+                    for evt in capture.finish():
+                        yield evt
             except Exception as e:
-                self._logger.error(f"❌ Error during streaming: {e}")
+                self._logger.error("❌ Error during streaming: %s", e)
                 yield {"error": str(e)}
             else:
                 self._logger.info("✅ Streaming completed successfully")
+                self.context_manager.record(thread_id, completed_run, user_message, "".join(answer))
                 end_time = time.time()
-                self._logger.info(f"⏱️ Total time: {end_time - start_time} seconds")
-                yield {"done": True}
+                self._logger.info("⏱️ Total time: %s seconds", end_time - start_time)
+                usage = self.usage_of(completed_run)
+                yield {"done": True, "usage": usage} if usage else {"done": True}
+            finally:
+                self._active_runs.pop(thread_id, None)
+
+    def is_new_thread(self, thread_id: str) -> bool:
+        """
+        True si el thread aún no tiene mensajes (la respuesta no depende de ningún historial).
+        """
+        upstream_thread_id = self.context_manager.upstream_id(thread_id)
+        page = self.provider.get_project().beta.threads.messages.list(thread_id=upstream_thread_id, limit=1)
+        return not page.data
+
+    def append_turn(self, thread_id: str, user_message: str, answer: str):
+        """
+        Guarda en el thread una pregunta y su respuesta obtenidas con el run de otro thread
+        (peticiones agrupadas por RequestCoalescer), para que el siguiente turno tenga ese contexto.
+        """
+        upstream_thread_id = self.context_manager.upstream_id(thread_id)
+        messages = self.provider.get_project().beta.threads.messages
+        messages.create(thread_id=upstream_thread_id, role="user", content=user_message)
+        messages.create(thread_id=upstream_thread_id, role="assistant", content=answer)
+        self.context_manager.record(thread_id, None, user_message, answer)
+
+    def _with_agent(self, assistant_id: Optional[str], start_run):
+        """
+        Llama a `start_run(agent)` con el asistente de la petición (el servicio es único en el proceso: el
+        asistente se pasa en cada llamada). Si el servicio responde que no existe (p. ej. lo ha borrado
+        otra réplica), se descarta el compartido y se reintenta una vez con uno nuevo.
+        """
+        agent = self.provider.get_agent(assistant_id)
+        try:
+            return start_run(agent)
+        except NotFoundError:
+            self.provider.forget_agent(agent.id)
+            return start_run(self.provider.get_agent(assistant_id))
+
+    def cancel_run(self, thread_id: str) -> bool:
+        """
+        Cancela en Fabric el run en streaming del thread, si lo hay, y espera (como mucho RUN_CANCEL_WAIT_S
+        segundos) a que termine: mientras está en `cancelling` el thread no admite otro mensaje.
+        """
+        active = self._active_runs.pop(thread_id, None)
+        if active is None:
+            return False
+        upstream_thread_id, run_id = active
+        runs = self.provider.get_project().beta.threads.runs
+        run = runs.cancel(run_id=run_id, thread_id=upstream_thread_id)
+        deadline = time.monotonic() + self.cancel_wait
+        while run.status not in self.TERMINAL_RUN_STATUSES and time.monotonic() < deadline:
+            time.sleep(0.5)
+            run = runs.retrieve(run_id=run_id, thread_id=upstream_thread_id)
+        self._logger.info("🛑 Cancelled run %s of thread %s (%s)", run_id, upstream_thread_id, run.status)
+        return True
     
-    def get_DAX_query(self, thread_id: str, user_message: str):
+    def get_DAX_query(self, thread_id: str, user_message: str, preview_rows: Optional[int] = None,
+                      assistant_id: Optional[str] = None):
+        """
+        Ejecuta un run completo y extrae las queries DAX/SQL y las vistas previas de datos.
+        :param preview_rows: Límite de filas de las vistas previas para esta petición (por defecto SQL_PREVIEW_MAX_ROWS).
+        :param assistant_id: Asistente de la petición (por defecto, el compartido).
+        """
         
         client = self.provider.get_project()
+        sql_extractor = self.sql_extractor
+        if preview_rows and preview_rows != self.preview_rows:
+            sql_extractor = SqlExtractor(max_preview_rows=preview_rows, pool=ExtractionPool())
 
+        client_thread_id = thread_id
         try:
-            agent = self.provider.get_agent(self.assistant_id)
-            
-            logger.info(f"\n💬 Mensaje del usuario con contexto: {user_message + "\n" + self.__apply_context()}\n")
+            logger.info("\n💬 Mensaje del usuario: %s\n", user_message)
 
+            # El thread real puede ser otro si el contexto se resumió en uno nuevo (ThreadContextManager)
+            thread_id, run_options = self.context_manager.prepare(client_thread_id)
             client.beta.threads.messages.create(
                     thread_id=thread_id,
                     role="user",
-                    content=user_message + "\n" + self.__apply_context()
+                    content=user_message
                 )
             
             # Start and monitor run
-            run = client.beta.threads.runs.create(
+            run = self._with_agent(assistant_id, lambda agent: client.beta.threads.runs.create(
                 thread_id=thread_id,
-                assistant_id=agent.id
-            )
+                assistant_id=agent.id,
+                additional_instructions=RunContextPrompt().get_prompt(),
+                **run_options
+            ))
+
+            # Registrado como los runs en streaming para que `cancel_run` pueda cortarlo
+            self._active_runs[client_thread_id] = (thread_id, run.id)
 
             while run.status in ["queued", "in_progress"]:
-                print(f"⏳ Status: {run.status}")
+                logger.debug("⏳ Status: %s", run.status)
                 time.sleep(2)
                 run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run.id)
+            if run.status in ("cancelling", "cancelled"):
+                raise ChatRunException(f"Run {run.id} was cancelled")
             
-            # Get detailed run steps
-            steps = client.beta.threads.runs.steps.list(
-                thread_id=thread_id,
-                run_id=run.id
-            )
+            # Get detailed run steps: every page, extracting each one while the next is downloaded
+            analysis = sql_extractor._new_analysis()
+            all_steps = []
+            for page in RunStepPaginator(client).pages(thread_id, run.id):
+                all_steps.extend(page)
+                sql_extractor._accumulate_steps(analysis, page)
+            steps = SimpleNamespace(data=all_steps)
 
             # Get messages
             messages = client.beta.threads.messages.list(
@@ -136,57 +233,44 @@ class FabricAgentService(ChatService, metaclass=SingletonMeta):
                     else:
                         text_content = str(content[0])
 
-            sql_analysis = self.sql_extractor._extract_sql_queries_with_data(steps)
+            sql_analysis = sql_extractor._finish_analysis(analysis)
 
             # Also try the old regex method as backup
             if not sql_analysis["queries"]:
                 regex_queries = self.sql_extractor._regex_extract_sql_queries(steps)
                 if regex_queries:
                     # Format possible DAX queries for readability/execution
-                    formatted = []
-                    for q in regex_queries:
-                        try:
-                            if self.sql_extractor._is_dax_query(q):
-                                formatted.append(self.sql_extractor._format_dax_query(q))
-                            else:
-                                formatted.append(q)
-                        except Exception:
-                            formatted.append(q)
+                    formatted = self.sql_extractor._format_queries(regex_queries)
 
                     sql_analysis["queries"] = formatted
                     sql_analysis["data_retrieval_query"] = formatted[0] if formatted else None
             
             result = {}
             result["final_response"] = text_content
+            self.context_manager.record(client_thread_id, run, user_message, text_content)
 
             # Add SQL analysis if found
             if sql_analysis["queries"]:
                 # Ensure all queries are formatted (in case they came from the primary extractor)
-                formatted_all = []
-                for q in sql_analysis["queries"]:
-                    try:
-                        if self.sql_extractor._is_dax_query(q):
-                            formatted_all.append(self.sql_extractor._format_dax_query(q))
-                        else:
-                            formatted_all.append(q)
-                    except Exception:
-                        formatted_all.append(q)
-
-                result["sql_queries"] = formatted_all
+                result["sql_queries"] = self.sql_extractor._format_queries(sql_analysis["queries"])
                 result["sql_data_previews"] = sql_analysis["data_previews"]
+                result["sql_data_frames"] = [
+                    frame.model_dump() if frame else None for frame in sql_analysis.get("data_frames", [])
+                ]
                 result["data_retrieval_query"] = sql_analysis["data_retrieval_query"]
+                result["data_retrieval_frame_index"] = sql_analysis.get("data_retrieval_frame_index")
                 
-                logger.debug(f"🗃️ Found {len(sql_analysis['queries'])} DAX queries in lakehouse operations")
+                logger.debug("🗃️ Found %s DAX queries in lakehouse operations", len(sql_analysis['queries']))
                 
                 for i, query in enumerate(sql_analysis["queries"], 1):
-                    logger.info(f"📄 DAX Query {i}:")
-                    logger.info(f"   {query}")
+                    logger.info("📄 DAX Query %s:", i)
+                    logger.info("   %s", query)
                     
                     # Show data preview if this query retrieved data
                     if i == sql_analysis["data_retrieval_query_index"]:
-                        logger.info(f"   🎯 This query retrieved the data!")
+                        logger.info("   🎯 This query retrieved the data!")
                         if sql_analysis["data_previews"][i-1]:
-                            logger.info(f"   📊 Data Preview:")
+                            logger.info("   📊 Data Preview:")
                             preview = sql_analysis["data_previews"][i-1]
                             
                             # Check if the preview is a raw markdown table (single item)
@@ -196,14 +280,16 @@ class FabricAgentService(ChatService, metaclass=SingletonMeta):
                             else:
                                 # This is parsed row data, print line by line
                                 for line in preview[:5]:  # Show first 5 lines
-                                    logger.info(f"      {line}")
+                                    logger.info("      %s", line)
                                 if len(preview) > 5:
-                                    logger.info(f"      ... and {len(preview) - 5} more lines")
+                                    logger.info("      ... and %s more lines", len(preview) - 5)
                     logger.info("")  # Empty line for readability
 
             else:
                 logger.info("🗃️ No DAX queries found in lakehouse operations")
             return result
         except Exception as e:
-            self._logger.error(f"❌ Error getting DAX queries: {e}")
-            raise e
\ No newline at end of file
+            self._logger.error("❌ Error getting DAX queries: %s", e)
+            raise e
+        finally:
+            self._active_runs.pop(client_thread_id, None)
\ No newline at end of file
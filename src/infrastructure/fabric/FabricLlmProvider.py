@@ -2,31 +2,25 @@ from src.domain.providers.LLMProvider import LLMProvider
 from src.domain.exceptions.AgentCreationException import AgentCreationException
 from src.domain.exceptions.ThreadCreationException import ThreadCreationException
 from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
 from src.infrastructure.repositories.prompts.AgentSystemPrompt import AgentSystemPrompt
+from src.infrastructure.replay.Cassette import Cassette
+from src.infrastructure.replay.OfflineCredential import OfflineCredential
+from src.infrastructure.replay.RecordingTransport import RecordingTransport
 from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
 import time
 import uuid
 import logging
-import sys
 import warnings
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient
 from typing import Optional
 import os
 
 logger = logging.getLogger(__name__)
 
-logging.getLogger("azure").setLevel(logging.WARNING)
-logging.getLogger("azure.identity").setLevel(logging.WARNING)
-logging.getLogger("azure.core").setLevel(logging.WARNING)
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
 
 # Suppress OpenAI Assistants API deprecation warnings
 # (Fabric Data Agents don't support the newer Responses API yet)
@@ -36,29 +30,49 @@ warnings.filterwarnings(
     message=r".*Assistants API is deprecated.*"
 )
 
-try:
-    load_dotenv()
-    logger.info("✅ .env file loaded successfully.")
-    # Don't log secrets; only log presence of expected vars
-    logger.info(f"AZURE_CLIENT_ID present: {bool(os.getenv('AZURE_CLIENT_ID'))}")
-except Exception as e:
-    logger.warning(f"Could not load .env file: {e}")
-    pass
-
 class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
     """
     Proveedor LLM para Azure Fabric Data Agent. Utiliza autenticación interactiva y maneja la renovación del token.
     Crea una instancia persistente del agente LLM configurado en Fabric Data Agent.
     Consulta instancias persistentes de agente LLM.
+
+    Sin `assistant_id` (o si no existe) se reutiliza un asistente ya creado por esta aplicación
+    (`metadata.app`) con la misma huella de prompt y modelo (`metadata.prompt_hash`), buscándolo en
+    `assistants.list`; solo si no hay ninguno se crea, una vez por proceso. Entre varios asistentes
+    equivalentes se usa el más antiguo, así que todas las réplicas eligen el mismo. Los de esta aplicación
+    con otra huella se eliminan en segundo plano si tienen más de AGENT_GC_MIN_AGE_S segundos
+    (AGENT_GC_ENABLED); los que solo coinciden en el nombre no se tocan.
     """
+
+    AGENT_NAME = "Campofrio Agent"
+    AGENT_MODEL = "gpt-5-nano-2025-08-07"
+    AGENT_APP = "camp-chat-backend"
     
     def __init__(self):
         """
         Initialize the Fabric Data Agent client.
         """
-        self.data_agent_url = os.environ["FABRIC_DATA_AGENT_URL"]
+        self.replay_url = os.getenv("TRAFFIC_REPLAY_URL")
+        if self.replay_url:
+            self.data_agent_url = self.replay_url.rstrip("/") + "/fabric"
+            logger.info("🔁 Replay mode: Fabric calls go to %s", self.data_agent_url)
+        else:
+            self.data_agent_url = os.environ["FABRIC_DATA_AGENT_URL"]
+        record_dir = os.getenv("TRAFFIC_RECORD_DIR")
+        self.cassette = Cassette(record_dir, "fabric") if record_dir else None
         self.credential = None
         self.token = None
+        self.agent_gc_enabled = os.getenv("AGENT_GC_ENABLED", "true").lower() == "true"
+        self.agent_gc_min_age = float(os.getenv("AGENT_GC_MIN_AGE_S", "86400"))
+        self._agent = None
+        self._agent_lock = threading.Lock()
+        self._agent_gc = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-gc")
+
+        metrics = MetricsRegistry()
+        self.agents_total = metrics.counter(
+            "fabric_agents_total", "Shared Fabric assistants resolved by the provider, by outcome")
+        self.agents_deleted_total = metrics.counter(
+            "fabric_agents_deleted_total", "Duplicate or stale Fabric assistants deleted by the agent GC")
         
         self._authenticate()
     
@@ -70,7 +84,10 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
             logger.info("\n🔐 Starting authentication...")
 
             # Create credential for authentication (DefaultAzureCredential will pick the appropriate flow)
-            self.credential = DefaultAzureCredential(managed_identity_client_id="luis.garcia@pospotential.com")
+            if self.replay_url:
+                self.credential = OfflineCredential()
+            else:
+                self.credential = DefaultAzureCredential(managed_identity_client_id="luis.garcia@pospotential.com")
             
             # Get initial token
             self._refresh_token()
@@ -78,7 +95,7 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
             logger.info("✅ Authentication successful!")
             
         except Exception as e:
-            logger.error(f"❌ Authentication failed: {e}")
+            logger.error("❌ Authentication failed: %s", e)
             raise
     
     def _refresh_token(self):
@@ -90,10 +107,10 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
             if self.credential is None:
                 raise ValueError("No credential available")
             self.token = self.credential.get_token("https://api.fabric.microsoft.com/.default")
-            logger.info(f"✅ Token obtained, expires at: {time.ctime(self.token.expires_on)}")
+            logger.info("✅ Token obtained, expires at: %s", time.ctime(self.token.expires_on))
             
         except Exception as e:
-            logger.error(f"❌ Token refresh failed: {e}")
+            logger.error("❌ Token refresh failed: %s", e)
             raise
 
     def _get_openai_client(self) -> OpenAI:
@@ -122,7 +139,8 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
                 "Accept": "application/json",
                 "Content-Type": "application/json",
                 "ActivityId": str(uuid.uuid4())
-            }
+            },
+            http_client=DefaultHttpxClient(transport=RecordingTransport(self.cassette)) if self.cassette else None
         )
     
     def _create_agent(self):
@@ -133,18 +151,33 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
             agent: Configured Fabric Data Agent
         """
         client = self._get_openai_client()
+        requested = {
+            "name": self.AGENT_NAME,
+            "model": self.AGENT_MODEL,
+            "instructions": AgentSystemPrompt().get_prompt(),
+        }
         
         try:
             agent = client.beta.assistants.create(
-                # TODO: esto no cambia nada en el asistente creado
-                name="Campofrio Agent",
-                model="gpt-5-nano-2025-08-07",
-                instructions=AgentSystemPrompt().get_prompt(),
+                **requested,
+                metadata={"app": self.AGENT_APP, "prompt_hash": self._agent_fingerprint()},
             )
-            logger.info(f"✅ Agent created with ID: {agent.id}. {agent.name}")
+            self.agents_total.inc(outcome="created")
+            logger.info("✅ Agent created with ID: %s. %s", agent.id, agent.name)
         except Exception as e:
-            logger.error(f"❌ Failed to create agent: {e}")
+            logger.error("❌ Failed to create agent: %s", e)
             raise AgentCreationException(f"Failed to create agent: {e}")
+
+        # El Data Agent de Fabric puede quedarse con su propia configuración en lugar de la pedida: se avisa
+        # de qué campos no ha aplicado para no darlos por buenos
+        ignored = [field for field, value in requested.items() if getattr(agent, field, None) != value]
+        if ignored:
+            logger.warning("⚠️ Agent %s was created without the requested %s", agent.id, ", ".join(ignored))
+
+        # Si el servicio no guarda los metadatos no se puede saber qué asistentes son de esta aplicación
+        if (agent.metadata or {}).get("app") != self.AGENT_APP and self.agent_gc_enabled:
+            logger.warning("⚠️ Agent %s was created without metadata, agent GC disabled", agent.id)
+            self.agent_gc_enabled = False
         
         return agent
     
@@ -155,40 +188,127 @@ class FabricLlmProvider(LLMProvider, metaclass=SingletonMeta):
         Returns:
             agent: Configured Fabric Data Agent
         """
+        if assistant_id is None:
+            return self._shared_agent()
+
         client = self._get_openai_client()
+        try:
+            agent = client.beta.assistants.retrieve(assistant_id=assistant_id)
+            logger.info("✅ Agent retrieved with ID: %s", agent.id)
+        except Exception as e:
+            logger.info("❌ Agent with ID %s not found. %s. Using the shared agent...", assistant_id, e)
+            agent = self._shared_agent()
         
-        if assistant_id is None:
-            agent = self._create_agent()
-        else:
+        return agent
+
+    def discover_agents(self):
+        """
+        Resuelve el asistente compartido al arrancar para que la primera petición no pague la búsqueda.
+        """
+        return self._shared_agent()
+
+    def _agent_fingerprint(self) -> str:
+        raw = "\x1f".join([self.AGENT_NAME, self.AGENT_MODEL, AgentSystemPrompt().version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _shared_agent(self):
+        with self._agent_lock:
+            if self._agent is None:
+                agent = self._find_agent()
+                if agent is None:
+                    agent = self._create_agent()
+                self._agent = agent
+            return self._agent
+
+    def forget_agent(self, agent_id: str):
+        """
+        Descarta el asistente compartido si es `agent_id` (p. ej. porque el servicio responde que ya no
+        existe), para que la siguiente petición lo vuelva a buscar o a crear.
+        """
+        with self._agent_lock:
+            if self._agent is not None and self._agent.id == agent_id:
+                logger.warning("⚠️ Shared agent %s no longer exists, resolving it again", agent_id)
+                self.agents_total.inc(outcome="lost")
+                self._agent = None
+
+    def _find_agent(self):
+        """
+        Busca en todas las páginas de `assistants.list` un asistente reutilizable y programa la
+        eliminación de los sobrantes. Devuelve None si no hay ninguno o el listado falla.
+        """
+        fingerprint = self._agent_fingerprint()
+        try:
+            # El cursor pide las páginas siguientes al iterar
+            ours = [
+                agent for agent in self._get_openai_client().beta.assistants.list(limit=100, order="asc")
+                if (agent.metadata or {}).get("app") == self.AGENT_APP
+            ]
+        except Exception as e:
+            logger.warning("⚠️ Could not list assistants, a new one will be created: %s", e)
+            return None
+
+        matching = sorted(
+            (agent for agent in ours if (agent.metadata or {}).get("prompt_hash") == fingerprint),
+            key=lambda agent: (agent.created_at, agent.id),
+        )
+        agent = matching[0] if matching else None
+        if agent is not None:
+            self.agents_total.inc(outcome="reused")
+            logger.info("✅ Reusing agent %s (%s found for app %r)", agent.id, len(ours), self.AGENT_APP)
+
+        # Solo los de otra huella: un duplicado con la misma puede ser el que usa otra réplica
+        stale = [other for other in ours if (other.metadata or {}).get("prompt_hash") != fingerprint]
+        if stale and self.agent_gc_enabled:
+            self._agent_gc.submit(self._delete_stale_agents, stale)
+        return agent
+
+    def _delete_stale_agents(self, agents: list):
+        client = self._get_openai_client()
+        cutoff = time.time() - self.agent_gc_min_age
+        deleted = 0
+        for agent in agents:
+            # Los recientes pueden ser de otra réplica que aún no ha visto el asistente elegido
+            if agent.created_at > cutoff:
+                continue
             try:
-                agent = client.beta.assistants.retrieve(assistant_id=assistant_id)
-                logger.info(f"✅ Agent retrieved with ID: {agent.id}")
+                client.beta.assistants.delete(assistant_id=agent.id)
+                deleted += 1
+                self.agents_deleted_total.inc()
             except Exception as e:
-                logger.info(f"❌ Agent with ID {assistant_id} not found. {e}. Creating a new one...")
-                agent = self._create_agent()
-        
-        return agent
+                logger.warning("⚠️ Could not delete stale agent %s: %s", agent.id, e)
+        if deleted:
+            logger.info("🧹 Deleted %s stale agents", deleted)
         
     def get_project(self):
         return self._get_openai_client()
 
-    def create_thread(self, old_thread_id: str) -> str:
+    def create_thread(self, old_thread_id: Optional[str] = None) -> str:
         """
-        Crea un nuevo hilo de conversación.
+        Crea un nuevo hilo de conversación, eliminando antes `old_thread_id` si se indica.
         Returns:
           thread_id: Identificador del hilo creado.
         """
         
         client = self.get_project()
 
-        try:
-            client.beta.threads.delete(thread_id=old_thread_id)
-        except Exception as cleanup_error:
-            print(f"⚠️ Warning: Thread cleanup failed: {cleanup_error}")
+        if old_thread_id:
+            self.delete_thread(old_thread_id)
         try:
             thread_id = client.beta.threads.create().id
-            logger.info(f"✅ Created thread, ID: {thread_id}")
+            logger.info("✅ Created thread, ID: %s", thread_id)
         except Exception as e:
-            logger.error(f"❌ Error creating thread, error: {e}")
+            logger.error("❌ Error creating thread, error: %s", e)
             raise ThreadCreationException(f"Failed to create thread, error: {e}")
-        return thread_id
\ No newline at end of file
+        return thread_id
+
+    def delete_thread(self, thread_id: str, client: Optional[OpenAI] = None) -> bool:
+        """
+        Elimina un hilo de conversación. Devuelve False si no se pudo eliminar.
+        `client` permite reutilizar un mismo cliente en borrados por lotes.
+        """
+        try:
+            (client or self.get_project()).beta.threads.delete(thread_id=thread_id)
+            return True
+        except Exception as cleanup_error:
+            logger.warning("⚠️ Thread cleanup failed: %s", cleanup_error)
+            return False
@@ -0,0 +1,66 @@
+from src.infrastructure.fabric.FabricLlmProvider import FabricLlmProvider
+from src.infrastructure.SingletonMeta import SingletonMeta
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FabricThreadPool(metaclass=SingletonMeta):
+    """
+    Pool de threads de Fabric vacíos para preguntas independientes (p. ej. /chat/batch).
+
+    `acquire` entrega un thread ya creado si hay alguno libre, o lo crea en el momento. Un thread
+    usado tiene historial, así que `release` no lo reutiliza: lo elimina y crea uno nuevo para el
+    pool, ambas cosas en segundo plano y fuera del camino de la petición.
+    Se usa desde hilos de trabajo (las llamadas al SDK son síncronas).
+    """
+
+    def __init__(self, provider: FabricLlmProvider = None):
+        self.provider = provider or FabricLlmProvider()
+        self.size = int(os.getenv("BATCH_THREAD_POOL_SIZE", "8"))
+        self._idle = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._maintenance = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fabric-thread-pool")
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self) -> str:
+        with self._lock:
+            if self._idle:
+                return self._idle.popleft()
+        return self.provider.create_thread()
+
+    def release(self, thread_id: str):
+        self._maintenance.submit(self.provider.delete_thread, thread_id)
+        self.prefill(1)
+
+    def prefill(self, count: int):
+        """
+        Crea en segundo plano hasta `count` threads, sin superar `size` libres.
+        """
+        with self._lock:
+            count = min(count, self.size - len(self._idle) - self._pending)
+            if count <= 0:
+                return
+            self._pending += count
+        for _ in range(count):
+            self._maintenance.submit(self._create_idle)
+
+    def _create_idle(self):
+        try:
+            thread_id = self.provider.create_thread()
+        except Exception as e:
+            logger.warning("⚠️ Could not pre-create thread for the pool: %s", e)
+            with self._lock:
+                self._pending -= 1
+            return
+        with self._lock:
+            self._pending -= 1
+            self._idle.append(thread_id)
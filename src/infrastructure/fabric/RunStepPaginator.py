@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class RunStepPaginator:
+    """
+    Recorre todas las páginas de run steps de un run.
+
+    `steps.list` devuelve como mucho `limit` steps (20 por defecto), así que en runs con muchas
+    llamadas a herramientas se perdían los últimos. La paginación por cursor es secuencial (cada
+    página necesita el id del último step de la anterior), pero la descarga de la página siguiente
+    se lanza en cuanto llega la actual, en un hilo aparte, mientras quien consume `pages` procesa
+    la actual. Así la extracción de SQL queda solapada con la red.
+
+    Variables:
+    - RUN_STEPS_PAGE_SIZE: steps por página (máximo 100 en el API).
+    - RUN_STEPS_INCLUDE: campos adicionales separados por comas, pasados como `include` a steps.list
+      (p. ej. `step_details.tool_calls[*].file_search.results[*].content`).
+    """
+
+    def __init__(self, client, page_size: Optional[int] = None, include: Optional[list] = None):
+        self.client = client
+        self.page_size = page_size or int(os.getenv("RUN_STEPS_PAGE_SIZE", "100"))
+        if include is None:
+            include = [field.strip() for field in os.getenv("RUN_STEPS_INCLUDE", "").split(",") if field.strip()]
+        self.include = include
+
+    def _fetch(self, thread_id: str, run_id: str, after: Optional[str]):
+        kwargs = {"thread_id": thread_id, "run_id": run_id, "limit": self.page_size}
+        if after:
+            kwargs["after"] = after
+        if self.include:
+            kwargs["include"] = self.include
+        return self.client.beta.threads.runs.steps.list(**kwargs)
+
+    def pages(self, thread_id: str, run_id: str) -> Iterator[list]:
+        """
+        Genera la lista de steps de cada página, en el orden del API.
+        """
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-steps") as executor:
+            future = executor.submit(self._fetch, thread_id, run_id, None)
+            page_count = 0
+            while future is not None:
+                page = future.result()
+                page_count += 1
+                steps = list(page.data)
+                future = None
+                if getattr(page, "has_more", False) and steps:
+                    future = executor.submit(self._fetch, thread_id, run_id, steps[-1].id)
+                yield steps
+            logger.debug("Fetched %s pages of run steps for run %s", page_count, run_id)
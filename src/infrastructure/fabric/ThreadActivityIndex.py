@@ -0,0 +1,125 @@
+from typing import Optional
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadActivityIndex:
+    """
+    Última actividad de cada thread de cliente, para saber cuáles se han abandonado.
+
+    `touch` solo escribe en memoria (está en el camino de la petición). Sin `path` el índice es del
+    proceso. Con `path` el índice es un fichero SQLite compartido por todos los workers: la memoria solo
+    guarda lo pendiente de volcar, `flush` lo vuelca sin pisar una actividad más reciente de otro worker
+    (`MAX`) e `idle` y `remove_if_idle` consultan el fichero, de modo que un worker no da por abandonado
+    un thread que está usando otro.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # Sin path, todo el índice; con path, solo los cambios pendientes de volcar
+        self._activity = {}
+        self._removed = set()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, last_activity REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS thread_activity_last ON thread_activity (last_activity)")
+            logger.info("🗂️ Thread activity shared through %s (%s threads)", path, len(self))
+
+    def __len__(self) -> int:
+        if self._db is None:
+            return len(self._activity)
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM thread_activity").fetchone()[0]
+
+    def touch(self, thread_id: str, timestamp: Optional[float] = None):
+        with self._lock:
+            self._activity[thread_id] = timestamp or time.time()
+            self._removed.discard(thread_id)
+
+    def remove(self, thread_id: str):
+        with self._lock:
+            self._activity.pop(thread_id, None)
+            if self._db is not None:
+                self._removed.add(thread_id)
+
+    def idle(self, cutoff: float, limit: Optional[int] = None) -> list[str]:
+        """
+        Threads sin actividad desde `cutoff`, los más antiguos primero.
+        """
+        if self._db is not None:
+            self.flush()
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT thread_id FROM thread_activity WHERE last_activity < ? ORDER BY last_activity LIMIT ?",
+                    (cutoff, -1 if limit is None else limit),
+                ).fetchall()
+            return [thread_id for thread_id, in rows]
+        with self._lock:
+            idle = [(ts, thread_id) for thread_id, ts in self._activity.items() if ts < cutoff]
+        idle.sort()
+        return [thread_id for _, thread_id in idle[:limit]]
+
+    def remove_if_idle(self, thread_id: str, cutoff: float) -> bool:
+        """
+        Quita el thread solo si sigue inactivo: si el cliente lo ha vuelto a usar, en este worker o
+        en otro, no se elimina.
+        """
+        with self._lock:
+            ts = self._activity.get(thread_id)
+            if self._db is None:
+                if ts is None or ts >= cutoff:
+                    return False
+                del self._activity[thread_id]
+                return True
+            if ts is not None and ts >= cutoff:
+                return False
+        self.flush()
+        with self._db_lock:
+            deleted = self._db.execute(
+                "DELETE FROM thread_activity WHERE thread_id = ? AND last_activity < ?", (thread_id, cutoff)
+            ).rowcount
+        return deleted == 1
+
+    def flush(self):
+        if self._db is None:
+            return
+        with self._lock:
+            updates, self._activity = list(self._activity.items()), {}
+            deletes, self._removed = [(thread_id,) for thread_id in self._removed], set()
+        if not updates and not deletes:
+            return
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO thread_activity (thread_id, last_activity) VALUES (?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET "
+                    "last_activity = MAX(last_activity, excluded.last_activity)",
+                    updates,
+                )
+                self._db.executemany("DELETE FROM thread_activity WHERE thread_id = ?", deletes)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                # Se reintentan en el próximo flush, sin pisar lo que haya llegado mientras tanto
+                with self._lock:
+                    for thread_id, ts in updates:
+                        self._activity.setdefault(thread_id, ts)
+                    self._removed.update(thread_id for thread_id, in deletes if thread_id not in self._activity)
+                raise
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
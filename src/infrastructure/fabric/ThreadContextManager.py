@@ -0,0 +1,220 @@
+from src.infrastructure.fabric.FabricLlmProvider import FabricLlmProvider
+from src.infrastructure.fabric.ThreadUpstreamMap import ThreadUpstreamMap
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+class _ThreadContext:
+    def __init__(self, upstream_id: str):
+        self.upstream_id = upstream_id
+        self.tokens = 0
+        self.turns = 0
+        self.truncating = False
+
+
+class ThreadContextManager(metaclass=SingletonMeta):
+    """
+    Controla el tamaño del contexto de los threads de Fabric.
+
+    Cada turno añade al thread el mensaje y la respuesta, y el run siguiente vuelve a enviar todo el
+    historial: los tokens de entrada y la latencia crecen con la conversación. Se guarda el tamaño
+    aproximado de cada thread, estimado con los mensajes que guarda (pregunta y respuesta de cada turno),
+    y al pasar de THREAD_CONTEXT_MAX_TOKENS se aplica THREAD_CONTEXT_STRATEGY:
+    - `truncate`: los runs del thread se crean con `truncation_strategy` y solo ven los últimos
+      THREAD_CONTEXT_KEEP_MESSAGES mensajes.
+    - `rollover`: se crea un thread nuevo con un resumen de los últimos THREAD_CONTEXT_SUMMARY_MESSAGES
+      mensajes y el antiguo se elimina en segundo plano. El cliente sigue usando su thread_id: `prepare`
+      devuelve el thread real. La correspondencia se guarda en THREAD_CONTEXT_DB (SQLite compartido por
+      los workers) y se vuelve a leer en cada turno; sin THREAD_CONTEXT_DB se usa `truncate`, porque otro
+      worker seguiría enviando los mensajes al thread eliminado.
+    - `off`: solo se miden los tokens.
+
+    El tamaño de los threads es por proceso y se limita a THREAD_CONTEXT_MAX_THREADS threads (se descartan
+    los más antiguos).
+    """
+
+    STRATEGIES = ("truncate", "rollover", "off")
+
+    def __init__(self, provider: FabricLlmProvider = None):
+        self.provider = provider or FabricLlmProvider()
+        self.max_tokens = int(os.getenv("THREAD_CONTEXT_MAX_TOKENS", "12000"))
+        self.strategy = os.getenv("THREAD_CONTEXT_STRATEGY", "truncate")
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError(f"THREAD_CONTEXT_STRATEGY must be one of {self.STRATEGIES}")
+        self.keep_messages = int(os.getenv("THREAD_CONTEXT_KEEP_MESSAGES", "10"))
+        self.summary_messages = int(os.getenv("THREAD_CONTEXT_SUMMARY_MESSAGES", "10"))
+        self.max_threads = int(os.getenv("THREAD_CONTEXT_MAX_THREADS", "10000"))
+        db_path = os.getenv("THREAD_CONTEXT_DB")
+        self.upstream_map = ThreadUpstreamMap(db_path) if db_path and self.strategy == "rollover" else None
+        if self.strategy == "rollover" and self.upstream_map is None:
+            logger.warning("⚠️ THREAD_CONTEXT_STRATEGY=rollover needs THREAD_CONTEXT_DB, using truncate instead")
+            self.strategy = "truncate"
+        self._threads = OrderedDict()
+        self._lock = threading.Lock()
+        self._cleanup = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thread-context")
+
+        metrics = MetricsRegistry()
+        self.input_tokens = metrics.histogram(
+            "chat_turn_input_tokens", "Input tokens of each Fabric chat turn", buckets=TOKEN_BUCKETS)
+        self.trimmed_total = metrics.counter(
+            "thread_context_trimmed_total", "Runs truncated or threads rolled over to cap their context")
+        metrics.gauge(
+            "thread_context_tracked", "Threads whose context size is being tracked",
+            callback=lambda: len(self._threads))
+
+    @staticmethod
+    def estimate_tokens(text: Optional[str]) -> int:
+        """
+        Estimación barata (unos 4 caracteres por token) para cuando el run no devuelve `usage`.
+        """
+        return (len(text) + 3) // 4 if text else 0
+
+    def prepare(self, thread_id: str) -> tuple[str, dict]:
+        """
+        Devuelve el thread real donde crear el mensaje y el run, y los argumentos extra del run.
+        Se llama desde hilos de trabajo: puede crear un thread nuevo (rollover).
+        """
+        state = self._get(thread_id)
+        if self.upstream_map is not None:
+            self._sync(thread_id, state)
+        if self.strategy != "off" and state.tokens >= self.max_tokens:
+            if self.strategy == "rollover":
+                self._rollover(thread_id, state)
+            elif not state.truncating:
+                logger.info("✂️ Thread %s reached ~%s tokens: truncating its runs", thread_id, state.tokens)
+                state.truncating = True
+
+        run_options = {}
+        if state.truncating:
+            run_options["truncation_strategy"] = {"type": "last_messages", "last_messages": self.keep_messages}
+            self.trimmed_total.inc(strategy="truncate")
+        return state.upstream_id, run_options
+
+    def record(self, thread_id: str, run, user_message: str, answer: Optional[str]):
+        """
+        Anota un turno terminado. El tamaño del thread crece con la pregunta y la respuesta, no con
+        `run.usage.prompt_tokens`: ese total suma todas las llamadas al modelo del run, cada una con las
+        instrucciones del asistente y las salidas de las herramientas, que no se quedan en el thread.
+        `usage` solo se usa para la métrica de tokens de entrada del turno.
+        """
+        state = self._get(thread_id)
+        usage = getattr(run, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if prompt_tokens:
+            source = "usage"
+        else:
+            prompt_tokens = state.tokens + self.estimate_tokens(user_message)
+            source = "estimate"
+        state.tokens += self.estimate_tokens(user_message) + self.estimate_tokens(answer)
+        state.turns += 1
+        self.input_tokens.observe(prompt_tokens, source=source)
+
+    def upstream_id(self, thread_id: str) -> str:
+        """
+        Thread real de un thread de cliente (el mismo si no se ha renovado), sin empezar a seguirlo.
+        """
+        if self.upstream_map is not None:
+            return self.upstream_map.get(thread_id) or thread_id
+        with self._lock:
+            state = self._threads.get(thread_id)
+        return state.upstream_id if state else thread_id
+
+    def forget(self, thread_id: str) -> str:
+        """
+        Deja de seguir un thread y devuelve su thread real (el que hay que eliminar).
+        """
+        with self._lock:
+            state = self._threads.pop(thread_id, None)
+        if self.upstream_map is not None:
+            upstream_id = self.upstream_map.get(thread_id) or thread_id
+            self.upstream_map.remove(thread_id)
+            return upstream_id
+        return state.upstream_id if state else thread_id
+
+    def _sync(self, thread_id: str, state: _ThreadContext):
+        """
+        Adopta el thread real guardado en THREAD_CONTEXT_DB si otro worker lo ha renovado.
+        """
+        upstream_id = self.upstream_map.get(thread_id) or thread_id
+        if upstream_id != state.upstream_id:
+            # El tamaño medido aquí era el del thread anterior; el próximo `record` da el del nuevo
+            state.upstream_id = upstream_id
+            state.tokens = 0
+            state.truncating = False
+
+    def _get(self, thread_id: str) -> _ThreadContext:
+        with self._lock:
+            state = self._threads.get(thread_id)
+            if state is None:
+                state = self._threads[thread_id] = _ThreadContext(thread_id)
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            else:
+                self._threads.move_to_end(thread_id)
+            return state
+
+    def _rollover(self, thread_id: str, state: _ThreadContext):
+        old_id = state.upstream_id
+        try:
+            summary = self._summarize(old_id)
+            new_id = self.provider.create_thread()
+            self.provider.get_project().beta.threads.messages.create(
+                thread_id=new_id, role="user", content=summary
+            )
+        except Exception as e:
+            logger.warning("⚠️ Could not roll over thread %s, truncating instead: %s", thread_id, e)
+            state.truncating = True
+            return
+
+        try:
+            replaced = self.upstream_map.replace(thread_id, old_id, new_id)
+        except Exception as e:
+            logger.warning("⚠️ Could not save the rollover of thread %s, truncating instead: %s", thread_id, e)
+            self._cleanup.submit(self.provider.delete_thread, new_id)
+            state.truncating = True
+            return
+        if not replaced:
+            # Otro worker lo ha renovado a la vez: se sigue en su thread y se descarta el creado aquí
+            self._cleanup.submit(self.provider.delete_thread, new_id)
+            self._sync(thread_id, state)
+            return
+
+        logger.info("🔁 Thread %s reached ~%s tokens: continuing in %s with a summary",
+                    thread_id, state.tokens, new_id)
+        state.upstream_id = new_id
+        state.tokens = self.estimate_tokens(summary)
+        state.truncating = False
+        self.trimmed_total.inc(strategy="rollover")
+        self._cleanup.submit(self.provider.delete_thread, old_id)
+
+    def _summarize(self, upstream_id: str) -> str:
+        """
+        Resumen compacto sin llamar al modelo: los últimos mensajes del thread, recortados.
+        """
+        page = self.provider.get_project().beta.threads.messages.list(
+            thread_id=upstream_id, order="desc", limit=self.summary_messages
+        )
+        lines = []
+        for message in reversed(list(page.data)):
+            text = " ".join(
+                part.text.value for part in (message.content or [])
+                if getattr(part, "type", None) == "text" and part.text
+            )
+            text = " ".join(text.split())
+            if text:
+                author = "Usuario" if message.role == "user" else "Asistente"
+                lines.append(f"- {author}: {text[:400] + '…' if len(text) > 400 else text}")
+        return (
+            "Resumen de la conversación anterior, solo como contexto para las próximas preguntas "
+            "(no lo respondas):\n" + "\n".join(lines)
+        )
@@ -0,0 +1,185 @@
+from src.infrastructure.fabric.FabricLlmProvider import FabricLlmProvider
+from src.infrastructure.fabric.ThreadActivityIndex import ThreadActivityIndex
+from src.infrastructure.fabric.ThreadContextManager import ThreadContextManager
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadSweeper(metaclass=SingletonMeta):
+    """
+    Elimina en segundo plano los threads de Fabric abandonados.
+
+    Un thread solo se eliminaba con `PUT /thread/{old_thread_id}`; las pestañas que se cierran sin más
+    lo dejaban para siempre. Cada petición anota la actividad del thread (`touch`) y, cada
+    THREAD_SWEEP_INTERVAL_S segundos, un hilo propio elimina los que llevan más de THREAD_IDLE_TTL_S sin
+    uso: lotes de THREAD_SWEEP_BATCH_SIZE, THREAD_SWEEP_CONCURRENCY borrados en paralelo con un mismo
+    cliente y como mucho THREAD_SWEEP_RATE por segundo, para no competir con las peticiones por la cuota.
+
+    Sin THREAD_SWEEP_DB el índice es por proceso. Con varios workers hay que indicar un fichero SQLite
+    común (THREAD_SWEEP_DB), que además sobrevive a reinicios; cada worker vuelca en él su actividad cada
+    THREAD_SWEEP_FLUSH_S segundos. En cualquier caso, antes de eliminar un thread se mira su último
+    mensaje en Fabric: si es posterior al corte (lo ha usado otro worker o réplica), no se elimina.
+    """
+
+    def __init__(self, provider: FabricLlmProvider = None):
+        self.provider = provider or FabricLlmProvider()
+        self.enabled = os.getenv("THREAD_SWEEP_ENABLED", "true").lower() == "true"
+        self.idle_ttl = float(os.getenv("THREAD_IDLE_TTL_S", "86400"))
+        self.interval = float(os.getenv("THREAD_SWEEP_INTERVAL_S", "300"))
+        self.flush_interval = min(float(os.getenv("THREAD_SWEEP_FLUSH_S", "10")), self.interval)
+        self.batch_size = int(os.getenv("THREAD_SWEEP_BATCH_SIZE", "50"))
+        self.concurrency = int(os.getenv("THREAD_SWEEP_CONCURRENCY", "4"))
+        self.rate = float(os.getenv("THREAD_SWEEP_RATE", "5"))
+        self.max_attempts = int(os.getenv("THREAD_SWEEP_MAX_ATTEMPTS", "3"))
+        self.index = ThreadActivityIndex(os.getenv("THREAD_SWEEP_DB") or None)
+        self._failures = {}
+        self._backlog = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._deleter = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="thread-sweeper")
+
+        metrics = MetricsRegistry()
+        self.deleted_total = metrics.counter(
+            "thread_sweeper_deleted_total", "Idle threads processed by the sweeper, by outcome")
+        self.sweep_seconds = metrics.histogram(
+            "thread_sweeper_sweep_seconds", "Duration of each sweep of idle threads")
+        metrics.gauge(
+            "thread_sweeper_backlog", "Idle threads still waiting to be deleted by the sweeper",
+            callback=lambda: self._backlog)
+        metrics.gauge(
+            "thread_sweeper_tracked", "Threads in the last-activity index", callback=lambda: len(self.index))
+
+    def touch(self, thread_id: str):
+        self.index.touch(thread_id)
+
+    def forget(self, thread_id: str):
+        """
+        El thread se ha eliminado por otra vía (p. ej. `PUT /thread`): ya no hay que barrerlo.
+        """
+        self.index.remove(thread_id)
+        self._failures.pop(thread_id, None)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="thread-sweeper", daemon=True)
+        self._thread.start()
+        logger.info("🧹 Thread sweeper started: idle TTL %.0fs, every %.0fs", self.idle_ttl, self.interval)
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.index.flush()
+
+    def _run(self):
+        next_sweep = time.monotonic() + self.interval
+        while not self._stop.wait(self.flush_interval):
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.interval
+                    self.sweep()
+                else:
+                    # Los demás workers barren con el índice común: la actividad de este tiene que estar ahí
+                    self.index.flush()
+            except Exception as e:
+                logger.warning("⚠️ Thread sweep failed: %s", e)
+
+    def sweep(self) -> int:
+        """
+        Elimina los threads inactivos por lotes hasta vaciar el backlog. Devuelve cuántos se eliminaron.
+        """
+        start = time.perf_counter()
+        cutoff = time.time() - self.idle_ttl
+        self._backlog = len(self.index.idle(cutoff))
+        deleted = 0
+        skipped = set()
+        while not self._stop.is_set():
+            batch = [t for t in self.index.idle(cutoff, self.batch_size + len(skipped)) if t not in skipped]
+            batch = batch[:self.batch_size]
+            if not batch:
+                break
+            results = self._delete_batch(batch, cutoff)
+            for thread_id, outcome in results:
+                if outcome == "deleted":
+                    deleted += 1
+                elif outcome == "failed":
+                    skipped.add(thread_id)
+            self._backlog = max(self._backlog - len(results), 0)
+            self.index.flush()
+        self.index.flush()
+        if deleted:
+            logger.info("🧹 Deleted %s idle threads in %.1fs", deleted, time.perf_counter() - start)
+        self.sweep_seconds.observe(time.perf_counter() - start)
+        return deleted
+
+    def _delete_batch(self, batch: list[str], cutoff: float) -> list[tuple[str, str]]:
+        # Un solo cliente (y su pool de conexiones) para todo el lote
+        client = self.provider.get_project()
+        spacing = 1 / self.rate if self.rate > 0 else 0
+        futures = []
+        next_slot = time.monotonic()
+        for thread_id in batch:
+            delay = next_slot - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            next_slot = max(next_slot, time.monotonic()) + spacing
+            futures.append((thread_id, self._deleter.submit(self._delete, thread_id, cutoff, client)))
+        return [(thread_id, future.result()) for thread_id, future in futures]
+
+    def _delete(self, thread_id: str, cutoff: float, client) -> str:
+        """
+        Devuelve el resultado: `deleted`, `reused` (se volvió a usar y se deja), `failed` (se reintentará
+        en el próximo barrido) o `abandoned` (falló THREAD_SWEEP_MAX_ATTEMPTS veces).
+        """
+        if not self.index.remove_if_idle(thread_id, cutoff):
+            self.deleted_total.inc(outcome="reused")
+            return "reused"
+
+        upstream_id = ThreadContextManager().upstream_id(thread_id)
+        try:
+            last_message = self._last_message_at(upstream_id, client)
+        except Exception as e:
+            logger.warning("⚠️ Could not read the last message of thread %s: %s", upstream_id, e)
+            last_message, checked = None, False
+        else:
+            checked = True
+
+        if last_message is not None and last_message >= cutoff:
+            # Otro worker o réplica lo ha usado sin que su actividad llegara a este índice
+            self.index.touch(thread_id, last_message)
+            outcome = "reused"
+        elif checked and self.provider.delete_thread(ThreadContextManager().forget(thread_id), client=client):
+            self._failures.pop(thread_id, None)
+            outcome = "deleted"
+        else:
+            attempts = self._failures.get(thread_id, 0) + 1
+            if attempts >= self.max_attempts:
+                self._failures.pop(thread_id, None)
+                logger.warning("⚠️ Giving up on deleting thread %s after %s attempts", thread_id, attempts)
+                outcome = "abandoned"
+            else:
+                self._failures[thread_id] = attempts
+                # Vuelve al índice con una marca antigua para reintentarlo en el próximo barrido
+                self.index.touch(thread_id, cutoff - 1)
+                outcome = "failed"
+        self.deleted_total.inc(outcome=outcome)
+        return outcome
+
+    def _last_message_at(self, upstream_id: str, client) -> Optional[float]:
+        """
+        Fecha (epoch) del último mensaje del thread en Fabric, o None si no tiene mensajes.
+        """
+        page = client.beta.threads.messages.list(thread_id=upstream_id, limit=1, order="desc")
+        return float(page.data[0].created_at) if page.data else None
@@ -0,0 +1,65 @@
+from typing import Optional
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadUpstreamMap:
+    """
+    Thread real de cada thread de cliente renovado (rollover), en un fichero SQLite compartido por todos
+    los workers: cualquier worker que reciba el siguiente mensaje lo envía al thread nuevo.
+
+    Solo se guardan los threads renovados; los demás son su propio thread real.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS thread_upstream (thread_id TEXT PRIMARY KEY, upstream_id TEXT NOT NULL)"
+        )
+        logger.info("🗂️ Thread rollovers shared through %s", path)
+
+    def get(self, thread_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT upstream_id FROM thread_upstream WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def replace(self, thread_id: str, old_id: str, new_id: str) -> bool:
+        """
+        Apunta el thread a `new_id` solo si sigue apuntando a `old_id`. Devuelve False si otro worker
+        lo ha renovado antes.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._db.execute(
+                    "SELECT upstream_id FROM thread_upstream WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+                if (current[0] if current else thread_id) != old_id:
+                    self._db.execute("ROLLBACK")
+                    return False
+                self._db.execute(
+                    "INSERT INTO thread_upstream (thread_id, upstream_id) VALUES (?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET upstream_id = excluded.upstream_id",
+                    (thread_id, new_id),
+                )
+                self._db.execute("COMMIT")
+                return True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove(self, thread_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM thread_upstream WHERE thread_id = ?", (thread_id,))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,114 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Librerías que a nivel INFO escriben una línea por petición HTTP
+NOISY_LOGGERS = (
+    "azure",
+    "azure.identity",
+    "azure.core",
+    "azure.core.pipeline.policies.http_logging_policy",
+    "httpx",
+    "urllib3",
+)
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Como QueueHandler, pero deja la traza de la excepción en `exc_text` en lugar de pegarla al mensaje,
+    para que el formateador JSON la escriba en su propio campo.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Una línea JSON por registro: `ts`, `level`, `logger`, `message` y los campos de `extra`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None) -> QueueListener:
+    """
+    Punto único de configuración del logging de la aplicación (idempotente).
+
+    Los loggers solo encolan el registro (QueueHandler): el formateo y la escritura en stdout los
+    hace un hilo propio (QueueListener), así que un stdout lento no bloquea el event loop.
+    Variables: LOG_LEVEL (`INFO`) y LOG_FORMAT (`text` o `json`). `stream` es stdout por defecto.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        fmt = fmt or os.getenv("LOG_FORMAT", "text")
+        if fmt not in ("text", "json"):
+            raise ValueError("LOG_FORMAT must be 'text' or 'json'")
+
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_QueueHandler(log_queue))
+        root.setLevel(level)
+        for name in NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """
+    Escribe los registros pendientes y para el hilo del listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,158 @@
+from src.infrastructure.SingletonMeta import SingletonMeta
+import math
+import threading
+from typing import Callable, Optional
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    escaped = []
+    for k, v in key:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """
+    Gauge con valor fijado por el código o calculado en cada lectura con `callback`.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, help)
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(_label_key(labels), None)
+
+    def value(self, **labels) -> float:
+        if self.callback is not None and not labels:
+            return self.callback()
+        return super().value(**labels)
+
+    def samples(self):
+        if self.callback is not None:
+            return [(self.name, (), self.callback())]
+        return super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, help: str, buckets: Optional[tuple] = None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS)) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        counts, _ = self._values.get(_label_key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    result.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), count))
+                result.append((f"{self.name}_sum", key, total))
+                result.append((f"{self.name}_count", key, counts[-1]))
+        return result
+
+
+class MetricsRegistry(metaclass=SingletonMeta):
+    """
+    Registro de métricas del proceso, expuesto en formato de texto de Prometheus en `/metrics`.
+
+    Las métricas se registran una sola vez por nombre: volver a pedir una métrica existente
+    devuelve la misma instancia, de modo que cada componente puede declarar las suyas al iniciarse.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(name, lambda: Counter(name, help))
+
+    def gauge(self, name: str, help: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(name, lambda: Gauge(name, help, callback))
+
+    def histogram(self, name: str, help: str, buckets: Optional[tuple] = None) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help, buckets))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,33 @@
+from src.infrastructure.profiling.ProfilingService import ProfilingService
+from src.infrastructure.profiling.SamplingProfiler import current_profiler
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila las peticiones seleccionadas por ProfilingService.
+
+    Envuelve la llamada ASGI completa, por lo que en las respuestas en streaming (SSE) la sesión
+    cubre también la ejecución de los generadores hasta el último evento enviado. El perfilador se
+    guarda en `current_profiler` para muestrear solo los hilos de esta petición.
+    """
+
+    def __init__(self, app, service: ProfilingService = None):
+        self.app = app
+        self.service = service or ProfilingService()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.service.should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.service.start_session(scope["path"])
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = current_profiler.set(profiler)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profiler.reset(token)
+            await self.service.finish_session(profiler, scope["path"])
@@ -0,0 +1,132 @@
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.profiling.SamplingProfiler import ProfiledExecutor, SamplingProfiler
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import weakref
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingService(metaclass=SingletonMeta):
+    """
+    Interruptor de perfilado por petición.
+
+    Se configura con variables de entorno y puede modificarse en caliente desde los endpoints de
+    administración. Una petición se perfila si su ruta está en `endpoints` o, si no, con
+    probabilidad `sample_rate`. Como mucho `max_concurrent` sesiones activas a la vez.
+    """
+
+    FORMATS = ("collapsed", "speedscope")
+
+    def __init__(self):
+        self.enabled = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.sample_rate = float(os.getenv("PROFILING_SAMPLE_RATE", "0.0"))
+        self.endpoints = [e.strip() for e in os.getenv("PROFILING_ENDPOINTS", "").split(",") if e.strip()]
+        self.output_dir = os.getenv("PROFILING_OUTPUT_DIR", "profiles")
+        self.output_format = os.getenv("PROFILING_FORMAT", "collapsed")
+        self.interval_ms = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+        self.max_duration = float(os.getenv("PROFILING_MAX_DURATION_S", "60"))
+        self.max_concurrent = int(os.getenv("PROFILING_MAX_CONCURRENT", "1"))
+        self._active = 0
+        self._lock = threading.Lock()
+        # Event loops con ProfiledExecutor como executor por defecto
+        self._loops = weakref.WeakSet()
+
+    def get_settings(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "endpoints": self.endpoints,
+            "output_dir": self.output_dir,
+            "output_format": self.output_format,
+            "interval_ms": self.interval_ms,
+            "max_duration": self.max_duration,
+            "max_concurrent": self.max_concurrent,
+            "active_sessions": self._active,
+        }
+
+    def update_settings(self, settings: dict) -> dict:
+        """
+        Actualiza la configuración en caliente. Solo se aplican las claves conocidas.
+        """
+        if "output_format" in settings and settings["output_format"] not in self.FORMATS:
+            raise ValueError(f"output_format must be one of {self.FORMATS}")
+        if "sample_rate" in settings and not 0.0 <= float(settings["sample_rate"]) <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        if "enabled" in settings:
+            self.enabled = bool(settings["enabled"])
+        if "sample_rate" in settings:
+            self.sample_rate = float(settings["sample_rate"])
+        if "endpoints" in settings:
+            self.endpoints = list(settings["endpoints"])
+        if "output_dir" in settings:
+            self.output_dir = str(settings["output_dir"])
+        if "output_format" in settings:
+            self.output_format = settings["output_format"]
+        if "interval_ms" in settings:
+            self.interval_ms = max(float(settings["interval_ms"]), 1.0)
+        if "max_duration" in settings:
+            self.max_duration = float(settings["max_duration"])
+        if "max_concurrent" in settings:
+            self.max_concurrent = int(settings["max_concurrent"])
+        logger.info("Profiling settings updated: %s", self.get_settings())
+        return self.get_settings()
+
+    def should_profile(self, path: str) -> bool:
+        if not self.enabled:
+            return False
+        if path in self.endpoints:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start_session(self, path: str) -> Optional[SamplingProfiler]:
+        """
+        Arranca un perfilador para la petición, o None si ya se alcanzó el máximo de sesiones.
+        Se llama desde el event loop.
+        """
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                return None
+            self._active += 1
+        loop = asyncio.get_running_loop()
+        if loop not in self._loops:
+            # Para muestrear también los hilos de asyncio.to_thread de la petición
+            loop.set_default_executor(ProfiledExecutor(thread_name_prefix="asyncio"))
+            self._loops.add(loop)
+        profiler = SamplingProfiler(interval=self.interval_ms / 1000, max_duration=self.max_duration)
+        profiler.start()
+        return profiler
+
+    async def finish_session(self, profiler: SamplingProfiler, path: str):
+        # stop espera al hilo del perfilador: fuera del event loop
+        await asyncio.to_thread(profiler.stop)
+        with self._lock:
+            self._active -= 1
+        try:
+            file_path = await asyncio.to_thread(self._write, profiler, path)
+            logger.info("📈 Profile written to %s (%s samples)", file_path, profiler.sample_count)
+        except Exception as e:
+            logger.warning("⚠️ Could not write profile for %s: %s", path, e)
+
+    def _write(self, profiler: SamplingProfiler, path: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", path).strip("-") or "root"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(profiler.started_at))
+        name = f"{stamp}-{slug}-{uuid.uuid4().hex[:8]}"
+        if self.output_format == "speedscope":
+            file_path = os.path.join(self.output_dir, f"{name}.speedscope.json")
+            content = profiler.to_speedscope(f"{path} {stamp}")
+        else:
+            file_path = os.path.join(self.output_dir, f"{name}.collapsed")
+            content = profiler.to_collapsed()
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return file_path
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+# Frames where a thread is just waiting for work. Samples whose innermost frame is one of
+# these are dropped so idle event loops and thread pool workers don't dominate the flamegraph.
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# Perfilador de la petición en curso (lo fija ProfilingMiddleware); lo heredan sus tareas y sus hilos
+current_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar("current_profiler", default=None)
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Si se llama dentro de una petición perfilada, envuelve `fn` para que el hilo que la ejecute se
+    muestree mientras dura. Para hilos propios (ver UpstreamReader).
+    """
+    profiler = current_profiler.get()
+    if profiler is None:
+        return fn
+    return functools.partial(profiler.run_in_thread, fn)
+
+
+class ProfiledExecutor(ThreadPoolExecutor):
+    """
+    Executor por defecto del event loop (lo instala ProfilingService): lo que una petición perfilada
+    envía con asyncio.to_thread o run_in_executor(None, ...) se muestrea en el hilo que lo ejecuta.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(profiled(fn), *args, **kwargs)
+
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo de bajo coste basado en sys._current_frames().
+
+    Un hilo en segundo plano captura cada `interval` segundos la pila de los hilos de la petición y
+    acumula las pilas colapsadas. Son de la petición el event loop mientras ejecuta una de sus tareas
+    (las que heredan `current_profiler`) y los hilos que ejecutan trabajo suyo (ver `profiled`). Los
+    procesos de ExtractionPool y los hilos de executors propios (como el de /chat/batch) no se muestrean.
+    El coste está acotado por el intervalo, por `max_samples` y por `max_duration`: al alcanzar
+    cualquiera de los límites deja de muestrear.
+    """
+
+    def __init__(self, interval: float = 0.005, max_duration: float = 60.0,
+                 max_samples: int = 20000, max_depth: int = 128):
+        self.interval = max(interval, 0.001)
+        self.max_duration = max_duration
+        self.max_samples = max_samples
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # Hilos que ejecutan ahora trabajo de la petición
+        self._threads = set()
+
+    def start(self):
+        """
+        Se llama desde el event loop de la petición.
+        """
+        self.started_at = time.time()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def run_in_thread(self, fn: Callable, *args, **kwargs):
+        thread_id = threading.get_ident()
+        self._threads.add(thread_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._threads.discard(thread_id)
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.stopped_at = time.time()
+        return self.samples
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            if time.monotonic() > deadline or self.sample_count >= self.max_samples:
+                break
+            threads = set(self._threads)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._loop_thread:
+                    # El event loop es de todas las peticiones: solo cuenta mientras ejecuta una tarea de esta
+                    task = asyncio.current_task(self._loop)
+                    if task is None or task.get_context().get(current_profiler) is not self:
+                        continue
+                elif thread_id not in threads or thread_id == own_id:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if leaf in _IDLE_LEAVES:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                    depth += 1
+                stack.append(names.get(thread_id, str(thread_id)))
+                stack.reverse()
+                self.samples[";".join(stack)] += 1
+            self.sample_count += 1
+
+    def to_collapsed(self) -> str:
+        """
+        Formato de pilas colapsadas (flamegraph.pl, speedscope, inferno): `a;b;c <count>` por línea.
+        """
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def to_speedscope(self, name: str) -> str:
+        """
+        Formato JSON de speedscope (perfil de tipo "sampled").
+        """
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        for stack, count in self.samples.items():
+            indexes = []
+            for frame_name in stack.split(";"):
+                if frame_name not in frame_index:
+                    frame_index[frame_name] = len(frames)
+                    frames.append({"name": frame_name})
+                indexes.append(frame_index[frame_name])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": name,
+            "exporter": "camp-chat-backend",
+        })
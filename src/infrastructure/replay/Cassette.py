@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import threading
+from typing import Optional
+from urllib.parse import urlsplit, parse_qsl
+
+
+# Resource ids generated by the Assistants API (thread_..., run_..., msg_..., asst_..., step_...)
+# and the UUIDs / opaque ids used by Foundry. They are replaced by `{id}` so that recorded traffic
+# can be replayed against any thread or run.
+_ID_PATTERN = re.compile(
+    r"^(?:(?:thread|run|msg|asst|step|call|file|vs)_[A-Za-z0-9]+"
+    r"|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})$"
+)
+_RESOURCE_ROOTS = ("threads", "assistants")
+
+
+def normalize_path(path: str) -> str:
+    """
+    Normaliza la ruta de una llamada al API para que sea independiente del endpoint y de los ids.
+
+    Ejemplo: /v1/workspaces/w/aiskills/a/aiassistant/openai/threads/thread_abc/runs
+             -> /threads/{id}/runs
+    """
+    segments = [s for s in path.split("/") if s]
+    for i, segment in enumerate(segments):
+        if segment in _RESOURCE_ROOTS:
+            segments = segments[i:]
+            break
+    return "/" + "/".join("{id}" if _ID_PATTERN.match(s) else s for s in segments)
+
+
+def decode_chunk(chunk: bytes) -> str:
+    return chunk.decode("utf-8", "surrogateescape")
+
+
+def encode_chunk(chunk: str) -> bytes:
+    return chunk.encode("utf-8", "surrogateescape")
+
+
+def decode_body(body: Optional[bytes]):
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return decode_chunk(body)
+
+
+class Cassette:
+    """
+    Fichero JSONL con las interacciones HTTP grabadas contra un backend (fabric o foundry).
+
+    Cada línea es una interacción:
+    {
+        "backend": "fabric",
+        "method": "POST",
+        "path": "/threads/{id}/runs",
+        "query": {"api-version": "2025-04-01-preview"},
+        "request": {...},
+        "status": 200,
+        "content_type": "text/event-stream",
+        "ttfb": 0.412,
+        "chunks": [[0.003, "event: thread.run.created\\ndata: {...}\\n\\n"], ...]
+    }
+    `ttfb` es el tiempo hasta las cabeceras y cada chunk lleva su instante relativo a las cabeceras.
+    """
+
+    def __init__(self, directory: str, backend: str):
+        self.backend = backend
+        self.path = os.path.join(directory, f"{backend}.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def new_interaction(self, method: str, url: str, body: Optional[bytes]) -> dict:
+        parts = urlsplit(str(url))
+        return {
+            "backend": self.backend,
+            "method": method.upper(),
+            "path": normalize_path(parts.path),
+            "query": dict(parse_qsl(parts.query)),
+            "request": decode_body(body),
+            "status": None,
+            "content_type": None,
+            "ttfb": None,
+            "chunks": [],
+        }
+
+    def append(self, interaction: dict):
+        line = json.dumps(interaction, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    @staticmethod
+    def load(path: str) -> list:
+        interactions = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interactions.append(json.loads(line))
+        return interactions
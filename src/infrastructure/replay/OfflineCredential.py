@@ -0,0 +1,14 @@
+from azure.core.credentials import AccessToken
+import time
+
+
+class OfflineCredential:
+    """
+    Credencial ficticia para ejecutar el backend contra el servidor de replay sin Azure AD.
+    """
+
+    def get_token(self, *scopes, **kwargs) -> AccessToken:
+        return AccessToken("offline-replay-token", int(time.time()) + 3600)
+
+    def close(self):
+        pass
@@ -0,0 +1,49 @@
+from src.infrastructure.replay.Cassette import Cassette, decode_chunk
+from azure.core.pipeline.transport import RequestsTransport
+import time
+
+
+class RecordingAzureTransport(RequestsTransport):
+    """
+    Transporte de azure-core que graba las llamadas del AIProjectClient (agentes de Foundry)
+    en un Cassette, incluido el instante de llegada de cada chunk de los streams de runs.
+    """
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        body = getattr(request, "content", None) or getattr(request, "data", None)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        interaction = self.cassette.new_interaction(request.method, request.url, body if isinstance(body, bytes) else None)
+
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        interaction["ttfb"] = round(time.monotonic() - start, 4)
+        interaction["status"] = response.status_code
+        interaction["content_type"] = response.headers.get("content-type")
+
+        internal = response.internal_response
+        if not kwargs.get("stream"):
+            interaction["chunks"].append([0.0, decode_chunk(internal.content or b"")])
+            self.cassette.append(interaction)
+            return response
+
+        # Respuesta en streaming: se graba a medida que el SDK consume los chunks
+        iter_content = internal.iter_content
+        headers_at = time.monotonic()
+        cassette = self.cassette
+
+        def recording_iter_content(chunk_size=1, decode_unicode=False):
+            try:
+                for chunk in iter_content(chunk_size, decode_unicode):
+                    if chunk:
+                        interaction["chunks"].append([round(time.monotonic() - headers_at, 4), decode_chunk(chunk)])
+                    yield chunk
+            finally:
+                cassette.append(interaction)
+
+        internal.iter_content = recording_iter_content
+        return response
@@ -0,0 +1,53 @@
+from src.infrastructure.replay.Cassette import Cassette, decode_chunk
+import httpx
+import time
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, interaction: dict, cassette: Cassette):
+        self._stream = stream
+        self._interaction = interaction
+        self._cassette = cassette
+        self._start = time.monotonic()
+        self._written = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._interaction["chunks"].append([round(time.monotonic() - self._start, 4), decode_chunk(chunk)])
+            yield chunk
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._written:
+                self._written = True
+                self._cassette.append(self._interaction)
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """
+    Transporte httpx que graba todas las llamadas del cliente OpenAI (Assistants API de Fabric)
+    en un Cassette, incluido el instante de llegada de cada chunk de los streams SSE.
+    """
+
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport = None):
+        self.cassette = cassette
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # Sin compresión, para grabar los eventos SSE tal y como llegan
+        request.headers["Accept-Encoding"] = "identity"
+        interaction = self.cassette.new_interaction(request.method, str(request.url), request.read())
+
+        start = time.monotonic()
+        response = self.transport.handle_request(request)
+        interaction["ttfb"] = round(time.monotonic() - start, 4)
+        interaction["status"] = response.status_code
+        interaction["content_type"] = response.headers.get("content-type")
+
+        response.stream = _RecordingStream(response.stream, interaction, self.cassette)
+        return response
+
+    def close(self):
+        self.transport.close()
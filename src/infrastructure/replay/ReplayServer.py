@@ -0,0 +1,121 @@
+from src.infrastructure.replay.Cassette import Cassette, decode_body, normalize_path, encode_chunk
+from src.infrastructure.logs.LoggingConfig import configure_logging
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Optional
+import argparse
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayServer:
+    """
+    Servidor local que imita el Assistants API de Fabric y los agentes de Foundry reproduciendo
+    las interacciones grabadas por RecordingTransport/RecordingAzureTransport.
+
+    Las rutas se sirven bajo /fabric y /foundry. Cada petición se empareja por backend, método, ruta
+    normalizada y el campo `stream` del cuerpo (un run en streaming y uno sin streaming van a la misma
+    ruta); si hay varias grabaciones que encajan se reproducen en rueda.
+
+    - latency_ms: sustituye el tiempo hasta cabeceras grabado por un valor fijo.
+    - time_scale: multiplica los tiempos grabados (0 = sin esperas, 2 = el doble de lento).
+    - token_rate: si se indica, los deltas de texto de los streams SSE se emiten a este ritmo
+      (eventos por segundo) en lugar de con los tiempos grabados.
+    """
+
+    BACKENDS = ("fabric", "foundry")
+
+    def __init__(self, cassette_dir: str, latency_ms: Optional[float] = None,
+                 time_scale: float = 1.0, token_rate: Optional[float] = None):
+        self.latency_ms = latency_ms
+        self.time_scale = time_scale
+        self.token_rate = token_rate
+        self.interactions = {}
+        self._cursors = {}
+
+        for backend in self.BACKENDS:
+            path = os.path.join(cassette_dir, f"{backend}.jsonl")
+            if not os.path.exists(path):
+                continue
+            for interaction in Cassette.load(path):
+                key = (backend, interaction["method"], interaction["path"], self.is_stream(interaction.get("request")))
+                self.interactions.setdefault(key, []).append(interaction)
+            logger.info("Loaded cassette %s", path)
+
+    @staticmethod
+    def is_stream(request_body) -> bool:
+        return isinstance(request_body, dict) and bool(request_body.get("stream"))
+
+    def match(self, backend: str, method: str, path: str, stream: bool = False) -> Optional[dict]:
+        key = (backend, method.upper(), normalize_path(path), stream)
+        candidates = self.interactions.get(key)
+        if not candidates:
+            return None
+        cursor = self._cursors.get(key, 0)
+        self._cursors[key] = cursor + 1
+        return candidates[cursor % len(candidates)]
+
+    async def _replay_chunks(self, interaction: dict):
+        chunks = interaction["chunks"]
+        is_sse = (interaction.get("content_type") or "").startswith("text/event-stream")
+
+        if self.token_rate and is_sse:
+            body = "".join(chunk for _, chunk in chunks)
+            for event in body.split("\n\n"):
+                if not event.strip():
+                    continue
+                yield encode_chunk(event + "\n\n")
+                if "thread.message.delta" in event:
+                    await asyncio.sleep(1.0 / self.token_rate)
+            return
+
+        previous = 0.0
+        for offset, chunk in chunks:
+            delay = (offset - previous) * self.time_scale
+            previous = offset
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield encode_chunk(chunk)
+
+    def create_app(self) -> FastAPI:
+        app = FastAPI(title="Camp Chat Replay Server")
+
+        @app.api_route("/{backend}/{path:path}", methods=["GET", "POST", "DELETE", "PUT", "PATCH"])
+        async def replay(backend: str, path: str, request: Request):
+            stream = self.is_stream(decode_body(await request.body()))
+            interaction = self.match(backend, request.method, "/" + path, stream)
+            if interaction is None:
+                logger.warning("No recorded interaction for %s /%s/%s (stream=%s)", request.method, backend, path, stream)
+                return JSONResponse({"error": {"message": f"No recorded interaction for {request.method} /{path}"}}, status_code=404)
+
+            ttfb = self.latency_ms / 1000 if self.latency_ms is not None else (interaction.get("ttfb") or 0) * self.time_scale
+            if ttfb > 0:
+                await asyncio.sleep(ttfb)
+
+            media_type = interaction.get("content_type") or "application/json"
+            if len(interaction["chunks"]) <= 1 and not media_type.startswith("text/event-stream"):
+                content = encode_chunk(interaction["chunks"][0][1]) if interaction["chunks"] else b""
+                return Response(content=content, status_code=interaction["status"], media_type=media_type)
+            return StreamingResponse(self._replay_chunks(interaction), status_code=interaction["status"], media_type=media_type)
+
+        return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Replay recorded Fabric/Foundry traffic")
+    parser.add_argument("--cassettes", default=os.getenv("TRAFFIC_RECORD_DIR", "recordings"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--token-rate", type=float, default=None)
+    args = parser.parse_args()
+
+    configure_logging()
+    server = ReplayServer(args.cassettes, args.latency_ms, args.time_scale, args.token_rate)
+    uvicorn.run(server.create_app(), host=args.host, port=args.port)
@@ -0,0 +1,122 @@
+from src.infrastructure.repositories.prompts.SemanticModelCatalog import SemanticModelCatalog
+from typing import Optional
+import hashlib
+import logging
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_OPTIONAL_BLOCK = re.compile(r"<!-- optional -->\n(.*?)<!-- /optional -->\n?", re.DOTALL)
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(?:\s|$)")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens del texto con tiktoken (opcional, codificación o200k_base) o, sin él, ~4 caracteres por token.
+    """
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+    return (len(text) + 3) // 4
+
+
+class CompiledPrompt:
+    def __init__(self, text: str, level: str, tokens: int, catalog_version: str):
+        self.text = text
+        self.level = level
+        self.tokens = tokens
+        self.catalog_version = catalog_version
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+    def stats(self) -> dict:
+        return {"version": self.version, "catalog_version": self.catalog_version, "level": self.level,
+                "tokens": self.tokens, "chars": len(self.text)}
+
+
+class PromptCompiler:
+    """
+    Genera el system prompt a partir de SemanticModelCatalog, con el menor recorte que quepa en
+    `token_budget`. Niveles, de más a menos completo:
+    - `full`: el formato markdown original.
+    - `compact`: el mismo contenido con una línea por medida o columna y sin marcado ni líneas vacías.
+    - `short`: solo la primera frase de cada descripción.
+    - `names`: solo los nombres, salvo las descripciones marcadas con `keep`.
+    - `minimal`: `names` sin las secciones opcionales de la plantilla (estructura de respuesta y ejemplos).
+    Los nombres de medidas y columnas no se quitan nunca. Sin presupuesto se usa `compact`, que no pierde contenido.
+    """
+
+    LEVELS = ("full", "compact", "short", "names", "minimal")
+
+    def __init__(self, catalog: Optional[SemanticModelCatalog] = None):
+        self.catalog = catalog or SemanticModelCatalog()
+
+    def compile(self, token_budget: Optional[int] = None) -> CompiledPrompt:
+        levels = self.LEVELS[1:] if not token_budget else self.LEVELS
+        compiled = None
+        for level in levels:
+            compiled = self.render(level)
+            if not token_budget or compiled.tokens <= token_budget:
+                return compiled
+        logger.warning("⚠️ System prompt needs %s tokens, over the budget of %s", compiled.tokens, token_budget)
+        return compiled
+
+    def render(self, level: str) -> CompiledPrompt:
+        if level not in self.LEVELS:
+            raise ValueError(f"level must be one of {self.LEVELS}")
+        catalog = self.catalog
+        text = catalog.template
+        text = _OPTIONAL_BLOCK.sub("" if level == "minimal" else r"\1", text)
+        text = (text.replace("{{measures}}", self._render_tables(catalog.measures, "measures", level))
+                    .replace("{{dimensions}}", self._render_tables(catalog.dimensions, "columns", level))
+                    .replace("{{category_granularity}}", self._render_granularity(level)))
+        if level != "full":
+            text = text.replace("**", "")
+            text = "\n".join(line for line in text.splitlines() if line.strip())
+        text = text.strip() + "\n"
+        return CompiledPrompt(text, level, count_tokens(text), catalog.version)
+
+    def _describe(self, item: dict, level: str) -> Optional[str]:
+        description = item.get("description")
+        if not description or item.get("keep") or level in ("full", "compact"):
+            return description
+        if level == "short":
+            match = _FIRST_SENTENCE.match(description)
+            return match.group(1) if match else description
+        return None
+
+    def _render_tables(self, tables: list, kind: str, level: str) -> str:
+        blocks = []
+        for table in tables:
+            lines = []
+            if level == "full":
+                lines += [f"### {table['name']}", "", f"**Description**: {table['description']}", "",
+                          f"**{table.get('label', 'Visible ' + kind)}**:"]
+            else:
+                lines.append(f"### {table['name']}: {table['description']}")
+            for item in table[kind]:
+                description = self._describe(item, level)
+                if level == "full":
+                    name = f"`{item['name']}`" if kind == "measures" else item["name"]
+                    if kind == "measures" and not description:
+                        description = "(no description available in model)."
+                else:
+                    name = item["name"]
+                if kind == "columns":
+                    name += f" ({item['type']})"
+                separator = " — " if level == "full" else ": "
+                lines.append(f"- {name}{separator}{description}" if description else f"- {name}")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def _render_granularity(self, level: str) -> str:
+        section = self.catalog.category_granularity
+        examples = section["examples"]
+        if level in ("names", "minimal"):
+            examples = examples[-1:]
+        lines = [f"### {section['name']}", f"- {section['rule']}"]
+        lines += [f"i.e: \"{example['question']}\" -> {example['fallback']}" for example in examples]
+        return "\n".join(lines)
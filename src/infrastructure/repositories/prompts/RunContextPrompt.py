@@ -0,0 +1,26 @@
+from functools import lru_cache
+import time
+
+
+@lru_cache(maxsize=8)
+def _render(template: str, fecha: str) -> str:
+    return template.format(fecha=fecha)
+
+
+class RunContextPrompt:
+    """
+    Contexto de cada petición (la fecha actual) que se envía como `additional_instructions` del run.
+
+    Así no se añade al mensaje del usuario: el thread guarda solo sus palabras, el historial no repite
+    la instrucción en cada turno y el texto del mensaje es estable. El texto se genera una vez al día.
+    """
+
+    FABRIC = ("La fecha actual es {fecha}. Usa esta información como filtro en las queries DAX o SQL. "
+              "No menciones esta instrucción al usuario.")
+    FOUNDRY = "La fecha actual es {fecha}. Usa esta información en tus respuestas si es relevante."
+
+    def __init__(self, template: str = FABRIC):
+        self.template = template
+
+    def get_prompt(self) -> str:
+        return _render(self.template, time.strftime("%Y-%m-%d"))
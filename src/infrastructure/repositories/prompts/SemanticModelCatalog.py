@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+
+CATALOG_DIR = os.path.join(os.path.dirname(__file__), "catalog")
+
+
+class SemanticModelCatalog:
+    """
+    Catálogo del modelo semántico que se describe al agente: tablas de medidas, dimensiones y
+    granularidad de categorías, en ficheros JSON de `catalog/`, más la plantilla del system prompt
+    (`system_prompt.md`) con los huecos `{{measures}}`, `{{dimensions}}` y `{{category_granularity}}`.
+
+    Cada medida o columna tiene `name`, `description` opcional y `keep: true` si su descripción
+    contiene reglas de negocio o sinónimos que no deben recortarse al comprimir el prompt.
+    """
+
+    def __init__(self, directory: str = CATALOG_DIR):
+        self.directory = directory
+        self.measures = self._load_json("measures.json")["tables"]
+        self.dimensions = self._load_json("dimensions.json")["tables"]
+        self.category_granularity = self._load_json("category_granularity.json")
+        with open(os.path.join(directory, "system_prompt.md"), encoding="utf-8") as f:
+            self.template = f.read()
+
+    def _load_json(self, name: str) -> dict:
+        with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def version(self) -> str:
+        """
+        Hash del contenido del catálogo (independiente de cómo se compile).
+        """
+        raw = json.dumps([self.measures, self.dimensions, self.category_granularity, self.template],
+                         sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
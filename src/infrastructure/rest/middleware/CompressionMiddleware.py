@@ -0,0 +1,214 @@
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compresión negociada con Accept-Encoding (zstd, br, gzip).
+
+    - Respuestas completas: solo se comprimen si superan `min_size` bytes.
+    - Respuestas en streaming (SSE, NDJSON): las cabeceras salen en cuanto la aplicación las envía, sin
+      esperar al primer evento; se comprime cada mensaje del body y se hace flush al final de cada uno,
+      de modo que cada frame llega al cliente sin esperar al siguiente.
+    Todas las respuestas de un tipo comprimible llevan `Vary: Accept-Encoding`, se compriman o no, para
+    que las cachés no sirvan una versión comprimida a quien no la acepta (ni al revés).
+    brotli y zstandard son opcionales: si no están instalados solo se negocia gzip.
+    """
+
+    COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson")
+    STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")
+
+    def __init__(self, app, min_size: Optional[int] = None):
+        self.app = app
+        self.enabled = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+        self.min_size = min_size if min_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+        self.brotli_quality = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+        self.zstd_level = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+        # Orden de preferencia del servidor
+        self.encodings = []
+        if zstandard is not None:
+            self.encodings.append("zstd")
+        if brotli is not None:
+            self.encodings.append("br")
+        self.encodings.append("gzip")
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = {}
+        for part in accept_encoding.split(","):
+            token, _, params = part.strip().partition(";")
+            token = token.strip().lower()
+            if not token:
+                continue
+            q = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[token] = q
+
+        wildcard = accepted.get("*", 0.0)
+        best = None
+        best_q = 0.0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def _compressor(self, encoding: str):
+        if encoding == "zstd":
+            return _ZstdCompressor(self.zstd_level)
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        # Sin codificación aceptada la respuesta sale tal cual, pero con Vary
+        encoding = self.negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start_message = None
+        self._compressor = None
+        self._passthrough = False
+
+    async def send(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or not content_type.startswith(self.middleware.COMPRESSIBLE_TYPES):
+                self._passthrough = True
+                await self._send(message)
+                return
+            self._start_message = message
+            if self.encoding is None:
+                self._passthrough = True
+                await self._flush_start()
+            elif content_type.startswith(self.middleware.STREAMING_TYPES):
+                # El cliente de un stream espera las cabeceras antes del primer evento
+                self._compressor = self.middleware._compressor(self.encoding)
+                await self._send_start(content_length=None)
+            return
+
+        if message_type != "http.response.body" or self._passthrough:
+            await self._flush_start()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self._compressor is None:
+            # Respuesta completa y pequeña: no compensa comprimir
+            if not more_body and len(body) < self.middleware.min_size:
+                self._passthrough = True
+                await self._flush_start()
+                await self._send(message)
+                return
+
+            self._compressor = self.middleware._compressor(self.encoding)
+            if not more_body:
+                compressed = self._compressor.compress(body) + self._compressor.finish()
+                await self._send_start(content_length=len(compressed))
+                await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+            await self._send_start(content_length=None)
+
+        if more_body:
+            chunk = self._compressor.compress(body) + self._compressor.flush()
+        else:
+            chunk = self._compressor.compress(body) + self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _flush_start(self):
+        """
+        Envía sin comprimir las cabeceras pendientes de una respuesta de tipo comprimible.
+        """
+        if self._start_message is not None:
+            start, self._start_message = self._start_message, None
+            await self._send({**start, "headers": self._with_vary(start.get("headers", []))})
+
+    async def _send_start(self, content_length: Optional[int]):
+        start, self._start_message = self._start_message, None
+        headers = [(k, v) for k, v in self._with_vary(start.get("headers", [])) if k.lower() != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        await self._send({**start, "headers": headers})
+
+    @staticmethod
+    def _with_vary(headers) -> list:
+        vary = [v for k, v in headers if k.lower() == b"vary"]
+        if any(part.strip().lower() == b"accept-encoding" for value in vary for part in value.split(b",")):
+            return list(headers)
+        return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", b", ".join(vary + [b"Accept-Encoding"]))]
@@ -0,0 +1,36 @@
+from starlette.responses import JSONResponse
+from typing import Any
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+# json.dumps con argumentos crea un encoder por llamada; este se reutiliza
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    JSON compacto en UTF-8, con orjson (opcional) o, sin él, con la librería estándar.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+    return _ENCODER.encode(obj).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serializada con `dumps`: es la respuesta por defecto de la API.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
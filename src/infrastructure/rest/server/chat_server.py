@@ -1,38 +1,56 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Request, Header, WebSocket
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from src.domain.models.ChatRequest import ChatRequest
-from src.application.ChatWithAgentUseCase import ChatWithAgentUseCase
-from src.application.CreateNewThreadUseCase import CreateNewThreadUseCase
-from src.infrastructure.fabric.FabricAgentService import FabricAgentService
-from src.infrastructure.fabric.FabricLlmProvider import FabricLlmProvider
-from src.infrastructure.azure.AzureFoundryAgentService import AzureFoundryAgentService
-from src.infrastructure.azure.AzureFoundryAgentProvider import AzureFoundryAgentProvider
+from src.domain.models.ProfilingSettings import ProfilingSettings
+from src.infrastructure.backends.BackendRegistry import BackendRegistry
+from src.infrastructure.logs.LoggingConfig import configure_logging
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from src.infrastructure.profiling.ProfilingMiddleware import ProfilingMiddleware
+from src.infrastructure.profiling.ProfilingService import ProfilingService
+from src.infrastructure.rest.middleware.CompressionMiddleware import CompressionMiddleware
+from src.infrastructure.rest.serialization.JsonCodec import FastJSONResponse
+from src.infrastructure.rest.server.common import parse_body
+from src.infrastructure.rest.websocket.ChatSocketSession import ChatSocketSession
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+from src.infrastructure.streaming.ShutdownCoordinator import ShutdownCoordinator
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from typing import Optional
 import logging
-import sys
-import json
+import os
 
 
-
-app = FastAPI()
+configure_logging()
 logger = logging.getLogger(__name__)
 
-logging.getLogger("azure").setLevel(logging.WARNING)
-logging.getLogger("azure.identity").setLevel(logging.WARNING)
-logging.getLogger("azure.core").setLevel(logging.WARNING)
-logging.getLogger("azure.core.pipeline.policies.http_logging_policy").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
+try:
+    load_dotenv()
+    logger.info("✅ .env file loaded successfully.")
+    # Don't log secrets; only log presence of expected vars
+    logger.info("AZURE_CLIENT_ID present: %s", bool(os.getenv('AZURE_CLIENT_ID')))
+except Exception as e:
+    logger.warning("Could not load .env file: %s", e)
+    pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Las rutas de cada backend añaden su propio arranque y parada (ver `lifespan` en sus módulos).
+    Al parar, ShutdownCoordinator deja de aceptar chats y drena los streams en curso; normalmente
+    empieza antes, con la señal de parada, mientras el servidor espera a que se cierren las conexiones.
+    """
+    ShutdownCoordinator().install_signal_handlers()
+    yield
+    await ShutdownCoordinator().drain()
+
 
 app = FastAPI(
     title="Camp Chat Backend",
     description="API REST para chat con agente Azure",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -42,6 +60,22 @@ app.add_middleware(
     allow_methods=["POST", "OPTIONS" , "GET"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+# Solo se montan las rutas de los backends configurados; sus SDK se importan en la primera petición
+registry = BackendRegistry()
+for backend in registry.enabled:
+    app.include_router(registry.routes(backend).router)
+if registry.enabled:
+    logger.info("Chat backends: %s", ", ".join(registry.enabled))
+else:
+    logger.warning("⚠️ No chat backend configured: set FABRIC_DATA_AGENT_URL, the Foundry variables or CHAT_BACKENDS")
+
+def _check_admin(admin_token: Optional[str]):
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected or admin_token != expected:
+        raise HTTPException(status_code=403, detail="Forbidden")
 
 @app.get("/")
 async def root():
@@ -50,109 +84,59 @@ async def root():
     """
     return {"message": "Backend del Agente Campofrío"}
 
-### Fabric Endpoints
-
-@app.put("/thread/{old_thread_id}")
-def create_thread_fabric(old_thread_id: str):
+@app.get("/metrics")
+def metrics():
     """
-    Elimina el hilo antiguo y crea uno nuevo.
-    Devuelve el thread_id para mantener el contexto.
-    Ejemplo de respuesta:
-    {
-        "thread_id": "abc123"
-    }
+    Métricas del proceso en formato de texto de Prometheus.
     """
-    provider = FabricLlmProvider()
-    try:
-        thread_id = CreateNewThreadUseCase(provider).execute(old_thread_id=old_thread_id)
-        return JSONResponse(content={"thread_id": thread_id}, status_code=201)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return PlainTextResponse(MetricsRegistry().render(), media_type="text/plain; version=0.0.4")
 
-@app.post("/chat")
-async def chat_stream_fabric(request: Request):
-    payload = await request.json()
-    thread_id = payload.get("thread_id")
-    message = payload.get("message")
-    assistant_id = payload.get("assistant_id", None)
-    logger.info(f"Received streaming chat request: thread_id={thread_id}, message={message}, assistant_id={assistant_id}")
+### Admin Endpoints
 
-    fabric_service = FabricAgentService(assistant_id)
-
-    if not thread_id or not message:
-        return JSONResponse({"error": "thread_id and message are required"}, status_code=400)
-
-    try:
-        async def event_stream_fabric():
-            async for evt in fabric_service.chat_stream(thread_id, message):
-                data = json.dumps(evt)
-                yield f"data: {data}\n\n"
-            # final event
-            yield "event: done\ndata: {}\n\n"
-            
-        return StreamingResponse(event_stream_fabric(), media_type="text/event-stream")
-    
-    except Exception as e:
-
-        return JSONResponse({"error": "Server error, probabily reached quota limit"}, status_code=400)
-
-@app.post("/chat/dax")
-async def get_dax_queries(request: Request):
-    payload = await request.json()
-    thread_id = payload.get("thread_id")
-    message = payload.get("message")
-    assistant_id = payload.get("assistant_id", None)
-    logger.info(f"Received user request: thread_id={thread_id}, message={message}, assistant_id={assistant_id}")
-
-    fabric_service = FabricAgentService(assistant_id)
-
-    if not thread_id or not message:
-        return JSONResponse({"error": "thread_id and message are required"}, status_code=400)
+@app.get("/admin/profiling")
+def get_profiling(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Devuelve la configuración actual del perfilador por petición.
+    """
+    _check_admin(x_admin_token)
+    return ProfilingService().get_settings()
 
-    try:
-        result = fabric_service.get_DAX_query(thread_id, message)
-        return JSONResponse(content={"analysis result": result}, status_code=200)
-    except Exception as e:
-        return JSONResponse({f"Server error {e}"}, status_code=500)
-
-### Foundry Endpoints
-@app.post("/foundry/thread")
-def create_thread():
+@app.put("/admin/profiling")
+async def update_profiling(request: Request, x_admin_token: Optional[str] = Header(default=None)):
     """
-    Crea un nuevo hilo de conversación.
-    Devuelve el thread_id para mantener el contexto.
-    Ejemplo de respuesta:
+    Activa/desactiva el perfilador o cambia su configuración en caliente.
+    Ejemplo de cuerpo:
     {
-        "thread_id": "abc123"
+        "enabled": true,
+        "sample_rate": 0.01,
+        "endpoints": ["/chat/dax"],
+        "output_format": "speedscope"
     }
     """
-    provider = AzureFoundryAgentProvider()
+    _check_admin(x_admin_token)
+    settings, error = await parse_body(request, ProfilingSettings)
+    if error is not None:
+        return error
     try:
-        thread_id = provider.create_thread()
-        return JSONResponse(content={"thread_id": thread_id}, status_code=201)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-@app.post("/foundry/chat")
-async def chat_stream(request: Request):
-    payload = await request.json()
-    thread_id = payload.get("thread_id")
-    message = payload.get("message")
-    service = AzureFoundryAgentService()
-    logger.info(f"Received streaming chat request: thread_id={thread_id}, message={message}")
-
-    if not thread_id or not message:
-        return JSONResponse({"error": "thread_id and message are required"}, status_code=400)
+        return ProfilingService().update_settings(settings.model_dump(exclude_unset=True))
+    except (ValueError, TypeError) as e:
+        return FastJSONResponse({"error": str(e)}, status_code=400)
 
-    try:
-        def event_stream():
-            for evt in service.chat_stream(thread_id, message):
-                data = json.dumps(evt)
-                yield f"data: {data}\n\n"
-            yield "event: done\ndata: {}\n\n"
+@app.get("/admin/streams")
+def get_streams(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Estado de los buffers de cada run en streaming: eventos, cola de lectura upstream y retraso de cada cliente.
+    """
+    _check_admin(x_admin_token)
+    return {"streams": RunStreamRegistry().stats()}
 
-        return StreamingResponse(event_stream(), media_type="text/event-stream")
-    
-    except Exception as e:
+### WebSocket
 
-        return JSONResponse({"error": f"Server error, {e}"}, status_code=500)
\ No newline at end of file
+@app.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    Varias conversaciones (de los backends montados) multiplexadas sobre una sola conexión.
+    El protocolo de mensajes está descrito en ChatSocketSession.
+    """
+    backends = {name: registry.routes(name).start_socket_stream for name in registry.enabled}
+    await ChatSocketSession(websocket, backends).run()
@@ -0,0 +1,126 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from src.domain.exceptions.ServerDrainingException import ServerDrainingException
+from src.domain.exceptions.StreamUnavailableException import StreamUnavailableException
+from src.domain.models.ChatResponse import ChatResponse
+from src.domain.services.ChatReplyBuilder import ChatReplyBuilder
+from src.domain.exceptions.ThreadBusyException import ThreadBusyException
+from src.infrastructure.concurrency.ThreadRunQueue import ThreadRunQueue
+from src.infrastructure.rest.serialization.JsonCodec import FastJSONResponse, dumps
+from src.infrastructure.streaming.RunStream import RunStream, SlowConsumerError
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+from src.infrastructure.streaming.ShutdownCoordinator import ShutdownCoordinator
+from pydantic import BaseModel, ValidationError
+from typing import Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Utilidades HTTP compartidas por chat_server y las rutas de cada backend
+
+
+def sse_frame(evt: dict, event_id: Optional[str] = None) -> bytes:
+    """
+    Serializa un evento como frame SSE. Los eventos de queries y datos llevan su propio `event:`
+    para que los clientes que solo escuchan deltas de texto no los confundan.
+    `event_id` se envía como `id:` para poder reanudar el stream con Last-Event-ID.
+    """
+    frame = b"id: " + event_id.encode() + b"\n" if event_id else b""
+    if evt.get("type") in ("dax", "data_preview"):
+        frame += b"event: " + evt["type"].encode() + b"\n"
+    return frame + b"data: " + dumps(evt) + b"\n\n"
+
+async def parse_body(request: Request, model: type[BaseModel]):
+    """
+    Valida el cuerpo JSON con `model` (pydantic lee los bytes directamente, sin pasar por un dict).
+    Devuelve el modelo y None, o None y la respuesta 400 con los errores.
+    """
+    try:
+        return model.model_validate_json(await request.body()), None
+    except ValidationError as e:
+        errors = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'body'}: {error['msg']}"
+            for error in e.errors(include_url=False)
+        )
+        return None, FastJSONResponse({"error": errors}, status_code=400)
+
+async def sse_stream(stream: RunStream, start: int = 0):
+    last_id = None
+    try:
+        async for seq, evt in stream.events(start):
+            last_id = f"{stream.id}:{seq}"
+            yield sse_frame(evt, last_id)
+    except SlowConsumerError as e:
+        # Sin `done`: el cliente debe reconectar con Last-Event-ID para seguir
+        logger.warning("Dropping slow client of stream %s: %s", stream.id, e)
+        yield b"event: overflow\ndata: " + dumps({"last_event_id": last_id}) + b"\n\n"
+        return
+    # final event
+    yield b"event: done\ndata: {}\n\n"
+
+async def collect_reply(request: Request, stream: RunStream, thread_id: str, start: float) -> Optional[ChatResponse]:
+    """
+    Lee el stream entero y lo junta en una sola respuesta (rutas /chat/sync). El run está registrado
+    como los de /chat: el drenado del servidor lo espera o lo aborta. Si el cliente se desconecta antes
+    de terminar y nadie más sigue el run, se aborta (y se cancela en upstream) y se devuelve None.
+    Lanza ChatRunException si el run termina con error.
+    """
+    reply = ChatReplyBuilder(thread_id, start)
+
+    async def collect() -> ChatResponse:
+        async for _, evt in stream.events():
+            reply.add(evt)
+        return reply.build()
+
+    async def disconnected():
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+
+    collector = asyncio.create_task(collect())
+    watcher = asyncio.create_task(disconnected())
+    try:
+        await asyncio.wait((collector, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if collector.done():
+        return collector.result()
+
+    collector.cancel()
+    await asyncio.gather(collector, return_exceptions=True)
+    logger.info("Sync client of stream %s disconnected before the reply was complete", stream.id)
+    if not stream.subscribers and not stream.finished:
+        await RunStreamRegistry().abort(stream, "client disconnected")
+    return None
+
+def resume_response(request: Request):
+    """
+    Si la petición trae Last-Event-ID, reanuda ese stream en lugar de lanzar un run nuevo. Si el stream
+    no está en este proceso responde 409 (es de otro worker: reintentar con una conexión nueva) o 404
+    (caducado), nunca un run nuevo: el original puede seguir en curso. Sin cabecera devuelve None.
+    """
+    try:
+        resume = RunStreamRegistry().resolve(request.headers.get("last-event-id"))
+    except StreamUnavailableException as e:
+        return stream_unavailable_response(e)
+    if resume is None:
+        return None
+    stream, start = resume
+    logger.info("Resuming stream %s from event %s", stream.id, start)
+    return StreamingResponse(sse_stream(stream, start), media_type="text/event-stream")
+
+def stream_unavailable_response(e: StreamUnavailableException) -> FastJSONResponse:
+    if e.other_worker:
+        # Connection: close para que el reintento pueda llegar a otro worker
+        return FastJSONResponse({"error": str(e)}, status_code=409,
+                                headers={"Retry-After": "1", "Connection": "close"})
+    return FastJSONResponse({"error": str(e)}, status_code=404)
+
+def thread_busy_response(e: ThreadBusyException) -> FastJSONResponse:
+    retry_after = max(int(ThreadRunQueue().max_wait // 4), 1)
+    return FastJSONResponse({"error": str(e)}, status_code=409, headers={"Retry-After": str(retry_after)})
+
+def draining_response(e: ServerDrainingException) -> FastJSONResponse:
+    retry_after = ShutdownCoordinator().retry_after
+    return FastJSONResponse({"error": str(e)}, status_code=503,
+                            headers={"Retry-After": str(retry_after), "Connection": "close"})
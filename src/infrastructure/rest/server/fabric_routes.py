@@ -0,0 +1,302 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
+from src.domain.models.BatchRequest import BatchRequest
+from src.domain.models.ChatRequest import ChatRequest
+from src.domain.models.DaxRequest import DaxRequest
+from src.domain.models.DataPreview import DataPreview
+from src.domain.exceptions.ChatRunException import ChatRunException
+from src.domain.exceptions.ServerDrainingException import ServerDrainingException
+from src.domain.exceptions.ThreadBusyException import ThreadBusyException
+from src.application.CreateNewThreadUseCase import CreateNewThreadUseCase
+from src.application.RunQuestionBatchUseCase import RunQuestionBatchUseCase
+from src.infrastructure.backends.BackendRegistry import BackendRegistry
+from src.infrastructure.coalescing.RequestCoalescer import RequestCoalescer
+from src.infrastructure.concurrency.ThreadRunQueue import ThreadRunQueue
+from src.infrastructure.rest.serialization.JsonCodec import FastJSONResponse, dumps
+from src.infrastructure.rest.server.common import (
+    collect_reply, draining_response, parse_body, resume_response, sse_stream, thread_busy_response,
+)
+from src.infrastructure.streaming.RunStream import RunStream
+from src.infrastructure.streaming.ShutdownCoordinator import ShutdownCoordinator
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+# Rutas de Fabric Data Agent. Se montan solo si el backend está configurado (ver BackendRegistry)
+# y el SDK se importa con la primera petición, no al cargar este módulo.
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+
+def _component(name: str):
+    return BackendRegistry().component("fabric", name)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Busca (o crea) el asistente compartido antes de la primera petición
+    try:
+        await asyncio.to_thread(lambda: _component("provider")().discover_agents())
+    except Exception as e:
+        logger.warning("⚠️ Fabric agent discovery failed, it will be retried on the first request: %s", e)
+    try:
+        _component("sweeper")().start()
+    except Exception as e:
+        logger.warning("⚠️ Thread sweeper not started: %s", e)
+    yield
+    try:
+        await asyncio.to_thread(_component("sweeper")().stop, 5.0)
+    except Exception as e:
+        logger.warning("⚠️ Thread sweeper not stopped cleanly: %s", e)
+
+router = APIRouter(lifespan=lifespan)
+
+
+async def _start_fabric_stream(thread_id: str, message: str, assistant_id: Optional[str] = None,
+                               include_dax: bool = False) -> RunStream:
+    """
+    Lanza (o comparte) el run de Fabric de una petición. Lanza ThreadBusyException si el thread sigue ocupado.
+    """
+    ShutdownCoordinator().check_accepting()
+    fabric_service = _component("service")()
+    _component("sweeper")().touch(thread_id)
+
+    # Un solo run activo por thread: las peticiones sobre el mismo thread esperan su turno
+    lease = await ThreadRunQueue().acquire(thread_id)
+    try:
+        # Las preguntas idénticas simultáneas comparten un único run (ver RequestCoalescer), solo entre
+        # threads sin turnos previos: con historial la respuesta depende de la conversación
+        coalescer = RequestCoalescer()
+        coalescing_key = RequestCoalescer.make_key(assistant_id, message, time.strftime("%Y-%m-%d"), include_dax)
+        if coalescer.enabled and not await asyncio.to_thread(fabric_service.is_new_thread, thread_id):
+            coalescing_key = None
+
+        async def store_reply(answer: Optional[str]):
+            # Petición agrupada: el thread se libera cuando tiene guardados la pregunta y la respuesta
+            try:
+                if answer is not None:
+                    await asyncio.to_thread(fabric_service.append_turn, thread_id, message, answer)
+            finally:
+                lease.release()
+
+        # El run se lee en una tarea propia (RunStream): sobrevive a desconexiones del cliente y el
+        # turno del thread se libera cuando termina el run, no cuando se va el cliente
+        stream, started = coalescer.attach(
+            coalescing_key,
+            lambda: fabric_service.chat_stream(thread_id, message, include_dax=include_dax, assistant_id=assistant_id),
+            on_reply=store_reply,
+        )
+    except BaseException:
+        # Cancelación o error antes de que el stream se haga cargo del turno
+        lease.release()
+        raise
+    if started:
+        stream.on_close(lease.release)
+        stream.on_abort(lambda: fabric_service.cancel_run(thread_id))
+    return stream
+
+@router.put("/thread/{old_thread_id}")
+def create_thread_fabric(old_thread_id: str):
+    """
+    Elimina el hilo antiguo y crea uno nuevo.
+    Devuelve el thread_id para mantener el contexto.
+    Ejemplo de respuesta:
+    {
+        "thread_id": "abc123"
+    }
+    """
+    provider = _component("provider")()
+    try:
+        # Si el contexto se resumió en otro thread, el que hay que eliminar es ese
+        _component("sweeper")().forget(old_thread_id)
+        old_thread_id = _component("context_manager")().forget(old_thread_id)
+        thread_id = CreateNewThreadUseCase(provider).execute(old_thread_id=old_thread_id)
+        _component("sweeper")().touch(thread_id)
+        return FastJSONResponse(content={"thread_id": thread_id}, status_code=201)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat")
+async def chat_stream_fabric(request: Request):
+    resumed = resume_response(request)
+    if resumed is not None:
+        return resumed
+
+    body, error = await parse_body(request, ChatRequest)
+    if error is not None:
+        return error
+    logger.info("Received streaming chat request: thread_id=%s, message=%s, assistant_id=%s",
+                body.thread_id, body.message, body.assistant_id)
+
+    try:
+        stream = await _start_fabric_stream(body.thread_id, body.message, body.assistant_id, body.include_dax)
+        return StreamingResponse(sse_stream(stream), media_type="text/event-stream")
+    except ThreadBusyException as e:
+        return thread_busy_response(e)
+    except ServerDrainingException as e:
+        return draining_response(e)
+    except Exception as e:
+
+        return FastJSONResponse({"error": "Server error, probabily reached quota limit"}, status_code=400)
+
+@router.post("/chat/sync")
+async def chat_sync_fabric(request: Request):
+    """
+    Respuesta completa en un solo JSON, para clientes programáticos que no necesitan el streaming:
+    los deltas se juntan en el servidor. Mismo cuerpo que /chat (se ignora `include_dax`).
+    Ejemplo de respuesta:
+    {
+        "agent_reply": "Las ventas de ayer...",
+        "thread_id": "abc123",
+        "usage": {"prompt_tokens": 1830, "completion_tokens": 212, "total_tokens": 2042},
+        "elapsed_ms": 6120.4,
+        "first_token_ms": 2210.8,
+        "chunks": 87
+    }
+    """
+    body, error = await parse_body(request, ChatRequest)
+    if error is not None:
+        return error
+    logger.info("Received sync chat request: thread_id=%s, message=%s, assistant_id=%s",
+                body.thread_id, body.message, body.assistant_id)
+
+    start = time.perf_counter()
+    try:
+        # El mismo run que /chat (registrado, cancelable y drenable); los deltas se juntan aquí
+        stream = await _start_fabric_stream(body.thread_id, body.message, body.assistant_id)
+        reply = await collect_reply(request, stream, body.thread_id, start)
+    except ThreadBusyException as e:
+        return thread_busy_response(e)
+    except ServerDrainingException as e:
+        return draining_response(e)
+    except ChatRunException as e:
+        return FastJSONResponse({"error": str(e)}, status_code=502)
+    except Exception as e:
+        return FastJSONResponse({"error": f"Server error {e}"}, status_code=500)
+    if reply is None:
+        return Response(status_code=499)
+
+    return FastJSONResponse(content=reply.model_dump(exclude_none=True), status_code=200)
+
+@router.post("/chat/dax")
+async def get_dax_queries(request: Request):
+    """
+    Ejecuta la pregunta y devuelve la respuesta final, las queries DAX y las vistas previas de datos,
+    en markdown (`sql_data_previews`) y en formato columnar tipado (`sql_data_frames`).
+    `preview_rows` limita las filas de las vistas previas.
+    Con `Accept: application/vnd.apache.arrow.stream` devuelve la vista previa de los datos como
+    stream Arrow IPC, con la respuesta y las queries en los metadatos del esquema.
+    """
+    body, error = await parse_body(request, DaxRequest)
+    if error is not None:
+        return error
+    thread_id, message, preview_rows = body.thread_id, body.message, body.preview_rows
+    logger.info("Received user request: thread_id=%s, message=%s, assistant_id=%s",
+                thread_id, message, body.assistant_id)
+
+    fabric_service = _component("service")()
+
+    _component("sweeper")().touch(thread_id)
+    try:
+        ShutdownCoordinator().check_accepting()
+        async with await ThreadRunQueue().acquire(thread_id):
+            # get_DAX_query bloquea mientras sondea el run y espera a la extracción: fuera del event loop
+            result = await asyncio.to_thread(
+                fabric_service.get_DAX_query, thread_id, message,
+                preview_rows=preview_rows, assistant_id=body.assistant_id
+            )
+    except ThreadBusyException as e:
+        return thread_busy_response(e)
+    except ServerDrainingException as e:
+        return draining_response(e)
+    except Exception as e:
+        return FastJSONResponse({"error": f"Server error {e}"}, status_code=500)
+
+    # La vista previa de la query que recuperó los datos; si no se sabe cuál es, la última
+    frames = result.get("sql_data_frames") or []
+    index = result.get("data_retrieval_frame_index")
+    frame = frames[index] if index is not None and index < len(frames) else None
+    frame = frame or next((frame for frame in reversed(frames) if frame), None)
+    if ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "") and frame:
+        metadata = {
+            "final_response": result.get("final_response"),
+            "data_retrieval_query": result.get("data_retrieval_query"),
+            "sql_queries": result.get("sql_queries"),
+        }
+        try:
+            content = _component("preview_builder").to_arrow_ipc(DataPreview(**frame), metadata=metadata)
+        except RuntimeError as e:
+            # Falta pyarrow (extra `arrow`): es el servidor el que no puede, no la petición
+            return FastJSONResponse({"error": str(e)}, status_code=501)
+        return Response(content=content, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    return FastJSONResponse(content={"analysis result": result}, status_code=200)
+
+@router.post("/chat/batch")
+async def run_question_batch(request: Request):
+    """
+    Ejecuta una lista de preguntas independientes en paralelo y devuelve NDJSON: una línea por pregunta
+    en cuanto termina (respuesta, queries DAX y vistas previas, como /chat/dax) y una línea final de resumen.
+    Ejemplo de cuerpo:
+    {
+        "questions": ["Ventas de ayer por cadena", {"id": "kpi-2", "message": "Unidades vendidas en Carrefour"}],
+        "assistant_id": "asst_123",
+        "concurrency": 8,
+        "preview_rows": 5
+    }
+    """
+    try:
+        ShutdownCoordinator().check_accepting()
+    except ServerDrainingException as e:
+        return draining_response(e)
+
+    body, error = await parse_body(request, BatchRequest)
+    if error is not None:
+        return error
+    concurrency = body.concurrency or BATCH_CONCURRENCY
+    if len(body.questions) > BATCH_MAX_QUESTIONS:
+        return FastJSONResponse({"error": f"at most {BATCH_MAX_QUESTIONS} questions per batch"}, status_code=400)
+    if concurrency > BATCH_MAX_CONCURRENCY:
+        return FastJSONResponse({"error": f"concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}"}, status_code=400)
+
+    items = []
+    for i, question in enumerate(body.questions):
+        if isinstance(question, str):
+            items.append({"id": i, "message": question})
+        else:
+            items.append({"id": i if question.id is None else question.id, "message": question.message})
+
+    logger.info("Received batch request: %s questions, concurrency=%s, assistant_id=%s",
+                len(items), concurrency, body.assistant_id)
+    use_case = RunQuestionBatchUseCase(_component("service")(), _component("thread_pool")())
+
+    async def batch_stream():
+        start = time.perf_counter()
+        counts = {"ok": 0, "error": 0}
+        # Registrado para la parada ordenada: si no termina a tiempo, sus runs se cancelan en upstream
+        batch = use_case.execute(items, concurrency, preview_rows=body.preview_rows,
+                                 assistant_id=body.assistant_id, track=ShutdownCoordinator().track)
+        async for item in batch:
+            counts[item["status"]] += 1
+            yield dumps(item) + b"\n"
+        summary = {"total": len(items), "ok": counts["ok"], "failed": counts["error"],
+                   "elapsed_s": round(time.perf_counter() - start, 3)}
+        yield dumps({"summary": summary}) + b"\n"
+
+    return StreamingResponse(batch_stream(), media_type="application/x-ndjson")
+
+
+def start_socket_stream(request: dict):
+    """
+    Backend `fabric` de ChatSocketSession.
+    """
+    return _start_fabric_stream(
+        request["thread_id"], request["message"], request.get("assistant_id"), bool(request.get("include_dax", False))
+    )
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from src.domain.models.ChatRequest import ChatRequest
+from src.domain.exceptions.ChatRunException import ChatRunException
+from src.domain.exceptions.ServerDrainingException import ServerDrainingException
+from src.domain.exceptions.ThreadBusyException import ThreadBusyException
+from src.infrastructure.backends.BackendRegistry import BackendRegistry
+from src.infrastructure.concurrency.ThreadRunQueue import ThreadRunQueue
+from src.infrastructure.rest.serialization.JsonCodec import FastJSONResponse
+from src.infrastructure.rest.server.common import (
+    collect_reply, draining_response, parse_body, resume_response, sse_stream, thread_busy_response,
+)
+from src.infrastructure.streaming.RunStream import RunStream
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+from src.infrastructure.streaming.ShutdownCoordinator import ShutdownCoordinator
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+
+# Rutas de Azure AI Foundry. Se montan solo si el backend está configurado (ver BackendRegistry)
+# y el SDK se importa con la primera petición, no al cargar este módulo.
+
+logger = logging.getLogger(__name__)
+
+
+def _component(name: str):
+    return BackendRegistry().component("foundry", name)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Carga la definición del agente antes de la primera petición; luego se renueva en segundo plano
+    try:
+        await asyncio.to_thread(lambda: _component("provider")().get_agent())
+    except Exception as e:
+        logger.warning("⚠️ Foundry agent lookup failed, it will be retried on the first request: %s", e)
+    yield
+
+router = APIRouter(lifespan=lifespan)
+
+async def _start_foundry_stream(thread_id: str, message: str) -> RunStream:
+    ShutdownCoordinator().check_accepting()
+    service = _component("service")()
+    lease = await ThreadRunQueue().acquire(thread_id)
+    try:
+        stream = RunStreamRegistry().start(lambda: service.chat_stream(thread_id, message))
+    except BaseException:
+        lease.release()
+        raise
+    stream.on_close(lease.release)
+    stream.on_abort(lambda: service.cancel_run(thread_id))
+    return stream
+
+@router.post("/foundry/thread")
+def create_thread():
+    """
+    Crea un nuevo hilo de conversación.
+    Devuelve el thread_id para mantener el contexto.
+    Ejemplo de respuesta:
+    {
+        "thread_id": "abc123"
+    }
+    """
+    provider = _component("provider")()
+    try:
+        thread_id = provider.create_thread()
+        return FastJSONResponse(content={"thread_id": thread_id}, status_code=201)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+@router.post("/foundry/chat")
+async def chat_stream(request: Request):
+    resumed = resume_response(request)
+    if resumed is not None:
+        return resumed
+
+    body, error = await parse_body(request, ChatRequest)
+    if error is not None:
+        return error
+    logger.info("Received streaming chat request: thread_id=%s, message=%s", body.thread_id, body.message)
+
+    try:
+        stream = await _start_foundry_stream(body.thread_id, body.message)
+        return StreamingResponse(sse_stream(stream), media_type="text/event-stream")
+    except ThreadBusyException as e:
+        return thread_busy_response(e)
+    except ServerDrainingException as e:
+        return draining_response(e)
+    except Exception as e:
+
+        return FastJSONResponse({"error": f"Server error, {e}"}, status_code=500)
+
+
+@router.post("/foundry/chat/sync")
+async def chat_sync(request: Request):
+    """
+    Respuesta completa en un solo JSON (como /chat/sync), con los deltas juntados en el servidor.
+    """
+    body, error = await parse_body(request, ChatRequest)
+    if error is not None:
+        return error
+    logger.info("Received sync chat request: thread_id=%s, message=%s", body.thread_id, body.message)
+
+    start = time.perf_counter()
+    try:
+        stream = await _start_foundry_stream(body.thread_id, body.message)
+        reply = await collect_reply(request, stream, body.thread_id, start)
+    except ThreadBusyException as e:
+        return thread_busy_response(e)
+    except ServerDrainingException as e:
+        return draining_response(e)
+    except ChatRunException as e:
+        return FastJSONResponse({"error": str(e)}, status_code=502)
+    except Exception as e:
+        return FastJSONResponse({"error": f"Server error, {e}"}, status_code=500)
+    if reply is None:
+        return Response(status_code=499)
+
+    return FastJSONResponse(content=reply.model_dump(exclude_none=True), status_code=200)
+
+def start_socket_stream(request: dict):
+    """
+    Backend `foundry` de ChatSocketSession.
+    """
+    return _start_foundry_stream(request["thread_id"], request["message"])
@@ -0,0 +1,176 @@
+from src.domain.exceptions.ServerDrainingException import ServerDrainingException
+from src.domain.exceptions.StreamUnavailableException import StreamUnavailableException
+from src.domain.exceptions.ThreadBusyException import ThreadBusyException
+from src.infrastructure.streaming.RunStream import RunStream, SlowConsumerError
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+from src.infrastructure.rest.serialization.JsonCodec import dumps, loads
+from starlette.websockets import WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSocketSession:
+    """
+    Multiplexa varias conversaciones sobre un mismo WebSocket.
+
+    Mensajes del cliente (JSON):
+    - {"op": "chat", "id": "p1", "backend": "fabric"|"foundry", "thread_id": "...", "message": "...",
+       "assistant_id": "...", "include_dax": false, "last_event_id": "..."}
+    - {"op": "cancel", "id": "p1"}
+    - {"op": "ping"}
+
+    Mensajes del servidor, siempre con el `id` del stream del cliente:
+    - {"id": "p1", "seq": "<stream_id>:<n>", "event": {...}} con los mismos eventos que el SSE.
+    - {"id": "p1", "type": "done" | "cancelled" | "overflow" | "error", ...}
+
+    Cada conversación usa los mismos RunStream que /chat y /foundry/chat (cola por thread, agrupación,
+    reanudación con `last_event_id` y control de clientes lentos). Los envíos pasan por una cola acotada
+    con un único escritor, así que un socket lento frena a sus streams y no al resto del servidor. Si el
+    escritor no puede enviar, la sesión se cierra entera: nadie queda esperando en una cola que ya no se vacía.
+    """
+
+    def __init__(self, websocket: WebSocket, backends: dict[str, Callable[[dict], Awaitable[RunStream]]]):
+        self.websocket = websocket
+        self.backends = backends
+        self.max_streams = int(os.getenv("WS_MAX_STREAMS", "8"))
+        self._outbox = asyncio.Queue(maxsize=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")))
+        self._tasks = {}
+        self._closing = False
+        self._send_failed = False
+        self._reader = None
+
+    async def run(self):
+        await self.websocket.accept()
+        self._reader = asyncio.current_task()
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                frame = await self.websocket.receive_text()
+                try:
+                    request = loads(frame)
+                except ValueError:
+                    await self._send({"type": "error", "error": "invalid JSON"})
+                    continue
+                if not isinstance(request, dict):
+                    await self._send({"type": "error", "error": "frames must be JSON objects"})
+                    continue
+                await self._handle(request)
+        except WebSocketDisconnect:
+            pass
+        except asyncio.CancelledError:
+            # Cancelado por el escritor al fallar un envío (ver _writer)
+            if not self._send_failed:
+                raise
+            self._reader.uncancel()
+        finally:
+            # Los runs siguen en el registro y pueden reanudarse con last_event_id
+            self._closing = True
+            for task in list(self._tasks.values()):
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            writer.cancel()
+
+    async def _handle(self, request: dict):
+        op = request.get("op")
+        stream_id = request.get("id")
+
+        if op == "ping":
+            await self._send({"type": "pong"})
+        elif op == "cancel":
+            task = self._tasks.get(stream_id)
+            if task is not None:
+                task.cancel()
+        elif op == "chat":
+            error = self._validate(request)
+            if error:
+                await self._send({"id": stream_id, "type": "error", "error": error})
+                return
+            self._tasks[stream_id] = asyncio.create_task(self._forward(stream_id, request))
+        else:
+            await self._send({"id": stream_id, "type": "error", "error": f"unknown op {op!r}"})
+
+    def _validate(self, request: dict):
+        if not request.get("id"):
+            return "id is required"
+        if request["id"] in self._tasks:
+            return "id already in use"
+        if len(self._tasks) >= self.max_streams:
+            return f"at most {self.max_streams} concurrent streams per connection"
+        if request.get("last_event_id"):
+            return None
+        if request.get("backend", "fabric") not in self.backends:
+            return f"backend must be one of {list(self.backends)}"
+        if not request.get("thread_id") or not request.get("message"):
+            return "thread_id and message are required"
+        return None
+
+    async def _forward(self, client_id: str, request: dict):
+        stream = None
+        events = None
+        last_seq = None
+        try:
+            resume = RunStreamRegistry().resolve(request.get("last_event_id"))
+            if resume is not None:
+                stream, start = resume
+            else:
+                stream, start = await self.backends[request.get("backend", "fabric")](request), 0
+
+            events = stream.events(start)
+            async for seq, evt in events:
+                last_seq = f"{stream.id}:{seq}"
+                await self._send({"id": client_id, "seq": last_seq, "event": evt})
+            await self._send({"id": client_id, "type": "done"})
+        except ThreadBusyException as e:
+            await self._send({"id": client_id, "type": "error", "error": str(e), "status": 409})
+        except ServerDrainingException as e:
+            await self._send({"id": client_id, "type": "error", "error": str(e), "status": 503})
+        except StreamUnavailableException as e:
+            # Sin run nuevo: el original puede seguir en curso en otro worker
+            status = 409 if e.other_worker else 404
+            await self._send({"id": client_id, "type": "error", "error": str(e), "status": status})
+        except SlowConsumerError as e:
+            logger.warning("Dropping slow WebSocket stream %s: %s", client_id, e)
+            await self._send({"id": client_id, "type": "overflow", "last_event_id": last_seq})
+        except asyncio.CancelledError:
+            if events is not None:
+                await events.aclose()
+            if not self._closing:
+                # Cancelación pedida por el cliente: si nadie más sigue el run, se cancela también en upstream
+                if stream is not None and not stream.subscribers and not stream.finished:
+                    await RunStreamRegistry().abort(stream, "cancelled by client")
+                await self._send({"id": client_id, "type": "cancelled"})
+        except Exception as e:
+            logger.exception("Error in WebSocket stream")
+            await self._send({"id": client_id, "type": "error", "error": str(e)})
+        finally:
+            self._tasks.pop(client_id, None)
+
+    async def _send(self, message: dict):
+        if self._closing:
+            return
+        await self._outbox.put(message)
+
+    async def _writer(self):
+        while True:
+            message = await self._outbox.get()
+            try:
+                await self.websocket.send_text(dumps(message).decode("utf-8"))
+            except Exception as e:
+                logger.info("WebSocket send failed, closing the session: %s", e)
+                break
+        if self._closing:
+            return
+        # Sin escritor la cola se llena y cada `_send` esperaría para siempre: se corta todo lo que envía
+        self._send_failed = True
+        self._closing = True
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._reader.cancel()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
@@ -0,0 +1,122 @@
+from src.domain.models.DataPreview import DataPreview
+from typing import Optional
+import csv
+import io
+import json
+import pandas as pd
+
+
+# Nombres compactos para los dtypes de pandas tras convert_dtypes()
+_DTYPE_NAMES = {
+    "Int64": "int64",
+    "Float64": "float64",
+    "boolean": "bool",
+    "string": "string",
+}
+
+
+class DataPreviewBuilder:
+    """
+    Construye DataPreview columnares a partir de las tablas que extrae SqlExtractor y las
+    serializa a JSON columnar o a Arrow IPC.
+    """
+
+    def __init__(self, max_rows: int = 10):
+        self.max_rows = max_rows
+
+    def from_rows(self, headers: list, rows: list, truncated: bool = False) -> DataPreview:
+        frame = pd.DataFrame(rows[:self.max_rows], columns=[str(h) for h in headers])
+        frame = frame.convert_dtypes()
+        return self._from_frame(frame, truncated or len(rows) > self.max_rows)
+
+    def from_text_rows(self, headers: list, rows: list, truncated: bool = False) -> DataPreview:
+        """
+        Igual que from_rows pero para celdas de texto (tablas markdown o CSV): las columnas en las
+        que todos los valores son numéricos se convierten a número.
+        """
+        frame = pd.DataFrame(rows[:self.max_rows], columns=[str(h) for h in headers])
+        for column in frame.columns:
+            numeric = pd.to_numeric(frame[column], errors="coerce")
+            if numeric.notna().sum() == frame[column].replace("", None).notna().sum():
+                frame[column] = numeric
+        frame = frame.convert_dtypes()
+        return self._from_frame(frame, truncated or len(rows) > self.max_rows)
+
+    def from_markdown_lines(self, lines: list) -> Optional[DataPreview]:
+        rows = []
+        for line in lines:
+            cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            if all(set(cell) <= set("-: ") for cell in cells):
+                # Separator line (|---|---|)
+                continue
+            rows.append(cells)
+        if len(rows) < 1:
+            return None
+        headers = rows[0]
+        width = len(headers)
+        body = [(row + [""] * width)[:width] for row in rows[1:]]
+        return self.from_text_rows(headers, body)
+
+    def from_csv_lines(self, lines: list) -> Optional[DataPreview]:
+        rows = list(csv.reader(lines))
+        if len(rows) < 2:
+            return None
+        headers = rows[0]
+        width = len(headers)
+        body = [(row + [""] * width)[:width] for row in rows[1:]]
+        return self.from_text_rows(headers, body)
+
+    def _from_frame(self, frame: pd.DataFrame, truncated: bool) -> DataPreview:
+        dtypes = []
+        data = []
+        for column in frame.columns:
+            series = frame[column]
+            dtype = str(series.dtype)
+            if dtype.startswith("datetime64"):
+                dtypes.append("datetime")
+                data.append([None if pd.isna(v) else v.isoformat() for v in series.tolist()])
+                continue
+            dtypes.append(_DTYPE_NAMES.get(dtype, "object"))
+            data.append([None if self._is_missing(v) else v for v in series.tolist()])
+        return DataPreview(
+            columns=list(frame.columns),
+            dtypes=dtypes,
+            data=data,
+            row_count=len(frame),
+            truncated=truncated,
+        )
+
+    @staticmethod
+    def _is_missing(value) -> bool:
+        if isinstance(value, (list, dict)):
+            return False
+        try:
+            return bool(pd.isna(value))
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def to_frame(preview: DataPreview) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(preview.columns, preview.data)), columns=preview.columns)
+
+    @staticmethod
+    def to_arrow_ipc(preview: DataPreview, metadata: Optional[dict] = None) -> bytes:
+        """
+        Serializa la vista previa como stream Arrow IPC. Requiere pyarrow (dependencia opcional).
+        Los valores de `metadata` se guardan como metadatos del esquema.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise RuntimeError("pyarrow is required for Arrow IPC serialization") from e
+
+        table = pa.Table.from_pandas(DataPreviewBuilder.to_frame(preview), preserve_index=False)
+        if metadata:
+            table = table.replace_schema_metadata({
+                key: value if isinstance(value, str) else json.dumps(value)
+                for key, value in metadata.items() if value is not None
+            })
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
@@ -0,0 +1,210 @@
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _preload(modules: tuple):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _ready():
+    return os.getpid()
+
+
+class _Worker:
+    """
+    Un proceso del pool, con su propio ProcessPoolExecutor de un solo proceso para poder matarlo
+    sin afectar a las llamadas que se ejecutan en los demás.
+    """
+
+    def __init__(self, executor: ProcessPoolExecutor, pid: int):
+        self.executor = executor
+        self.pid = pid
+
+    def kill(self):
+        _kill(self.pid)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill(pid: int):
+    try:
+        # En Windows os.kill termina el proceso con cualquier señal
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except OSError:
+        pass
+
+
+class ExtractionPool(metaclass=SingletonMeta):
+    """
+    Procesos para el trabajo de CPU de SqlExtractor: regex `.*?` con DOTALL sobre salidas de herramientas
+    y el formateador de DAX, un bucle en Python puro.
+
+    Con una salida patológica esas funciones pueden ocupar un núcleo durante segundos, y en un hilo
+    retienen el GIL y frenan a todo el servidor. En un proceso aparte se pueden cortar: cada llamada
+    ocupa un proceso del pool y `call` espera como mucho `timeout` segundos en total (hueco, proceso
+    libre y ejecución); si se agota, mata ese proceso (las llamadas que están en los demás siguen) y lanza
+    TimeoutError para que quien llama se quede con un resultado parcial. El sustituto se arranca en un
+    hilo aparte, sin retener a quien llama.
+
+    Los procesos salen de un forkserver con SqlExtractor ya importado, así que sustituir uno tras un
+    corte cuesta milisegundos (en plataformas sin forkserver, como Windows, se usa `spawn`, más lento);
+    además se arrancan al crear el pool, antes de enviar ninguna llamada, y no cuentan para su tiempo
+    máximo.
+
+    Variables:
+    - SQL_EXTRACTION_WORKERS: procesos del pool (`2`); con `0` todo se ejecuta en el propio proceso, sin límite.
+    - SQL_EXTRACTION_TIMEOUT_S: tiempo máximo por llamada (`2`).
+    - SQL_EXTRACTION_MAX_PENDING: llamadas en cola o en curso a la vez (`8` por proceso); las demás esperan
+      un hueco dentro de su tiempo máximo.
+    - SQL_EXTRACTION_SPAWN_TIMEOUT_S: tiempo máximo para arrancar un proceso (`10`); si no arranca se
+      reintenta más tarde y, mientras tanto, el pool tiene un proceso menos.
+    """
+
+    def __init__(self, preload: tuple = ("src.infrastructure.sql.SqlExtractor",)):
+        self.workers = int(os.getenv("SQL_EXTRACTION_WORKERS", "2"))
+        self.timeout = float(os.getenv("SQL_EXTRACTION_TIMEOUT_S", "2"))
+        self.spawn_timeout = float(os.getenv("SQL_EXTRACTION_SPAWN_TIMEOUT_S", "10"))
+        max_pending = int(os.getenv("SQL_EXTRACTION_MAX_PENDING", str(max(self.workers, 1) * 8)))
+        self.preload = preload
+        self.start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Procesos libres; None hasta arrancar el pool
+        self._idle: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+
+        metrics = MetricsRegistry()
+        self.call_seconds = metrics.histogram(
+            "sql_extraction_seconds", "Time of SQL extraction calls run in the process pool")
+        self.timeouts_total = metrics.counter(
+            "sql_extraction_timeouts_total", "SQL extraction calls cut at their deadline")
+        self.restarts_total = metrics.counter(
+            "sql_extraction_pool_restarts_total", "SQL extraction processes killed and replaced")
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None):
+        """
+        Ejecuta `fn(*args)` en el pool. `fn` debe estar definida a nivel de módulo (se envía por pickle).
+        Lanza TimeoutError si no termina en `timeout` segundos (SQL_EXTRACTION_TIMEOUT_S por defecto).
+        """
+        if not self.enabled:
+            return fn(*args)
+
+        task = fn.__name__.strip("_")
+        timeout = self.timeout if timeout is None else timeout
+        # Un solo plazo para todas las esperas de la llamada
+        deadline = time.monotonic() + timeout
+        if not self._slots.acquire(timeout=timeout):
+            self.timeouts_total.inc(task=task)
+            raise TimeoutError(f"{task}: extraction pool saturated for {timeout:g}s")
+        try:
+            idle = self.start()
+            for attempt in range(2):
+                try:
+                    worker = idle.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self.timeouts_total.inc(task=task)
+                    raise TimeoutError(f"{task}: no extraction process free for {timeout:g}s") from None
+                start = time.perf_counter()
+                try:
+                    result = worker.executor.submit(fn, *args).result(timeout=max(deadline - time.monotonic(), 0))
+                except TimeoutError:
+                    self.timeouts_total.inc(task=task)
+                    self._replace(worker, "a call exceeded its deadline")
+                    raise TimeoutError(f"{task} exceeded {timeout:g}s") from None
+                except BrokenProcessPool:
+                    # El proceso ha muerto durante la llamada: se reintenta una vez en otro
+                    self._replace(worker, "its process is gone")
+                    if attempt:
+                        raise
+                    continue
+                except BaseException:
+                    # Excepción de `fn`: el proceso sigue bien
+                    idle.put(worker)
+                    raise
+                idle.put(worker)
+                self.call_seconds.observe(time.perf_counter() - start, task=task)
+                return result
+        finally:
+            self._slots.release()
+
+    def start(self) -> queue.Queue:
+        """
+        Arranca los procesos del pool si aún no lo están y devuelve la cola de procesos libres.
+        """
+        with self._lock:
+            if self._idle is None:
+                idle = queue.Queue()
+                for _ in range(self.workers):
+                    idle.put(self._new_worker())
+                self._idle = idle
+                logger.info("🧮 SQL extraction pool started with %s processes (%s)", self.workers, self.start_method)
+            return self._idle
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, None
+        while idle is not None and not idle.empty():
+            idle.get_nowait().executor.shutdown(wait=False, cancel_futures=True)
+
+    def _new_worker(self) -> _Worker:
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            context.set_forkserver_preload(list(self.preload))
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=context,
+            initializer=_preload,
+            initargs=(self.preload,),
+        )
+        # Arranca el proceso ahora para que no consuma el tiempo de ninguna llamada
+        try:
+            return _Worker(executor, executor.submit(_ready).result(timeout=self.spawn_timeout))
+        except BaseException:
+            # Proceso colgado al arrancar: ProcessPoolExecutor no expone otra forma de matarlo
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                _kill(process.pid)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def _replace(self, worker: _Worker, reason: str):
+        """
+        Mata el proceso de `worker` y arranca otro en segundo plano para ocupar su sitio en el pool.
+        """
+        self.restarts_total.inc()
+        logger.warning("⚠️ Replacing SQL extraction process %s: %s", worker.pid, reason)
+        # Una tarea en marcha no se puede cancelar: hay que terminar su proceso
+        worker.kill()
+        threading.Thread(target=self._respawn, args=(self._idle,), name="sql-extraction-respawn", daemon=True).start()
+
+    def _respawn(self, idle: queue.Queue):
+        delay = 1.0
+        while self._idle is idle:
+            try:
+                worker = self._new_worker()
+            except Exception as e:
+                logger.error("❌ Could not start a SQL extraction process, retrying in %gs: %s", delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            if self._idle is idle:
+                idle.put(worker)
+            else:
+                # El pool se ha parado mientras arrancaba
+                worker.executor.shutdown(wait=False, cancel_futures=True)
+            return
@@ -0,0 +1,56 @@
+from src.infrastructure.sql.SqlExtractor import SqlExtractor
+from types import SimpleNamespace
+
+
+class SqlCaptureSession:
+    """
+    Extracción incremental de queries DAX/SQL y vistas previas durante un run en streaming.
+
+    Recibe los run steps a medida que se completan y devuelve eventos listos para enviar por SSE:
+    - {"type": "dax", "index": n, "query": "..."} por cada query nueva (sin duplicados),
+    - {"type": "data_preview", "query": "...", "preview": [...], "frame": {...}} por cada salida con datos.
+    Al terminar el run, `finish` aplica el fallback por regex si no se encontró ninguna query,
+    igual que get_DAX_query.
+    """
+
+    def __init__(self, extractor: SqlExtractor):
+        self.extractor = extractor
+        self.queries = []
+        self._seen = set()
+        self._steps = []
+
+    def feed_step(self, step) -> list:
+        events = []
+        self._steps.append(step)
+        step_details = getattr(step, "step_details", None)
+        tool_calls = getattr(step_details, "tool_calls", None) or []
+
+        for tool_call in tool_calls:
+            extraction = self.extractor._extract_from_tool_call(tool_call)
+            events.extend(self._query_events(extraction["queries"]))
+
+            if extraction["data_preview"]:
+                retrieval_query = extraction["data_retrieval_query"]
+                frame = extraction["data_frame"]
+                events.append({
+                    "type": "data_preview",
+                    "query": self.extractor._format_queries([retrieval_query])[0] if retrieval_query else None,
+                    "preview": extraction["data_preview"],
+                    "frame": frame.model_dump() if frame else None,
+                })
+        return events
+
+    def finish(self) -> list:
+        if self.queries or not self._steps:
+            return []
+        regex_queries = self.extractor._regex_extract_sql_queries(SimpleNamespace(data=self._steps))
+        return self._query_events(regex_queries)
+
+    def _query_events(self, queries: list) -> list:
+        events = []
+        new_queries = [query for query in dict.fromkeys(queries) if query not in self._seen]
+        self._seen.update(new_queries)
+        for formatted in self.extractor._format_queries(new_queries):
+            self.queries.append(formatted)
+            events.append({"type": "dax", "index": len(self.queries) - 1, "query": formatted})
+        return events
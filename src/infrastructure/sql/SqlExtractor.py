@@ -1,6 +1,25 @@
+from src.domain.models.DataPreview import DataPreview
+from src.infrastructure.sql.DataPreviewBuilder import DataPreviewBuilder
+from src.infrastructure.sql.StreamingPreviewExtractor import StreamingPreviewExtractor
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 class SqlExtractor:
 
+    def __init__(self, max_preview_rows: int = 10, pool=None):
+        """
+        :param pool: ExtractionPool opcional. Con pool, la extracción de cada tool call, el formateo de DAX
+                     y el fallback por regex se ejecutan en sus procesos con un tiempo máximo por llamada.
+        """
+        self.preview_extractor = StreamingPreviewExtractor(max_rows=max_preview_rows)
+        self.preview_builder = DataPreviewBuilder(max_rows=max_preview_rows)
+        self.pool = pool
+
     def _extract_sql_queries_with_data(self, steps) -> dict:
         """
         Extract SQL queries from run steps using direct JSON parsing and output analysis.
@@ -9,66 +28,138 @@ class SqlExtractor:
             steps: The run steps from the OpenAI API
             
         Returns:
-            dict: Contains queries, data previews, and which query retrieved data
+            dict: Contains queries, data previews (markdown lines and typed columnar frames),
+                  and which query retrieved data
         """
-        sql_queries = []
-        data_previews = []
-        data_retrieval_query = None
-        data_retrieval_query_index = None
-        
+        analysis = self._new_analysis()
+        self._accumulate_steps(analysis, steps.data)
+        return self._finish_analysis(analysis)
+
+    def _new_analysis(self) -> dict:
+        """
+        Estado de una extracción incremental: `_accumulate_steps` se puede llamar página a página
+        y `_finish_analysis` devuelve el mismo resultado que `_extract_sql_queries_with_data`.
+        """
+        return {
+            "queries": [],
+            "data_previews": [],
+            "data_frames": [],
+            "data_retrieval_query": None,
+            "data_retrieval_query_index": None,
+            "data_retrieval_frame_index": None,
+        }
+
+    def _accumulate_steps(self, analysis: dict, steps: list):
         try:
-            for step_idx, step in enumerate(steps.data):
+            for step in steps:
                 if hasattr(step, 'step_details') and step.step_details:
                     step_details = step.step_details
                     
                     # Check for tool calls which typically contain the SQL queries
                     if hasattr(step_details, 'tool_calls') and step_details.tool_calls:
-                        for tool_idx, tool_call in enumerate(step_details.tool_calls):
-                            # Extract SQL from function arguments
-                            sql_from_args = self._extract_sql_from_function_args(tool_call)
-                            if sql_from_args:
-                                sql_queries.extend(sql_from_args)
-                            
-                            # Extract SQL from tool call output (where it's actually located in Fabric)
-                            sql_from_output = self._extract_sql_from_output(tool_call)
-                            if sql_from_output:
-                                sql_queries.extend(sql_from_output)
+                        for tool_call in step_details.tool_calls:
+                            extraction = self._extract_from_tool_call(tool_call)
+                            analysis["queries"].extend(extraction["queries"])
                             
-                            # Extract data from tool call output
-                            data_preview = self._extract_structured_data_from_output(tool_call)
-                            if data_preview:
-                                # If we found data and SQL in this step, it's likely the retrieval query
-                                if sql_from_args or sql_from_output:
-                                    all_sql_this_call = sql_from_args + sql_from_output
-                                    data_retrieval_query = all_sql_this_call[-1] if all_sql_this_call else None
-                                    data_retrieval_query_index = len(sql_queries)
+                            # If we found data and SQL in this step, it's likely the retrieval query
+                            if extraction["data_retrieval_query"]:
+                                analysis["data_retrieval_query"] = extraction["data_retrieval_query"]
+                                analysis["data_retrieval_query_index"] = len(analysis["queries"])
+                                # Las vistas previas van por tool call, no por query
+                                analysis["data_retrieval_frame_index"] = len(analysis["data_frames"])
                             
-                            data_previews.append(data_preview)
+                            analysis["data_previews"].append(extraction["data_preview"])
+                            analysis["data_frames"].append(extraction["data_frame"])
         
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract SQL queries: {e}")
-        
+            logger.warning("⚠️ Could not extract SQL queries: %s", e)
+
+    def _finish_analysis(self, analysis: dict) -> dict:
         # Remove duplicates while preserving order
-        unique_queries = list(dict.fromkeys(sql_queries))
+        unique_queries = list(dict.fromkeys(analysis["queries"]))
 
         # Format queries that look like DAX for readability/execution
-        formatted_queries = []
-        for q in unique_queries:
-            try:
-                if self._is_dax_query(q):
-                    formatted_queries.append(self._format_dax_query(q))
-                else:
-                    formatted_queries.append(q)
-            except Exception:
-                formatted_queries.append(q)
+        formatted_queries = self._format_queries(unique_queries)
+
+        return {**analysis, "queries": formatted_queries}
+    
+    def _extract_from_tool_call(self, tool_call) -> dict:
+        """
+        Extract SQL queries and data previews from a single tool call.
+        Used both for a completed run's steps and incrementally while a run is streaming.
+        
+        Args:
+            tool_call: OpenAI tool call object
+            
+        Returns:
+            dict: queries found, markdown and typed previews, and the query that retrieved the data
+        """
+        if self.pool is not None:
+            return self._extract_from_tool_call_bounded(tool_call)
 
+        # Extract SQL from function arguments
+        sql_from_args = self._extract_sql_from_function_args(tool_call)
+        
+        # Extract SQL from tool call output (where it's actually located in Fabric)
+        sql_from_output = self._extract_sql_from_output(tool_call)
+        all_sql_this_call = sql_from_args + sql_from_output
+        
+        # Extract data from tool call output
+        data_preview = self._extract_structured_data_from_output(tool_call)
+        
         return {
-            "queries": formatted_queries,
-            "data_previews": data_previews,
-            "data_retrieval_query": data_retrieval_query,
-            "data_retrieval_query_index": data_retrieval_query_index
+            "queries": all_sql_this_call,
+            "data_preview": data_preview,
+            "data_frame": self._extract_data_frame_from_output(tool_call) if data_preview else None,
+            "data_retrieval_query": all_sql_this_call[-1] if data_preview and all_sql_this_call else None,
         }
     
+    def _extract_from_tool_call_bounded(self, tool_call) -> dict:
+        """
+        Run `_extract_from_tool_call` in the extraction pool. Only the arguments and the output are sent.
+        If the deadline is exceeded, the partial result keeps the queries from the function arguments
+        (a plain JSON parse) and drops the output analysis.
+        """
+        function = getattr(tool_call, 'function', None)
+        arguments = getattr(function, 'arguments', None) if function else None
+        output = getattr(tool_call, 'output', None)
+        try:
+            return self.pool.call(
+                _extract_tool_call_task, arguments, str(output) if output else None, self.preview_extractor.max_rows
+            )
+        except TimeoutError as e:
+            logger.warning("⚠️ Tool call extraction cut short: %s", e)
+            return {
+                "queries": self._extract_sql_from_function_args(tool_call),
+                "data_preview": [],
+                "data_frame": None,
+                "data_retrieval_query": None,
+            }
+
+    def _format_queries(self, queries: list) -> list:
+        """
+        Format a list of queries with `_format_query`, in the extraction pool if there is one.
+        Queries are returned unformatted if the deadline is exceeded.
+        """
+        if self.pool is None or not queries:
+            return [self._format_query(q) for q in queries]
+        try:
+            return self.pool.call(_format_queries_task, list(queries))
+        except TimeoutError as e:
+            logger.warning("⚠️ DAX formatting cut short: %s", e)
+            return list(queries)
+
+    def _format_query(self, q: str) -> str:
+        """
+        Format a query for readability if it looks like DAX; return it unchanged otherwise.
+        """
+        try:
+            if self._is_dax_query(q):
+                return self._format_dax_query(q)
+        except Exception:
+            pass
+        return q
+    
     def _extract_sql_from_function_args(self, tool_call) -> list:
         """
         Extract SQL queries from tool call function arguments.
@@ -121,7 +212,7 @@ class SqlExtractor:
                     matches = re.findall(sql_pattern, args_str, re.IGNORECASE)
                     sql_queries.extend([match.strip() for match in matches if len(match.strip()) > 10])
             except Exception as parse_error:
-                print(f"⚠️ Warning: Could not parse tool call arguments: {parse_error}")
+                logger.warning("⚠️ Could not parse tool call arguments: %s", parse_error)
         
         return sql_queries
     
@@ -135,7 +226,6 @@ class SqlExtractor:
         Returns:
             list: SQL queries found in output
         """
-        import json
         import re
         sql_queries = []
         
@@ -143,34 +233,35 @@ class SqlExtractor:
             if hasattr(tool_call, 'output') and tool_call.output:
                 output_str = str(tool_call.output)
                 
-                # First try to parse as JSON
+                # First try to parse as JSON. Only the members that can hold SQL are decoded, so
+                # large result sets in the same output are skipped instead of materialized.
                 try:
-                    output_json = json.loads(output_str)
-                    
-                    if isinstance(output_json, dict):
-                        # Look for SQL in common keys
-                        sql_keys = ['sql', 'query', 'sql_query', 'statement', 'command', 'code', 'generated_code']
-                        for key in sql_keys:
-                            if key in output_json and output_json[key]:
-                                sql_query = str(output_json[key]).strip()
-                                if sql_query and len(sql_query) > 10:
-                                    sql_queries.append(sql_query)
-                        
-                        # Check nested structures
-                        for key, value in output_json.items():
-                            if isinstance(value, dict):
-                                for nested_key in sql_keys:
-                                    if nested_key in value and value[nested_key]:
-                                        sql_query = str(value[nested_key]).strip()
-                                        if sql_query and len(sql_query) > 10:
-                                            sql_queries.append(sql_query)
-                
-                except json.JSONDecodeError:
+                    sql_keys = ['sql', 'query', 'sql_query', 'statement', 'command', 'code', 'generated_code']
+                    extractor = self.preview_extractor
+                    top_level = {}
+                    nested = []
+                    if extractor.starts_with(output_str, '{'):
+                        for key, value_start, _ in extractor.iter_object_members(output_str, output_str.index('{')):
+                            if key in sql_keys:
+                                top_level[key] = extractor.decode_value(output_str, value_start)
+                            elif output_str.startswith('{', value_start):
+                                for nested_key, nested_start, _ in extractor.iter_object_members(output_str, value_start):
+                                    if nested_key in sql_keys:
+                                        nested.append(extractor.decode_value(output_str, nested_start))
+
+                    # Look for SQL in common keys, then in nested structures
+                    for value in [top_level.get(key) for key in sql_keys] + nested:
+                        if value:
+                            sql_query = str(value).strip()
+                            if sql_query and len(sql_query) > 10:
+                                sql_queries.append(sql_query)
+
+                except ValueError:
                     # If not JSON, use regex to find SQL patterns
                     pass
                 
                 # Always also try regex as backup/additional method
-                if any(keyword in output_str.upper() for keyword in ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'FROM']):
+                if self.preview_extractor.contains_any(output_str, ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'FROM']):
                     # Enhanced regex patterns for SQL extraction
                     sql_patterns = [
                         r'"(?:sql|query|statement|code|generated_code)"\s*:\s*"([^"]+)"',
@@ -190,13 +281,14 @@ class SqlExtractor:
                                 sql_queries.append(clean_query)
         
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract SQL from output: {e}")
+            logger.warning("⚠️ Could not extract SQL from output: %s", e)
         
         return sql_queries
     
     def _extract_structured_data_from_output(self, tool_call) -> list:
         """
-        Extract structured data from tool call output using JSON parsing.
+        Extract structured data from tool call output using incremental JSON parsing.
+        Only the preview rows are decoded, so memory stays bounded for large outputs.
         
         Args:
             tool_call: OpenAI tool call object
@@ -204,7 +296,6 @@ class SqlExtractor:
         Returns:
             list: Formatted data lines
         """
-        import json
         data_lines = []
         
         try:
@@ -213,63 +304,92 @@ class SqlExtractor:
                 
                 # Try to parse as JSON first
                 try:
-                    data = json.loads(output_str)
-                    
-                    if isinstance(data, list) and len(data) > 0:
-                        # Handle list of records (typical query result)
-                        if isinstance(data[0], dict):
-                            headers = list(data[0].keys())
-                            data_lines.append("| " + " | ".join(headers) + " |")
-                            data_lines.append("|" + "---|" * len(headers))
-                            
-                            for row in data[:10]:  # Limit to first 10 rows
-                                values = [str(row.get(h, "")) for h in headers]
-                                data_lines.append("| " + " | ".join(values) + " |")
-                    
-                    elif isinstance(data, dict):
-                        # Handle single record or structured response
-                        if 'data' in data and isinstance(data['data'], list):
-                            # Nested data structure
-                            return self._format_list_data(data['data'])
-                        elif 'results' in data and isinstance(data['results'], list):
-                            # Results structure
-                            return self._format_list_data(data['results'])
-                        else:
-                            # Single record
-                            data_lines.append("| Key | Value |")
-                            data_lines.append("|---|---|")
-                            for key, value in data.items():
-                                data_lines.append(f"| {key} | {str(value)} |")
+                    table = self.preview_extractor.extract_json_table(output_str)
+                    if table:
+                        data_lines = self._format_table(*table[:2])
                 
-                except json.JSONDecodeError:
+                except ValueError:
                     # If not JSON, look for other structured formats
                     data_lines = self._extract_data_preview(output_str)
         
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract structured data: {e}")
+            logger.warning("⚠️ Could not extract structured data: %s", e)
         
         return data_lines
     
-    def _format_list_data(self, data_list) -> list:
+    def _extract_data_frame_from_output(self, tool_call) -> Optional[DataPreview]:
         """
-        Format a list of data records into table format.
+        Extract a typed, columnar preview (column names, dtypes and values) from tool call output.
+        Same sources as the markdown preview: JSON records, embedded JSON, pipe tables or CSV.
+        
+        Args:
+            tool_call: OpenAI tool call object
+            
+        Returns:
+            DataPreview or None if no tabular data was found
+        """
+        extractor = self.preview_extractor
+        builder = self.preview_builder
+        
+        try:
+            if not (hasattr(tool_call, 'output') and tool_call.output):
+                return None
+            output_str = str(tool_call.output)
+            
+            try:
+                table = extractor.extract_json_table(output_str)
+                return builder.from_rows(*table) if table else None
+            except ValueError:
+                pass
+            
+            table = extractor.find_json_table(output_str)
+            if table:
+                return builder.from_rows(*table)
+            
+            # Header + separator + rows
+            lines = extractor.extract_pipe_table(output_str, max_lines=extractor.max_rows + 2)
+            if lines:
+                return builder.from_markdown_lines(lines)
+            
+            lines = extractor.extract_csv(output_str, max_lines=extractor.max_rows + 1)
+            if lines:
+                return builder.from_csv_lines(lines)
+        
+        except Exception as e:
+            logger.warning("⚠️ Could not extract typed data preview: %s", e)
+        
+        return None
+    
+    def _format_table(self, headers: list, rows: list) -> list:
+        """
+        Format headers and rows into markdown table lines.
         """
         data_lines = []
+        if not headers:
+            return data_lines
+
+        data_lines.append("| " + " | ".join(str(h) for h in headers) + " |")
+        data_lines.append("|" + "---|" * len(headers))
+        for row in rows:
+            data_lines.append("| " + " | ".join(str(v) for v in row) + " |")
         
+        return data_lines
+    
+    def _format_list_data(self, data_list) -> list:
+        """
+        Format a list of data records into table format.
+        """
         if len(data_list) > 0 and isinstance(data_list[0], dict):
             headers = list(data_list[0].keys())
-            data_lines.append("| " + " | ".join(headers) + " |")
-            data_lines.append("|" + "---|" * len(headers))
-            
-            for row in data_list[:10]:  # Limit to first 10 rows
-                values = [str(row.get(h, "")) for h in headers]
-                data_lines.append("| " + " | ".join(values) + " |")
+            rows = [[row.get(h, "") for h in headers] for row in data_list[:self.preview_extractor.max_rows]]
+            return self._format_table(headers, rows)
         
-        return data_lines
+        return []
     
     def _extract_data_preview(self, text: str) -> list:
         """
         Extract data preview from text output.
+        Scans the text incrementally and stops as soon as the preview is complete.
         
         Args:
             text (str): Text to search for tabular data
@@ -277,73 +397,25 @@ class SqlExtractor:
         Returns:
             list: List of data rows found
         """
-        import re
-        import json
-        
         data_lines = []
+        extractor = self.preview_extractor
         
         try:
             # Look for JSON-like data structures
-            json_pattern = r'\[[\s\S]*?\]'
-            json_matches = re.findall(json_pattern, text)
-            
-            for match in json_matches:
-                try:
-                    # Try to parse as JSON
-                    data = json.loads(match)
-                    if isinstance(data, list) and len(data) > 0:
-                        # Convert to readable format
-                        if isinstance(data[0], dict):
-                            # List of dictionaries (typical query result)
-                            headers = list(data[0].keys())
-                            data_lines.append("| " + " | ".join(headers) + " |")
-                            data_lines.append("|" + "---|" * len(headers))
-                            
-                            for row in data[:10]:  # Limit to first 10 rows
-                                values = [str(row.get(h, "")) for h in headers]
-                                data_lines.append("| " + " | ".join(values) + " |")
-                        break  # Found valid JSON data
-                except json.JSONDecodeError:
-                    continue
+            table = extractor.find_json_table(text)
+            if table:
+                data_lines = self._format_table(*table[:2])
             
             # If no JSON found, look for pipe-separated tables
             if not data_lines:
-                lines = text.split('\n')
-                table_lines = []
-                
-                for line in lines:
-                    # Look for lines that contain multiple pipe characters (table format)
-                    if line.count('|') >= 2:
-                        table_lines.append(line.strip())
-                    elif table_lines and line.strip() == "":
-                        # End of table
-                        break
-                    elif table_lines and not line.strip().startswith('|'):
-                        # Non-table line after table started
-                        break
-                
-                if table_lines:
-                    data_lines = table_lines[:15]  # Limit to first 15 lines
+                data_lines = extractor.extract_pipe_table(text, max_lines=extractor.max_rows + 5)
             
-            # Look for CSV-like data
+            # Look for CSV-like data (at least header + one data row)
             if not data_lines:
-                lines = text.split('\n')
-                csv_lines = []
-                
-                for line in lines:
-                    # Look for comma-separated values with consistent column count
-                    if ',' in line and len(line.split(',')) >= 2:
-                        csv_lines.append(line.strip())
-                        if len(csv_lines) >= 10:  # Limit preview
-                            break
-                    elif csv_lines:
-                        break
-                
-                if len(csv_lines) > 1:  # At least header + one data row
-                    data_lines = csv_lines
+                data_lines = extractor.extract_csv(text)
         
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract data preview: {e}")
+            logger.warning("⚠️ Could not extract data preview: %s", e)
         
         return data_lines
     
@@ -357,7 +429,7 @@ class SqlExtractor:
         Returns:
             list: List of SQL queries found in the steps
         """
-        sql_queries = []
+        texts = []
         
         try:
             for step in steps.data:
@@ -370,21 +442,26 @@ class SqlExtractor:
                             # Look for SQL queries in tool call details
                             if hasattr(tool_call, 'function') and tool_call.function:
                                 if hasattr(tool_call.function, 'arguments'):
-                                    args_str = str(tool_call.function.arguments)
-                                    # Look for SQL patterns in arguments
-                                    sql_queries.extend(self._find_sql_in_text(args_str))
+                                    texts.append(str(tool_call.function.arguments))
                             
                             # Check tool call outputs for SQL
                             if hasattr(tool_call, 'output') and tool_call.output:
-                                output_str = str(tool_call.output)
-                                sql_queries.extend(self._find_sql_in_text(output_str))
+                                texts.append(str(tool_call.output))
                     
                     # Check step details for any SQL content
-                    step_str = str(step_details)
-                    sql_queries.extend(self._find_sql_in_text(step_str))
+                    texts.append(str(step_details))
         
         except Exception as e:
-            print(f"⚠️ Warning: Could not extract SQL queries: {e}")
+            logger.warning("⚠️ Could not extract SQL queries: %s", e)
+
+        if self.pool is not None:
+            try:
+                sql_queries = self.pool.call(_find_sql_in_texts_task, texts)
+            except TimeoutError as e:
+                logger.warning("⚠️ Regex SQL extraction cut short: %s", e)
+                sql_queries = []
+        else:
+            sql_queries = [query for text in texts for query in self._find_sql_in_text(text)]
         
         # Remove duplicates while preserving order
         seen = set()
@@ -557,4 +634,25 @@ class SqlExtractor:
         # Remove leading empty lines
         while lines and lines[0].strip() == '':
             lines.pop(0)
-        return '\n'.join(lines)
\ No newline at end of file
+        return '\n'.join(lines)
+
+
+# Tareas para ExtractionPool: se ejecutan en sus procesos con un SqlExtractor sin pool por límite de filas.
+# `preview_rows` lo elige cada petición: solo se guardan los de los últimos límites usados
+@lru_cache(maxsize=8)
+def _worker_extractor(max_rows: int = 10) -> SqlExtractor:
+    return SqlExtractor(max_preview_rows=max_rows)
+
+
+def _extract_tool_call_task(arguments: Optional[str], output: Optional[str], max_rows: int) -> dict:
+    function = SimpleNamespace(arguments=arguments) if arguments is not None else None
+    return _worker_extractor(max_rows)._extract_from_tool_call(SimpleNamespace(function=function, output=output))
+
+
+def _format_queries_task(queries: list) -> list:
+    return _worker_extractor()._format_queries(queries)
+
+
+def _find_sql_in_texts_task(texts: list) -> list:
+    extractor = _worker_extractor()
+    return [query for text in texts for query in extractor._find_sql_in_text(text)]
@@ -0,0 +1,261 @@
+import json
+import re
+from typing import Iterator, Optional
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"[^"\\]*+(?:\\.[^"\\]*+)*+"')
+# Everything up to the next square bracket / curly brace outside of a JSON string.
+# Used to skip whole arrays or objects without decoding them: for a flat list of records
+# a single match jumps over all the rows until the closing bracket. The quantifiers are
+# possessive so the regex engine keeps no backtracking state (constant memory).
+_UNTIL_BRACKET = re.compile(r'[^"\[\]]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"\[\]]*+)*+')
+_UNTIL_BRACE = re.compile(r'[^"{}]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"{}]*+)*+')
+
+_DECODER = json.JSONDecoder()
+
+
+class StreamingPreviewExtractor:
+    """
+    Extrae vistas previas de resultados de consultas sin materializar el payload completo.
+
+    En lugar de `json.loads` sobre toda la salida de la herramienta, recorre el JSON de forma
+    incremental con `JSONDecoder.raw_decode`, decodifica solo las filas necesarias y se detiene
+    al llegar a `max_rows`. Las tablas markdown y los CSV se leen línea a línea sin `split`.
+    """
+
+    # Valores más grandes no se decodifican en la tabla Key/Value
+    MAX_CELL_CHARS = 64 * 1024
+
+    def __init__(self, max_rows: int = 10):
+        self.max_rows = max_rows
+
+    # -- JSON --------------------------------------------------------------------------------
+
+    @staticmethod
+    def _skip_whitespace(text: str, idx: int) -> int:
+        return _WHITESPACE.match(text, idx).end()
+
+    def skip_value(self, text: str, idx: int) -> int:
+        """
+        Devuelve el índice justo después del valor JSON que empieza en `idx`, sin decodificarlo.
+        """
+        opener = text[idx]
+        if opener == '"':
+            match = _STRING.match(text, idx)
+            if not match:
+                raise ValueError(f"Unterminated string at {idx}")
+            return match.end()
+        if opener not in "[{":
+            _, end = _DECODER.raw_decode(text, idx)
+            return end
+
+        closer = "]" if opener == "[" else "}"
+        pattern = _UNTIL_BRACKET if opener == "[" else _UNTIL_BRACE
+        depth = 0
+        pos = idx
+        length = len(text)
+        while pos < length:
+            ch = text[pos]
+            if ch == opener:
+                depth += 1
+            elif ch == closer:
+                depth -= 1
+                if depth == 0:
+                    return pos + 1
+            elif pos != idx:
+                raise ValueError(f"Malformed value starting at {idx}")
+            pos = pattern.match(text, pos + 1).end()
+        raise ValueError(f"Unterminated value starting at {idx}")
+
+    def iter_array(self, text: str, idx: int) -> Iterator:
+        """
+        Genera los elementos del array JSON que empieza en `idx`, decodificándolos de uno en uno.
+        """
+        if text[idx] != "[":
+            raise ValueError(f"Expected '[' at {idx}")
+        pos = self._skip_whitespace(text, idx + 1)
+        if text.startswith("]", pos):
+            return
+        while True:
+            value, pos = _DECODER.raw_decode(text, pos)
+            yield value
+            pos = self._skip_whitespace(text, pos)
+            if text.startswith(",", pos):
+                pos = self._skip_whitespace(text, pos + 1)
+            elif text.startswith("]", pos):
+                return
+            else:
+                raise ValueError(f"Expected ',' or ']' at {pos}")
+
+    def iter_object_members(self, text: str, idx: int) -> Iterator[tuple]:
+        """
+        Genera (clave, inicio, fin) del valor de cada miembro del objeto JSON que empieza en `idx`.
+        Los valores no se decodifican: quien consume decide si los decodifica o los ignora.
+        """
+        if text[idx] != "{":
+            raise ValueError(f"Expected '{{' at {idx}")
+        pos = self._skip_whitespace(text, idx + 1)
+        if text.startswith("}", pos):
+            return
+        while True:
+            key, pos = _DECODER.raw_decode(text, pos)
+            pos = self._skip_whitespace(text, pos)
+            if not text.startswith(":", pos):
+                raise ValueError(f"Expected ':' at {pos}")
+            value_start = self._skip_whitespace(text, pos + 1)
+            value_end = self.skip_value(text, value_start)
+            yield key, value_start, value_end
+            pos = self._skip_whitespace(text, value_end)
+            if text.startswith(",", pos):
+                pos = self._skip_whitespace(text, pos + 1)
+            elif text.startswith("}", pos):
+                return
+            else:
+                raise ValueError(f"Expected ',' or '}}' at {pos}")
+
+    def starts_with(self, text: str, char: str) -> bool:
+        """
+        Indica si el primer carácter no blanco del texto es `char`, sin copiar el texto.
+        """
+        return text.startswith(char, self._skip_whitespace(text, 0))
+
+    def decode_value(self, text: str, idx: int):
+        value, _ = _DECODER.raw_decode(text, idx)
+        return value
+
+    def _records_table(self, text: str, idx: int) -> Optional[tuple]:
+        """
+        Lee como mucho `max_rows` registros del array de objetos que empieza en `idx`.
+        Las cabeceras son las claves del primer registro.
+        Devuelve (cabeceras, filas, truncada) o None si el array no contiene registros.
+        """
+        headers = None
+        rows = []
+        records = self.iter_array(text, idx)
+        for record in records:
+            if headers is None:
+                if not isinstance(record, dict):
+                    return None
+                headers = list(record.keys())
+            rows.append([record.get(h, "") if isinstance(record, dict) else "" for h in headers])
+            if len(rows) >= self.max_rows:
+                break
+        if headers is None:
+            return None
+        truncated = len(rows) >= self.max_rows and next(records, None) is not None
+        return headers, rows, truncated
+
+    def extract_json_table(self, text: str) -> Optional[tuple]:
+        """
+        Extrae (cabeceras, filas, truncada) de una salida JSON:
+        - lista de registros,
+        - objeto con una lista de registros en `data` o `results`,
+        - objeto simple, como tabla Key/Value.
+
+        Devuelve None si es JSON pero no tabular. Lanza ValueError si la salida no es JSON.
+        """
+        start = self._skip_whitespace(text, 0)
+        if start >= len(text):
+            raise ValueError("Empty output")
+
+        if text[start] == "[":
+            return self._records_table(text, start)
+
+        if text[start] != "{":
+            # JSON escalar: no hay nada tabular
+            self.decode_value(text, start)
+            return None
+
+        results_start = None
+        single_record = []
+        for key, value_start, value_end in self.iter_object_members(text, start):
+            is_list = text.startswith("[", value_start)
+            if key == "data" and is_list:
+                return self._records_table(text, value_start)
+            if key == "results" and is_list and results_start is None:
+                results_start = value_start
+            elif len(single_record) < self.max_rows:
+                if value_end - value_start <= self.MAX_CELL_CHARS:
+                    single_record.append([key, self.decode_value(text, value_start)])
+                else:
+                    single_record.append([key, f"<{value_end - value_start} chars>"])
+
+        if results_start is not None:
+            return self._records_table(text, results_start)
+        return ["Key", "Value"], single_record, False
+
+    def find_json_table(self, text: str) -> Optional[tuple]:
+        """
+        Busca el primer array JSON no vacío embebido en texto libre y, si contiene registros,
+        devuelve (cabeceras, filas, truncada).
+        """
+        idx = text.find("[")
+        while idx != -1:
+            try:
+                elements = self.iter_array(text, idx)
+                first = next(elements, None)
+                if first is not None:
+                    return self._records_table(text, idx) if isinstance(first, dict) else None
+            except ValueError:
+                pass
+            idx = text.find("[", idx + 1)
+        return None
+
+    # -- Texto -------------------------------------------------------------------------------
+
+    @staticmethod
+    def contains_any(text: str, keywords: list, window: int = 1 << 20) -> bool:
+        """
+        Búsqueda de palabras clave sin distinguir mayúsculas, por ventanas de `window` caracteres
+        para no crear una copia en mayúsculas del texto completo.
+        """
+        overlap = max(len(k) for k in keywords) - 1
+        for start in range(0, len(text), window):
+            chunk = text[max(start - overlap, 0):start + window].upper()
+            if any(keyword in chunk for keyword in keywords):
+                return True
+        return False
+
+    @staticmethod
+    def iter_lines(text: str) -> Iterator[str]:
+        """
+        Equivalente perezoso de `text.split('\\n')`.
+        """
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            if end == -1:
+                yield text[start:]
+                return
+            yield text[start:end]
+            start = end + 1
+
+    def extract_pipe_table(self, text: str, max_lines: int) -> list:
+        table_lines = []
+        for line in self.iter_lines(text):
+            # Look for lines that contain multiple pipe characters (table format)
+            if line.count("|") >= 2:
+                table_lines.append(line.strip())
+                if len(table_lines) >= max_lines:
+                    break
+            elif table_lines and line.strip() == "":
+                # End of table
+                break
+            elif table_lines and not line.strip().startswith("|"):
+                # Non-table line after table started
+                break
+        return table_lines
+
+    def extract_csv(self, text: str, max_lines: Optional[int] = None) -> list:
+        max_lines = max_lines or self.max_rows
+        csv_lines = []
+        for line in self.iter_lines(text):
+            # Look for comma-separated values
+            if "," in line:
+                csv_lines.append(line.strip())
+                if len(csv_lines) >= max_lines:
+                    break
+            elif csv_lines:
+                break
+        return csv_lines if len(csv_lines) > 1 else []
@@ -0,0 +1,69 @@
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import Optional
+
+
+class BroadcastBuffer:
+    """
+    Buffer de eventos de un único productor con varios suscriptores.
+
+    Cada evento recibe un número de secuencia monótono. Se guardan los últimos `max_events` (anillo),
+    de modo que un suscriptor que llega tarde o se reconecta recibe primero lo que se perdió y después
+    sigue en vivo. Si pide una posición ya descartada, continúa desde el evento más antiguo disponible.
+    Se usa desde un único event loop.
+    """
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.events = deque(maxlen=max_events)
+        self.first_seq = 0
+        self.next_seq = 0
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def publish(self, event) -> int:
+        if self.events.maxlen is not None and len(self.events) == self.events.maxlen:
+            self.first_seq += 1
+        self.events.append(event)
+        seq = self.next_seq
+        self.next_seq += 1
+        self._notify()
+        return seq
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def read(self, seq: int, limit: Optional[int] = None) -> list:
+        """
+        Pares (seq, evento) disponibles desde `seq` (o desde el más antiguo guardado), hasta `limit`.
+        """
+        seq = max(seq, self.first_seq)
+        stop = self.next_seq if limit is None else min(self.next_seq, seq + limit)
+        offset = seq - self.first_seq
+        return list(zip(range(seq, stop), islice(self.events, offset, offset + stop - seq)))
+
+    async def wait(self, seq: int):
+        """
+        Espera hasta que haya un evento con secuencia `seq` o el buffer se cierre.
+        """
+        while seq >= self.next_seq and not self.closed:
+            await self._changed.wait()
+
+    async def subscribe(self, start: int = 0):
+        """
+        Genera pares (seq, evento) desde la secuencia `start` hasta que el buffer se cierra.
+        """
+        seq = start
+        while True:
+            await self.wait(seq)
+            batch = self.read(seq)
+            if not batch:
+                return
+            for item in batch:
+                yield item
+            seq = batch[-1][0] + 1
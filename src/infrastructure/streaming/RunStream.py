@@ -0,0 +1,160 @@
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from src.infrastructure.streaming.BroadcastBuffer import BroadcastBuffer
+import time
+from typing import Callable, Optional
+
+
+class SlowConsumerError(Exception):
+    """El cliente se ha quedado demasiado atrás respecto al run y se corta su stream."""
+    pass
+
+
+def _coalesce_deltas(batch: list) -> list:
+    """
+    Fusiona los deltas de texto consecutivos de un lote en uno solo, con la secuencia del último.
+    """
+    merged = []
+    for seq, evt in batch:
+        if (merged and evt.get("type") == "delta" and merged[-1][1].get("type") == "delta"
+                and set(evt) == {"type", "text"} and set(merged[-1][1]) == {"type", "text"}):
+            merged[-1] = (seq, {"type": "delta", "text": merged[-1][1]["text"] + evt["text"]})
+        else:
+            merged.append((seq, evt))
+    return merged
+
+
+class RunStream:
+    """
+    Eventos de un run upstream, desacoplados de las conexiones de los clientes.
+
+    El run lo lee una tarea de RunStreamRegistry y publica en un BroadcastBuffer; cada cliente
+    (o reconexión) se suscribe desde la secuencia que le falta y avanza a su ritmo, sin frenar la
+    lectura del run. El stream sigue vivo aunque no quede ningún cliente conectado, para que una
+    reconexión pueda continuarlo.
+
+    Si un cliente acumula más de `high_watermark` eventos pendientes:
+    - policy "coalesce": los deltas de texto pendientes se envían fusionados en un solo frame, hasta
+      que vuelve a estar por debajo de `low_watermark`.
+    - policy "drop": se corta su stream con SlowConsumerError; puede reanudarlo con Last-Event-ID.
+    """
+
+    def __init__(self, stream_id: str, max_events: Optional[int] = None, high_watermark: int = 0,
+                 low_watermark: int = 0, policy: str = "coalesce"):
+        self.id = stream_id
+        self.buffer = BroadcastBuffer(max_events)
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.policy = policy
+        self.task = None
+        self.reader = None
+        self.coalesced_events = 0
+        self.dropped_clients = 0
+        self.created_at = time.monotonic()
+        self.detached_since: Optional[float] = self.created_at
+        self.finished_at: Optional[float] = None
+        self.aborted = False
+        self._positions = {}
+        self._on_close = []
+        self._on_abort = []
+
+        metrics = MetricsRegistry()
+        self._coalesced_total = metrics.counter(
+            "stream_coalesced_events_total", "Text deltas merged into a previous frame for slow clients")
+        self._dropped_total = metrics.counter(
+            "stream_dropped_clients_total", "Clients disconnected for falling behind the high watermark")
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._positions)
+
+    def lags(self) -> list:
+        return [self.buffer.next_seq - seq for seq in self._positions.values()]
+
+    def on_close(self, callback: Callable[[], None]):
+        """
+        Registra una función que se llama una vez, en el event loop, cuando termina el run.
+        """
+        if self.finished:
+            callback()
+        else:
+            self._on_close.append(callback)
+
+    def on_abort(self, callback: Callable[[], None]):
+        """
+        Registra cómo cancelar el run en el servicio upstream si se aborta el stream (ver RunStreamRegistry.abort).
+        Se llama en un hilo, porque los SDK bloquean.
+        """
+        self._on_abort.append(callback)
+
+    def orphaned_for(self) -> float:
+        if self._positions or self.detached_since is None:
+            return 0.0
+        return time.monotonic() - self.detached_since
+
+    def stats(self) -> dict:
+        return {
+            "id": self.id,
+            "finished": self.finished,
+            "aborted": self.aborted,
+            "events": self.buffer.next_seq,
+            "buffered_events": len(self.buffer.events),
+            "reader_queue": self.reader.depth if self.reader else 0,
+            "subscribers": self.subscribers,
+            "subscriber_lags": self.lags(),
+            "coalesced_events": self.coalesced_events,
+            "dropped_clients": self.dropped_clients,
+        }
+
+    async def events(self, start: int = 0):
+        """
+        Genera pares (seq, evento) desde `start`, contando al llamante como suscriptor mientras lee.
+        """
+        token = object()
+        self._positions[token] = start
+        self.detached_since = None
+        seq = start
+        coalescing = False
+        try:
+            while True:
+                await self.buffer.wait(seq)
+                lag = self.buffer.next_seq - max(seq, self.buffer.first_seq)
+                if lag <= 0:
+                    return
+
+                if self.high_watermark and lag > self.high_watermark:
+                    if self.policy == "drop":
+                        self.dropped_clients += 1
+                        self._dropped_total.inc()
+                        raise SlowConsumerError(f"{lag} events pending (high watermark {self.high_watermark})")
+                    coalescing = True
+                elif coalescing and lag <= self.low_watermark:
+                    coalescing = False
+
+                if coalescing:
+                    batch = self.buffer.read(seq)
+                    merged = _coalesce_deltas(batch)
+                    self.coalesced_events += len(batch) - len(merged)
+                    self._coalesced_total.inc(len(batch) - len(merged))
+                    batch = merged
+                else:
+                    batch = self.buffer.read(seq, limit=1)
+
+                for item in batch:
+                    yield item
+                seq = batch[-1][0] + 1
+                self._positions[token] = seq
+        finally:
+            del self._positions[token]
+            if not self._positions:
+                self.detached_since = time.monotonic()
+
+    def _close(self):
+        self.finished_at = time.monotonic()
+        self.buffer.close()
+        callbacks, self._on_close = self._on_close, []
+        for callback in callbacks:
+            callback()
@@ -0,0 +1,182 @@
+from src.domain.exceptions.StreamUnavailableException import StreamUnavailableException
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from src.infrastructure.streaming.RunStream import RunStream
+from src.infrastructure.streaming.UpstreamReader import UpstreamReader
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Callable, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class RunStreamRegistry(metaclass=SingletonMeta):
+    """
+    Registro de los runs en streaming activos y de los terminados hace poco.
+
+    Cada evento SSE lleva `id: <stream_id>:<seq>`. Un cliente que pierde la conexión reenvía la
+    petición con la cabecera `Last-Event-ID` y `resolve` devuelve el stream y la posición desde la que
+    continuar, ya sea del buffer o del run todavía en curso, sin lanzar un run nuevo.
+
+    El registro es de cada proceso: con varios workers solo el que lanzó el run puede reanudarlo. Los ids
+    empiezan por el identificador del proceso, así que una reconexión que llega a otro worker se
+    distingue de un stream caducado (ver `resolve`).
+
+    Límites:
+    - STREAM_BUFFER_MAX_EVENTS: eventos guardados por stream (anillo).
+    - STREAM_BUFFER_TTL_S: tiempo que se conserva un stream terminado.
+    - STREAM_REGISTRY_MAX: streams terminados conservados como máximo (se descartan los más antiguos).
+    - STREAM_ORPHAN_TIMEOUT_S: un run sin clientes durante este tiempo se cancela en upstream y deja de leerse.
+    - STREAM_CANCEL_TIMEOUT_S: espera máxima a que upstream confirme la cancelación de un run.
+
+    Los runs con iteradores síncronos (los SDK de Fabric y Foundry) se leen en un hilo con UpstreamReader
+    y una cola de STREAM_READER_QUEUE_SIZE eventos, de modo que ni el run bloquea el event loop ni un
+    cliente lento frena la lectura del run. Control de clientes lentos (ver RunStream):
+    STREAM_HIGH_WATERMARK, STREAM_LOW_WATERMARK y STREAM_OVERFLOW_POLICY (`coalesce` o `drop`).
+    """
+
+    POLICIES = ("coalesce", "drop")
+
+    def __init__(self):
+        self.max_events = int(os.getenv("STREAM_BUFFER_MAX_EVENTS", "4096"))
+        self.ttl = float(os.getenv("STREAM_BUFFER_TTL_S", "300"))
+        self.max_streams = int(os.getenv("STREAM_REGISTRY_MAX", "1000"))
+        self.orphan_timeout = float(os.getenv("STREAM_ORPHAN_TIMEOUT_S", "60"))
+        self.cancel_timeout = float(os.getenv("STREAM_CANCEL_TIMEOUT_S", "15"))
+        self.reader_queue_size = int(os.getenv("STREAM_READER_QUEUE_SIZE", "256"))
+        self.high_watermark = int(os.getenv("STREAM_HIGH_WATERMARK", "256"))
+        self.low_watermark = int(os.getenv("STREAM_LOW_WATERMARK", "32"))
+        self.overflow_policy = os.getenv("STREAM_OVERFLOW_POLICY", "coalesce")
+        if self.overflow_policy not in self.POLICIES:
+            raise ValueError(f"STREAM_OVERFLOW_POLICY must be one of {self.POLICIES}")
+        self.instance = uuid.uuid4().hex[:12]
+        self._streams = OrderedDict()
+
+        metrics = MetricsRegistry()
+        self.resumed_total = metrics.counter(
+            "stream_resumed_total", "Reconnections served from a buffered or running stream")
+        self.resume_misses_total = metrics.counter(
+            "stream_resume_misses_total", "Reconnections whose stream was no longer available")
+        metrics.gauge(
+            "stream_active", "Run streams still reading from upstream",
+            callback=lambda: sum(1 for s in list(self._streams.values()) if not s.finished))
+        metrics.gauge(
+            "stream_buffered", "Run streams kept in memory, active or finished",
+            callback=lambda: len(self._streams))
+        metrics.gauge(
+            "stream_buffered_events", "Events held in run stream buffers",
+            callback=lambda: sum(len(s.buffer.events) for s in list(self._streams.values())))
+        metrics.gauge(
+            "stream_reader_queue_events", "Events read from upstream and not yet published",
+            callback=lambda: sum(s.reader.depth for s in list(self._streams.values()) if s.reader))
+        metrics.gauge(
+            "stream_subscriber_lag_max", "Largest number of events a connected client is behind its run",
+            callback=lambda: max((lag for s in list(self._streams.values()) for lag in s.lags()), default=0))
+
+    def start(self, factory: Callable[[], Union[Iterator[dict], AsyncIterator[dict]]]) -> RunStream:
+        """
+        Crea un stream y lanza la tarea que lee `factory()` y publica sus eventos.
+        """
+        self._purge()
+        stream = RunStream(
+            f"{self.instance}-{uuid.uuid4().hex}", self.max_events,
+            high_watermark=self.high_watermark, low_watermark=self.low_watermark, policy=self.overflow_policy,
+        )
+        self._streams[stream.id] = stream
+        source = factory()
+        if not hasattr(source, "__aiter__"):
+            stream.reader = UpstreamReader(source, self.reader_queue_size, name=f"run-stream-{stream.id[-8:]}")
+            source = stream.reader.events()
+        stream.task = asyncio.create_task(self._pump(stream, source))
+        return stream
+
+    def active(self) -> list[RunStream]:
+        """
+        Streams que siguen leyendo de upstream.
+        """
+        return [stream for stream in self._streams.values() if not stream.finished]
+
+    async def abort(self, stream: RunStream, reason: str, timeout: Optional[float] = None):
+        """
+        Corta un stream en curso: los clientes reciben un evento de error con `reason`, el run se cancela
+        en el servicio upstream (las funciones de `on_abort`, como mucho `timeout` segundos, por defecto
+        STREAM_CANCEL_TIMEOUT_S) y después se deja de leer. El turno del thread (`on_close`) se libera
+        cuando upstream ha terminado el run, no antes.
+        """
+        if stream.finished:
+            return
+        stream.aborted = True
+        stream.buffer.publish({"type": "error", "error": reason, "aborted": True})
+        # Antes de dejar de leer: al cerrar el iterador del SDK se pierde el run en curso
+        await self._cancel_upstream(stream, self.cancel_timeout if timeout is None else timeout)
+        if stream.task is not None and not stream.finished:
+            stream.task.cancel()
+
+    async def _cancel_upstream(self, stream: RunStream, timeout: float):
+        callbacks, stream._on_abort = stream._on_abort, []
+        for callback in callbacks:
+            try:
+                await asyncio.wait_for(asyncio.to_thread(callback), timeout)
+            except Exception as e:
+                logger.warning("⚠️ Could not cancel upstream run of stream %s: %s", stream.id, e)
+
+    def stats(self) -> list:
+        self._purge()
+        return [stream.stats() for stream in self._streams.values()]
+
+    def get(self, stream_id: str) -> Optional[RunStream]:
+        self._purge()
+        return self._streams.get(stream_id)
+
+    def resolve(self, last_event_id: Optional[str]):
+        """
+        Traduce una cabecera Last-Event-ID en (stream, siguiente secuencia), o None si no hay cabecera.
+        Lanza StreamUnavailableException si el id no es de ningún stream de este proceso; `other_worker`
+        indica que lo lanzó otro proceso (otro worker, o uno que ya se ha reiniciado).
+        """
+        if not last_event_id:
+            return None
+        stream_id, _, seq = last_event_id.strip().rpartition(":")
+        if not stream_id or not seq.isdigit():
+            raise StreamUnavailableException(f"Invalid Last-Event-ID '{last_event_id}'")
+        stream = self.get(stream_id)
+        if stream is None:
+            self.resume_misses_total.inc()
+            instance, _, _ = stream_id.partition("-")
+            if instance != self.instance:
+                raise StreamUnavailableException(
+                    f"Stream {stream_id} is not kept by this worker", other_worker=True)
+            raise StreamUnavailableException(f"Stream {stream_id} is no longer available")
+        self.resumed_total.inc()
+        return stream, int(seq) + 1
+
+    async def _pump(self, stream: RunStream, source: AsyncIterator[dict]):
+        try:
+            async for evt in source:
+                stream.buffer.publish(evt)
+                if stream.orphaned_for() > self.orphan_timeout:
+                    logger.info("Stream %s has no clients for %gs, cancelling upstream", stream.id, self.orphan_timeout)
+                    stream.aborted = True
+                    await self._cancel_upstream(stream, self.cancel_timeout)
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("❌ Error in run stream %s: %s", stream.id, e)
+            stream.buffer.publish({"error": str(e)})
+        finally:
+            stream._close()
+            await source.aclose()
+
+    def _purge(self):
+        now = time.monotonic()
+        finished = [s for s in self._streams.values() if s.finished]
+        excess = len(finished) - self.max_streams
+        for stream in finished:
+            if excess > 0 or now - stream.finished_at > self.ttl:
+                del self._streams[stream.id]
+                excess -= 1
@@ -0,0 +1,124 @@
+from src.domain.exceptions.ServerDrainingException import ServerDrainingException
+from src.infrastructure.SingletonMeta import SingletonMeta
+from src.infrastructure.metrics.MetricsRegistry import MetricsRegistry
+from src.infrastructure.streaming.RunStream import RunStream
+from src.infrastructure.streaming.RunStreamRegistry import RunStreamRegistry
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ShutdownCoordinator(metaclass=SingletonMeta):
+    """
+    Parada ordenada del proceso (reinicio de gunicorn, despliegue o `--reload`).
+
+    Al recibir SIGTERM/SIGINT (o al terminar el lifespan de la aplicación) el proceso deja de aceptar
+    chats nuevos (`check_accepting` lanza ServerDrainingException y las rutas responden 503 con
+    Retry-After) y espera hasta SHUTDOWN_DRAIN_TIMEOUT_S segundos a que terminen los runs en streaming.
+    Los que siguen en curso al vencer el plazo se abortan: sus clientes reciben un evento de error y el
+    run se cancela en el servicio upstream para que no siga consumiendo capacidad. Los trabajos que no son
+    un RunStream (los lotes de /chat/batch) se registran con `track` y se drenan igual.
+
+    El plazo debe ser menor que el que da el servidor antes de matar al worker (`--graceful-timeout` de
+    gunicorn, 30 s por defecto, o `--timeout-graceful-shutdown` de uvicorn).
+    """
+
+    SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+    def __init__(self):
+        self.drain_timeout = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT_S", "20"))
+        self.retry_after = int(os.getenv("SHUTDOWN_RETRY_AFTER_S", "5"))
+        self.draining = False
+        self.result: Optional[dict] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        # Trabajos registrados con `track`: futuro que termina con el trabajo -> corrutina que lo aborta
+        self._jobs = {}
+
+        metrics = MetricsRegistry()
+        self.streams_total = metrics.counter(
+            "shutdown_streams_total", "Run streams found active at shutdown, by outcome (drained or aborted)")
+        metrics.gauge("shutdown_draining", "1 while the process is draining before shutdown",
+                      callback=lambda: int(self.draining))
+
+    def check_accepting(self):
+        if self.draining:
+            raise ServerDrainingException("Server is shutting down, retry on another instance")
+
+    def track(self, done: asyncio.Future, abort: Callable[[], Awaitable[None]]):
+        """
+        Registra un trabajo que no es un RunStream: el drenado espera a `done` y, si no ha terminado al
+        vencer el plazo, espera a `abort()` (que debe cancelar sus runs en upstream).
+        """
+        self._jobs[done] = abort
+        done.add_done_callback(lambda future: self._jobs.pop(future, None))
+
+    def install_signal_handlers(self):
+        """
+        Encadena el inicio del drenado a los manejadores de señal del servidor (uvicorn los instala antes
+        del lifespan). Se llama desde el event loop, en el hilo principal.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in self.SIGNALS:
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain)
+                previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+    def begin_drain(self) -> asyncio.Task:
+        """
+        Empieza el drenado en segundo plano (idempotente).
+        """
+        if self._drain_task is None:
+            self.draining = True
+            self._drain_task = asyncio.create_task(self._drain())
+        return self._drain_task
+
+    async def drain(self) -> dict:
+        """
+        Drena (o espera al drenado ya iniciado) y devuelve {"drained": n, "aborted": m}.
+        """
+        return await asyncio.shield(self.begin_drain())
+
+    async def _drain(self) -> dict:
+        registry = RunStreamRegistry()
+        start = time.monotonic()
+        deadline = start + self.drain_timeout
+        # Se vuelve a mirar el registro: un stream puede haber empezado justo antes de cerrar la admisión
+        seen = set(registry.active()) | set(self._jobs)
+        logger.info("🛑 Draining %s active streams and jobs (deadline %.0fs)", len(seen), self.drain_timeout)
+        active = list(seen)
+        while active and time.monotonic() < deadline:
+            await asyncio.wait([job.task if isinstance(job, RunStream) else job for job in active],
+                               timeout=deadline - time.monotonic())
+            active = registry.active() + list(self._jobs)
+            seen.update(active)
+
+        remaining = registry.active()
+        jobs = list(self._jobs.items())
+        await asyncio.gather(
+            *(registry.abort(stream, "Server is shutting down, the answer was interrupted", timeout=5.0)
+              for stream in remaining),
+            *(asyncio.wait_for(abort(), 5.0) for _, abort in jobs),
+            return_exceptions=True,
+        )
+        aborted = len(remaining) + len(jobs)
+        drained = len(seen) - aborted
+        self.streams_total.inc(drained, outcome="drained")
+        self.streams_total.inc(aborted, outcome="aborted")
+        self.result = {"drained": drained, "aborted": aborted}
+        logger.info("🛑 Drain finished in %.1fs: %s streams drained, %s aborted",
+                    time.monotonic() - start, drained, aborted)
+        return self.result
@@ -0,0 +1,82 @@
+from src.infrastructure.profiling.SamplingProfiler import profiled
+import asyncio
+import concurrent.futures
+import threading
+from typing import Iterator
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class UpstreamReader:
+    """
+    Lee un iterador síncrono (los streams de los SDK de OpenAI y Azure bloquean entre eventos) en un
+    hilo propio y entrega sus eventos al event loop a través de una cola acotada de `maxsize` eventos.
+
+    El hilo sigue leyendo mientras el event loop procesa los eventos anteriores; si la cola se llena,
+    espera en lugar de acumular memoria. Al cerrar el lector, el hilo se detiene tras el siguiente
+    evento y cierra el iterador.
+    """
+
+    def __init__(self, iterator: Iterator, maxsize: int = 256, name: str = "upstream-reader"):
+        self._iterator = iterator
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._loop = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=profiled(self._run), name=name, daemon=True)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def maxsize(self) -> int:
+        return self._queue.maxsize
+
+    async def events(self):
+        self._loop = asyncio.get_running_loop()
+        self._thread.start()
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self._stopped.set()
+
+    def _run(self):
+        try:
+            for item in self._iterator:
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self._put(_Failure(e))
+        finally:
+            close = getattr(self._iterator, "close", None)
+            if close is not None:
+                close()
+            self._put(_END)
+
+    def _put(self, item) -> bool:
+        if self._stopped.is_set():
+            return False
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        except RuntimeError:
+            # Event loop cerrado
+            return False
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._stopped.is_set():
+                    future.cancel()
+                    return False